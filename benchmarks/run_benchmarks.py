@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the EC2 multi-country hotel scraper
+Serves recorded Booking.com hotel pages from a local HTTP server, runs the scraping, extraction,
+popup and price cleaning code against them with NordVPN and IP lookups stubbed out, and reports
+throughput and latency percentiles, optionally compared against a stored baseline
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import tempfile
+import threading
+import subprocess
+import functools
+from datetime import datetime
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'fixtures')
+sys.path.insert(0, REPO_ROOT)
+
+from metrics import percentile
+from multi_country_hotel_scraper_ec2 import LAZY_IMPORTS
+
+# Fixture served as-is (server-rendered price) and one that loads prices by XHR behind popups
+STATIC_PAGE = 'golden_palace_suites.html'
+DYNAMIC_PAGE = 'golden_palace_suites_dynamic.html'
+
+PRICE_SAMPLES = [
+    "€ 896", "€ 1,304", "US$1,234.50", "EGP 12,345", "1.234,56 €", "£78", "¥ 123,456",
+    "Price: 2,150.00 AED", "CHF 1'020", "No price found",
+]
+
+STUB_IP = "203.0.113.10"
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Serves the fixtures directory without logging every request."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=FIXTURES_DIR, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server():
+    """Serve the fixture pages on a free localhost port; returns (server, base_url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def stub_network(scraper):
+    """Replace NordVPN and egress IP lookups with instant stubs."""
+    scraper.get_current_ip = lambda proxy=None: STUB_IP
+    scraper.connect_to_nordvpn_country = lambda country: True
+    scraper.disconnect_nordvpn = lambda: True
+    scraper.check_exit_country = lambda country, proxy=None: {'ip': STUB_IP, 'country': country}
+
+
+def preload_lazy_imports():
+    """Import what the scraper only loads on first use, so no benchmark's first call pays for it."""
+    import bs4  # noqa: F401
+    import requests  # noqa: F401
+    import price_normalization  # noqa: F401
+
+
+def time_calls(function, iterations, setup=None):
+    """Call function iterations times; returns the duration of each call in seconds."""
+    durations = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def summarize(name, durations, errors=0):
+    """Return throughput and latency percentiles for one benchmark."""
+    values = sorted(durations)
+    total = sum(values)
+    return {
+        'name': name,
+        'iterations': len(values),
+        'errors': errors,
+        'throughput_per_s': round(len(values) / total, 3) if total else None,
+        'mean_ms': round(total / len(values) * 1000, 3),
+        'p50_ms': round(percentile(values, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(values, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+def bench_import_time(iterations):
+    """Returns (durations, errors) of importing the scraper module in a fresh interpreter.
+
+    Durations are the module's cumulative time as reported by -X importtime; every heavy
+    dependency the import pulled in counts as an error.
+    """
+    durations = []
+    eager = set()
+    for _ in range(iterations):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import multi_country_hotel_scraper_ec2'],
+                                cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        # Lines look like "import time:  self_us | cumulative_us | <indent>module", after one header line
+        for line in result.stderr.splitlines():
+            parts = [part.strip() for part in line.split('|')]
+            if len(parts) != 3 or not parts[1].isdigit():
+                continue
+            cumulative_us, module = int(parts[1]), parts[2]
+            if module == 'multi_country_hotel_scraper_ec2':
+                durations.append(cumulative_us / 1e6)
+            elif module.split('.')[0] in LAZY_IMPORTS:
+                eager.add(module.split('.')[0])
+
+    if eager:
+        print(f"Imported at module load: {', '.join(sorted(eager))}", file=sys.stderr)
+    return durations, len(eager)
+
+
+def bench_clean_price(scraper, iterations):
+    from price_normalization import parse_price
+
+    def run():
+        for sample in PRICE_SAMPLES:
+            scraper.clean_price(sample)
+    # parse_price is memoized, so every timed pass starts cold instead of timing cache hits
+    return time_calls(run, iterations, setup=parse_price.cache_clear)
+
+
+def bench_extract_html(iterations):
+    from http_fetcher import extract_fields_from_html
+
+    with open(os.path.join(FIXTURES_DIR, STATIC_PAGE), 'r', encoding='utf-8') as f:
+        html = f.read()
+    return time_calls(lambda: extract_fields_from_html(html), iterations)
+
+
+def bench_scrape_http(scraper, base_url, iterations):
+    """Returns (durations, errors) of the HTTP fast path fetching and extracting the static page."""
+    url = f"{base_url}/{STATIC_PAGE}"
+    errors = []
+
+    def run():
+        if scraper.scrape_hotel_http(url, 'Germany') is None:
+            errors.append(url)
+
+    return time_calls(run, iterations), len(errors)
+
+
+def bench_extract_in_browser(scraper, driver, base_url, iterations):
+    driver.get(f"{base_url}/{STATIC_PAGE}")
+    return time_calls(lambda: scraper.extract_hotel_info_and_price(driver), iterations)
+
+
+def bench_popups(scraper, driver, base_url, iterations):
+    # Every iteration reloads the page so there is a banner to dismiss
+    return time_calls(lambda: scraper.handle_booking_popups(driver), iterations,
+                      setup=lambda: driver.get(f"{base_url}/{STATIC_PAGE}"))
+
+
+def bench_scrape(scraper, driver_pool, base_url, page, iterations):
+    """Returns (durations, errors); scrape_hotel_for_country reports failures as error records."""
+    url = f"{base_url}/{page}"
+    errors = []
+
+    def run():
+        hotel_data = scraper.scrape_hotel_for_country(url, 'Germany', driver_pool)
+        if hotel_data.get('hotel_name') == 'Error' or not scraper.clean_price(hotel_data.get('raw_price') or ''):
+            errors.append(hotel_data.get('raw_price'))
+
+    return time_calls(run, iterations), len(errors)
+
+
+def bench_scrape_tabs(scraper, driver_pool, base_url, iterations, tabs=4):
+    """Returns (durations, errors) of scraping the dynamic page tabs times in concurrent tabs."""
+    targets = [{'url': f"{base_url}/{DYNAMIC_PAGE}?tab={i}"} for i in range(tabs)]
+    errors = []
+
+    def run():
+        for _, hotel_data in scraper.scrape_hotels_in_tabs(targets, 'Germany', driver_pool, max_tabs=tabs):
+            if hotel_data.get('hotel_name') == 'Error' or not scraper.clean_price(hotel_data.get('raw_price') or ''):
+                errors.append(hotel_data.get('raw_price'))
+
+    scraper.SCRAPE_OPTIONS['tab_stagger'] = 0
+    return time_calls(run, iterations), len(errors)
+
+
+BENCHMARKS = ['import_time', 'clean_price', 'extract_html', 'scrape_http', 'extract_in_browser', 'popups',
+              'scrape_static', 'scrape_dynamic', 'scrape_tabs']
+BROWSER_BENCHMARKS = {'extract_in_browser', 'popups', 'scrape_static', 'scrape_dynamic', 'scrape_tabs'}
+
+
+def run_benchmarks(names, iterations, browser_iterations, import_iterations=10):
+    """Run the selected benchmarks; returns their summaries in BENCHMARKS order."""
+    # The scraper logs and writes screenshots relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='hotel_scraper_bench_')
+    os.chdir(workdir)
+
+    import multi_country_hotel_scraper_ec2 as scraper
+    logging.getLogger().setLevel(logging.WARNING)
+    preload_lazy_imports()
+    stub_network(scraper)
+
+    server, base_url = start_fixture_server()
+    results = []
+    driver_pool = None
+    try:
+        if 'import_time' in names:
+            durations, errors = bench_import_time(import_iterations)
+            results.append(summarize('import_time', durations, errors))
+        if 'clean_price' in names:
+            results.append(summarize('clean_price', bench_clean_price(scraper, iterations)))
+        if 'extract_html' in names:
+            results.append(summarize('extract_html', bench_extract_html(iterations)))
+        if 'scrape_http' in names:
+            durations, errors = bench_scrape_http(scraper, base_url, iterations)
+            results.append(summarize('scrape_http', durations, errors))
+
+        browser_names = [name for name in BENCHMARKS if name in names and name in BROWSER_BENCHMARKS]
+        if browser_names:
+            driver_pool = scraper.ChromeDriverPool(
+                functools.partial(scraper.setup_ec2_chrome_driver, remote_debugging_port=0),
+                scraper.shutdown_ec2_chrome_driver, max_size=1)
+            try:
+                driver_pool.warm()
+            except Exception as e:
+                print(f"Skipping browser benchmarks, Chrome could not be started: {e}", file=sys.stderr)
+                browser_names = []
+
+        if 'extract_in_browser' in browser_names or 'popups' in browser_names:
+            driver = driver_pool.acquire()
+            try:
+                if 'extract_in_browser' in browser_names:
+                    results.append(summarize('extract_in_browser', bench_extract_in_browser(
+                        scraper, driver, base_url, browser_iterations)))
+                if 'popups' in browser_names:
+                    results.append(summarize('popups', bench_popups(scraper, driver, base_url, browser_iterations)))
+            finally:
+                driver_pool.release(driver)
+
+        for name, page in (('scrape_static', STATIC_PAGE), ('scrape_dynamic', DYNAMIC_PAGE)):
+            if name in browser_names:
+                durations, errors = bench_scrape(scraper, driver_pool, base_url, page, browser_iterations)
+                results.append(summarize(name, durations, errors))
+
+        if 'scrape_tabs' in browser_names:
+            # Four dynamic pages per iteration; compare with four times scrape_dynamic
+            durations, errors = bench_scrape_tabs(scraper, driver_pool, base_url, browser_iterations)
+            results.append(summarize('scrape_tabs', durations, errors))
+
+        if {'scrape_static', 'scrape_dynamic', 'scrape_tabs'} & set(browser_names):
+            # Where full scrapes spent their time, from the scraper's own phase spans
+            print(scraper.get_metrics().summary_table())
+            print()
+    finally:
+        if driver_pool is not None:
+            driver_pool.close()
+        server.shutdown()
+
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return (name, metric, baseline, current, ratio) for every metric slower than allowed."""
+    baseline_by_name = {result['name']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        previous = baseline_by_name.get(result['name'])
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p90_ms'):
+            if not previous.get(metric):
+                continue
+            ratio = result[metric] / previous[metric]
+            if ratio > 1 + tolerance:
+                regressions.append((result['name'], metric, previous[metric], result[metric], ratio))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    baseline_by_name = {result['name']: result for result in (baseline or {}).get('results', [])}
+    header = f"{'Benchmark':<20}{'Iter':>6}{'Errors':>8}{'Ops/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+    if baseline_by_name:
+        header += f"{'p50 vs base':>13}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        line = (f"{result['name']:<20}{result['iterations']:>6}{result.get('errors', 0):>8}"
+                f"{result['throughput_per_s'] or 0:>10.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p90_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+        previous = baseline_by_name.get(result['name'])
+        if previous and previous.get('p50_ms'):
+            line += f"{(result['p50_ms'] / previous['p50_ms'] - 1) * 100:>+12.1f}%"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks against recorded Booking.com pages")
+    parser.add_argument('--only', action='append', choices=BENCHMARKS, metavar='NAME',
+                        help=f"Benchmark to run (repeatable, default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--no-browser', action='store_true',
+                        help="Skip the benchmarks that need Chrome")
+    parser.add_argument('--iterations', type=int, default=200,
+                        help="Iterations of the benchmarks without a browser (default: 200)")
+    parser.add_argument('--browser-iterations', type=int, default=20,
+                        help="Iterations of the Chrome benchmarks (default: 20)")
+    parser.add_argument('--import-iterations', type=int, default=10,
+                        help="Fresh interpreters started by the import_time benchmark (default: 10)")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--save-baseline', metavar='PATH', help="Store the results as a baseline")
+    parser.add_argument('--baseline', metavar='PATH',
+                        help="Compare against a stored baseline and exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed slowdown of p50/p90 against the baseline (default: 0.15)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = set(args.only or BENCHMARKS)
+    if args.no_browser:
+        names -= BROWSER_BENCHMARKS
+
+    # Paths given on the command line are relative to where the harness was started
+    output, save_baseline, baseline_path = (
+        os.path.abspath(path) if path else None for path in (args.output, args.save_baseline, args.baseline)
+    )
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(names, args.iterations, args.browser_iterations, args.import_iterations)
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+
+    print_results(results, baseline)
+
+    for path in (output, save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {path}")
+
+    status = 0
+    eager_imports = sum(result['errors'] for result in results if result['name'] == 'import_time')
+    if eager_imports:
+        print(f"FAILED import_time: {eager_imports} heavy dependencies imported at module load")
+        status = 1
+
+    if baseline is not None:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for name, metric, previous, current, ratio in regressions:
+            print(f"REGRESSION {name} {metric}: {previous:.2f}ms -> {current:.2f}ms ({(ratio - 1) * 100:+.1f}%)")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions beyond {args.tolerance:.0%} against {baseline_path}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+CSS selectors for Booking.com hotel pages, shared by the scraping, waiting and extraction code
+"""
+
+PRICE_SELECTORS = [
+    "[data-testid='price-and-discounted-price'] .prco-valign-middle-helper",
+    ".prco-valign-middle-helper",
+    ".bui-price-display__value",
+    ".sr-card__price--urgency .bui-price-display__value",
+    ".bui-price-display__original",
+    "[data-testid='price-and-discounted-price']",
+    ".bui-price-display__label",
+    ".prco-text-nowrap-helper"
+]
+
+PRICING_SECTION_SELECTORS = [
+    "[data-testid='availability-calendar-date-picker']",  # Date picker section
+    ".hprt-table",  # Room table
+    ".hp_rt_rooms_table",  # Alternative room table
+    ".availability",  # Availability section
+    "[data-testid='property-section-prices']",  # Prices section
+    ".bui-price-display",  # Price display
+    ".hprt-occupancy-occupancy-info"  # Occupancy info
+]
+
+HOTEL_NAME_SELECTORS = [
+    "h2[data-testid='header-title']",
+    ".pp-header__title",
+    "h1[data-testid='title']",
+    "h1.hp__hotel-name"
+]
+
+ADDRESS_SELECTORS = ["[data-testid='address']"]
+
+RATING_SELECTORS = ["[data-testid='review-score-component'] .ac78a73c96"]
+
+CHECKIN_SELECTORS = ["[data-testid='date-display-field-start']"]
+
+CHECKOUT_SELECTORS = ["[data-testid='date-display-field-end']"]
+
+NIGHTS_SELECTORS = ["[data-testid='price-summary'] .bp-price-summary__duration"]
+
+# Record field -> selectors tried in order; raw_price only accepts text containing a digit
+FIELD_SELECTORS = {
+    'hotel_name': HOTEL_NAME_SELECTORS,
+    'address': ADDRESS_SELECTORS,
+    'rating': RATING_SELECTORS,
+    'raw_price': PRICE_SELECTORS,
+    'checkin_date': CHECKIN_SELECTORS,
+    'checkout_date': CHECKOUT_SELECTORS,
+    'nights': NIGHTS_SELECTORS,
+}
+
+# Value used when no selector matches a field
+FIELD_DEFAULTS = {
+    'hotel_name': "Unknown",
+    'address': "Unknown",
+    'rating': "No rating",
+    'checkin_date': "Unknown",
+    'checkout_date': "Unknown",
+    'nights': "Unknown",
+}
+
+POPUP_CLOSE_SELECTORS = [
+    "[data-testid='header-banner-close-button']",
+    ".bui-modal__close",
+    ".bui-button--close",
+    "[aria-label='Close']",
+    ".close-button",
+    ".modal-close"
+]
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Change detection for scraped observations
+Remembers the last stored price and screenshot per (hotel, country, stay, guests), so
+unchanged observations can be written as a DynamoDB heartbeat without a new screenshot upload
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from job_spec import hotel_key
+
+logger = logging.getLogger(__name__)
+
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+# Matches one observation_key(); IS lets NULL stay/guest values match
+KEY_WHERE = ("hotel_key = ? AND country = ? AND checkin IS ? AND checkout IS ? "
+             "AND adults IS ? AND children IS ? AND rooms IS ?")
+
+
+def observation_key(record):
+    """Return the (hotel, country, checkin, checkout, adults, children, rooms) key of a scraped record.
+
+    Guests are part of the key because one job can price the same stay for several guest configs.
+    """
+    return (
+        hotel_key(record.get('hotel_url') or record.get('url') or ''),
+        record.get('country'),
+        record.get('requested_checkin') or record.get('checkin_date'),
+        record.get('requested_checkout') or record.get('checkout_date'),
+        record.get('adults'),
+        record.get('children'),
+        record.get('rooms'),
+    )
+
+
+def record_price(record):
+    """Return (amount, currency) of a record, parsing raw_price for records without them."""
+    if record.get('cleaned_price') is not None and record.get('currency'):
+        return record['cleaned_price'], record['currency']
+    from price_normalization import parse_price
+
+    return parse_price(record.get('raw_price'))
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 of a file, or None if it cannot be read."""
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    except (OSError, TypeError):
+        return None
+
+
+class ChangeFilter:
+    """SQLite-backed last-seen cache deciding whether an observation needs a full store.
+
+    An observation is stored in full when it is new, its price or currency changed, or the last
+    full store is at least store_every_hours old; otherwise it is only a heartbeat.
+    """
+
+    def __init__(self, path='hotel_prices/last_seen.db', store_every_hours=24):
+        self.path = path
+        self.store_every = timedelta(hours=store_every_hours)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS last_seen (
+                hotel_key TEXT NOT NULL,
+                country TEXT NOT NULL,
+                checkin TEXT,
+                checkout TEXT,
+                adults INTEGER,
+                children INTEGER,
+                rooms INTEGER,
+                amount REAL,
+                currency TEXT,
+                screenshot_sha256 TEXT,
+                screenshot_s3_url TEXT,
+                dynamodb_key TEXT,
+                stored_at TEXT NOT NULL,
+                seen_at TEXT NOT NULL,
+                PRIMARY KEY (hotel_key, country, checkin, checkout, adults, children, rooms)
+            )
+        """)
+
+    def _get(self, record):
+        with self._lock:
+            row = self._conn.execute(f"""
+                SELECT amount, currency, screenshot_sha256, screenshot_s3_url, dynamodb_key, stored_at
+                FROM last_seen WHERE {KEY_WHERE}
+            """, observation_key(record)).fetchone()
+        if row is None:
+            return None
+        return {
+            'amount': row[0],
+            'currency': row[1],
+            'screenshot_sha256': row[2],
+            'screenshot_s3_url': row[3],
+            'dynamodb_key': json.loads(row[4]) if row[4] else None,
+            'stored_at': row[5],
+        }
+
+    def classify(self, record, now=None):
+        """Return (CHANGED or UNCHANGED, reason) for a scraped record."""
+        last = self._get(record)
+        if last is None or not last['dynamodb_key']:
+            return CHANGED, 'new'
+
+        amount, currency = record_price(record)
+        if amount is None:
+            return CHANGED, 'unparsed price'
+        if amount != last['amount'] or currency != last['currency']:
+            return CHANGED, 'price'
+
+        now = now or datetime.now()
+        if now - datetime.fromisoformat(last['stored_at']) >= self.store_every:
+            return CHANGED, 'refresh'
+        return UNCHANGED, 'unchanged'
+
+    def last_stored(self, record):
+        """Return the cached state of the last full store of this observation, or None."""
+        return self._get(record)
+
+    def mark_stored(self, record, dynamodb_key, screenshot_sha256=None):
+        """Remember a record that was written in full."""
+        amount, currency = record_price(record)
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO last_seen
+                    (hotel_key, country, checkin, checkout, adults, children, rooms, amount, currency,
+                     screenshot_sha256, screenshot_s3_url, dynamodb_key, stored_at, seen_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (*observation_key(record), amount, currency, screenshot_sha256,
+                  record.get('screenshot_s3_url'), json.dumps(dynamodb_key), now, now))
+
+    def mark_seen(self, record):
+        """Record a heartbeat for an unchanged observation."""
+        with self._lock:
+            self._conn.execute(f"""
+                UPDATE last_seen SET seen_at = ? WHERE {KEY_WHERE}
+            """, (datetime.now().isoformat(), *observation_key(record)))
+
+    def forget(self, record):
+        """Drop an observation so its next scrape is stored in full, e.g. when its item is gone."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM last_seen WHERE {KEY_WHERE}", observation_key(record))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Per-country circuit breakers and deferred retries for the EC2 multi-country scraper
+Every country's outcome is persisted across runs; countries that keep failing are skipped until
+a cooldown expires, and failed targets are retried with jittered backoff at the end of a run
+"""
+
+import os
+import time
+import random
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEALTH_PATH = 'hotel_prices/country_health.db'
+
+
+class CountryHealth:
+    """SQLite-backed failure history and circuit breaker per country.
+
+    A country's breaker opens after threshold consecutive failed attempts and stays open for
+    cooldown_hours, doubled for every further failure up to max_cooldown_hours. Once the
+    cooldown expires the country gets one attempt again: a success closes the breaker, a
+    failure reopens it with the longer cooldown.
+    """
+
+    def __init__(self, path=DEFAULT_HEALTH_PATH, threshold=3, cooldown_hours=6, max_cooldown_hours=72):
+        self.path = path
+        self.threshold = threshold
+        self.cooldown = cooldown_hours * 3600
+        self.max_cooldown = max_cooldown_hours * 3600
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS country_health (
+                country TEXT PRIMARY KEY,
+                consecutive_failures INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                open_until REAL NOT NULL DEFAULT 0,
+                last_success_at TEXT,
+                last_failure_at TEXT,
+                last_error TEXT
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS country_events (
+                id INTEGER PRIMARY KEY,
+                country TEXT NOT NULL,
+                at TEXT NOT NULL,
+                succeeded INTEGER NOT NULL,
+                targets INTEGER,
+                failed_targets INTEGER,
+                error TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS country_events_country ON country_events (country, at)")
+
+    def _row(self, country):
+        return self._conn.execute("SELECT * FROM country_health WHERE country = ?", (country,)).fetchone()
+
+    def allow(self, country, now=None):
+        """Return True unless the country's breaker is open."""
+        with self._lock:
+            row = self._row(country)
+        return row is None or row['open_until'] <= (now or time.time())
+
+    def open_until(self, country):
+        """Return when the country's breaker closes again, or None if it is closed."""
+        with self._lock:
+            row = self._row(country)
+        if row is None or row['open_until'] <= time.time():
+            return None
+        return datetime.fromtimestamp(row['open_until'])
+
+    def record(self, country, succeeded, targets=None, failed_targets=None, error=None):
+        """Record one attempt at a country's batch; opens or closes its breaker accordingly."""
+        now = datetime.now()
+        with self._lock:
+            row = self._row(country)
+            consecutive = 0 if succeeded else (row['consecutive_failures'] if row else 0) + 1
+            open_until = 0
+            if consecutive >= self.threshold:
+                cooldown = min(self.max_cooldown, self.cooldown * 2 ** (consecutive - self.threshold))
+                open_until = time.time() + cooldown
+                logger.warning(f"Circuit open for {country} after {consecutive} consecutive failures, "
+                               f"skipping it for {cooldown / 3600:.1f}h")
+
+            self._conn.execute("BEGIN")
+            self._conn.execute("""
+                INSERT INTO country_health (country, consecutive_failures, successes, failures, open_until,
+                                            last_success_at, last_failure_at, last_error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (country) DO UPDATE SET
+                    consecutive_failures = excluded.consecutive_failures,
+                    successes = successes + excluded.successes,
+                    failures = failures + excluded.failures,
+                    open_until = excluded.open_until,
+                    last_success_at = COALESCE(excluded.last_success_at, last_success_at),
+                    last_failure_at = COALESCE(excluded.last_failure_at, last_failure_at),
+                    last_error = COALESCE(excluded.last_error, last_error)
+            """, (country, consecutive, int(succeeded), int(not succeeded), open_until,
+                  now.isoformat() if succeeded else None, None if succeeded else now.isoformat(),
+                  None if succeeded else error))
+            self._conn.execute("""
+                INSERT INTO country_events (country, at, succeeded, targets, failed_targets, error)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (country, now.isoformat(), int(succeeded), targets, failed_targets, error))
+            self._conn.execute("COMMIT")
+
+    def filter_schedule(self, schedule):
+        """Split a [(country, batch)] schedule into (allowed, skipped) by breaker state."""
+        allowed, skipped = [], []
+        for country, batch in schedule:
+            if self.allow(country):
+                allowed.append((country, batch))
+            else:
+                logger.warning(f"Skipping {country} ({len(batch)} targets): circuit open until "
+                               f"{self.open_until(country):%Y-%m-%d %H:%M}")
+                skipped.append((country, batch))
+        return allowed, skipped
+
+    def reset(self, country=None):
+        """Close the breaker of one country, or of all countries."""
+        with self._lock:
+            if country:
+                self._conn.execute("""
+                    UPDATE country_health SET consecutive_failures = 0, open_until = 0 WHERE country = ?
+                """, (country,))
+            else:
+                self._conn.execute("UPDATE country_health SET consecutive_failures = 0, open_until = 0")
+
+    def report(self):
+        """Return every country's history, breakers that are open first."""
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute("SELECT * FROM country_health")]
+        now = time.time()
+        for row in rows:
+            row['open_until'] = (datetime.fromtimestamp(row['open_until']).isoformat(timespec='minutes')
+                                 if row['open_until'] > now else None)
+        return sorted(rows, key=lambda row: (row['open_until'] is None, -row['consecutive_failures'], row['country']))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def retry_delay(attempt, base=30, max_delay=600):
+    """Jittered exponential backoff before retry number attempt (1, 2, ...)."""
+    return random.uniform(0.5, 1.5) * min(max_delay, base * 2 ** (attempt - 1))
+
+
+class CountryOutcomes:
+    """Collects which targets of each country succeeded or failed during a sweep.
+
+    Passed as the run state of the sweeps; calls are forwarded to an inner state if given.
+    """
+
+    def __init__(self, state=None):
+        self.state = state
+        self.done = {}
+        self.failed = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def mark_done(self, target, country):
+        if self.state is not None:
+            self.state.mark_done(target, country)
+        with self._lock:
+            self.done.setdefault(country, set()).add(target['url'])
+
+    def mark_failed(self, target, country, error=None):
+        if self.state is not None:
+            self.state.mark_failed(target, country, error)
+        with self._lock:
+            self.failed.setdefault(country, set()).add(target['url'])
+            self.errors.setdefault(country, []).append(error)
+
+    def failed_targets(self, country, batch):
+        """Targets of a batch that failed (scrape errors, missing prices) or got no outcome at all."""
+        done = self.done.get(country, set())
+        failed = self.failed.get(country, set())
+        return [target for target in batch if target['url'] in failed or target['url'] not in done]
+
+    def error(self, country):
+        """The most common error of a country's failed targets."""
+        errors = [error for error in self.errors.get(country, []) if error]
+        return max(set(errors), key=errors.count) if errors else None
+
+
+def run_with_retries(run_pass, schedule, state=None, health=None, max_retries=2, retry_backoff=30):
+    """Run a sweep, then retry failed targets with jittered backoff at the end of the run.
+
+    run_pass(schedule, state) runs one sweep over a [(country, batch)] schedule and returns
+    (record_count, successful_countries, failed_countries, failed_targets). With health, each
+    country's outcome is recorded and countries with an open breaker are skipped, also before
+    their retries. Returns the same tuple for the whole run plus the skipped countries.
+    """
+    skipped = []
+    if health is not None:
+        schedule, skipped = health.filter_schedule(schedule)
+
+    record_count = 0
+    succeeded = set()
+    attempted = []
+    retries = []  # (ready_at, country, batch)
+    attempts = {}
+    final_failed_targets = 0
+
+    current = schedule
+    while current:
+        attempted.extend(country for country, _ in current if country not in attempted)
+        outcomes = CountryOutcomes(state)
+        count, _, _, _ = run_pass(current, outcomes)
+        record_count += count
+
+        for country, batch in current:
+            failed = outcomes.failed_targets(country, batch)
+            if len(failed) < len(batch):
+                succeeded.add(country)
+            if health is not None:
+                health.record(country, len(failed) < len(batch), len(batch), len(failed),
+                              outcomes.error(country) or (None if len(failed) < len(batch) else 'no outcome'))
+            if not failed:
+                continue
+            if attempts.get(country, 0) < max_retries and (health is None or health.allow(country)):
+                attempts[country] = attempts.get(country, 0) + 1
+                delay = retry_delay(attempts[country], retry_backoff)
+                logger.info(f"Retrying {len(failed)} failed targets of {country} in {delay:.0f}s at the end of the run")
+                retries.append((time.time() + delay, country, failed))
+            else:
+                final_failed_targets += len(failed)
+
+        if not retries:
+            break
+
+        # The next round takes every retry that is due once the earliest one is
+        retries.sort(key=lambda retry: retry[0])
+        wait = retries[0][0] - time.time()
+        if wait > 0:
+            logger.info(f"Waiting {wait:.0f}s before retrying {len(retries)} countries")
+            time.sleep(wait)
+        now = time.time()
+        due = [retry for retry in retries if retry[0] <= now]
+        retries = [retry for retry in retries if retry[0] > now]
+        current = [(country, batch) for _, country, batch in due]
+        logger.info(f"Retrying {', '.join(f'{c} ({len(b)} targets, attempt {attempts[c] + 1})' for c, b in current)}")
+
+    failed_countries = [country for country in attempted if country not in succeeded]
+    successful_countries = [country for country in attempted if country in succeeded]
+    return record_count, successful_countries, failed_countries, final_failed_targets, [c for c, _ in skipped]
+
+
+def main(argv=None):
+    import argparse
+
+    from price_history import print_rows
+
+    parser = argparse.ArgumentParser(description="Show or reset per-country circuit breakers")
+    parser.add_argument('--db', default=DEFAULT_HEALTH_PATH,
+                        help=f"Country health database (default: {DEFAULT_HEALTH_PATH})")
+    parser.add_argument('--reset', nargs='?', const='', metavar='COUNTRY',
+                        help="Close the breaker of COUNTRY, or of every country without an argument")
+    args = parser.parse_args(argv)
+
+    health = CountryHealth(args.db)
+    try:
+        if args.reset is not None:
+            health.reset(args.reset or None)
+            print(f"Reset {args.reset or 'all countries'}")
+        rows = health.report()
+        if rows:
+            print_rows(rows)
+        else:
+            print(f"No country history in {args.db}")
+    finally:
+        health.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Warm Chrome WebDriver pool for the EC2 multi-country scraper
+Keeps browsers alive between countries and resets their state instead of cold-starting Chrome
+"""
+
+import os
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Origins whose storage is wiped on every reset, in addition to whatever the window was showing
+DEFAULT_STORAGE_ORIGINS = [
+    "https://www.booking.com",
+    "https://secure.booking.com",
+    "https://account.booking.com",
+]
+
+
+def _process_tree_rss_mb(root_pid):
+    """Return the summed RSS in MB of a process and all its descendants (Linux /proc only)."""
+    try:
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat', 'r') as f:
+                    stat = f.read()
+                # The command name may contain spaces, so parse after the closing parenthesis
+                ppid = int(stat.rsplit(')', 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(entry))
+            except (OSError, ValueError, IndexError):
+                continue
+
+        total_kb = 0
+        pending = [root_pid]
+        while pending:
+            pid = pending.pop()
+            pending.extend(children.get(pid, []))
+            try:
+                with open(f'/proc/{pid}/status', 'r') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total_kb += int(line.split()[1])
+                            break
+            except OSError:
+                continue
+
+        return total_kb / 1024
+    except Exception:
+        return None
+
+
+def get_driver_rss_mb(driver):
+    """Return the memory used by chromedriver and the Chrome processes it spawned, in MB."""
+    try:
+        return _process_tree_rss_mb(driver.service.process.pid)
+    except Exception:
+        return None
+
+
+def reset_driver_state(driver, storage_origins=None):
+    """Wipe cookies, storage and cache, then move the driver to a fresh window."""
+    origins = set(storage_origins or DEFAULT_STORAGE_ORIGINS)
+
+    # Remember the origins of every open window so their storage is cleared as well
+    for handle in driver.window_handles:
+        try:
+            driver.switch_to.window(handle)
+            origin = driver.execute_script("return window.location.origin;")
+            if origin and origin.startswith('http'):
+                origins.add(origin)
+        except Exception:
+            continue
+
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+    for origin in origins:
+        try:
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                'origin': origin,
+                'storageTypes': 'all'
+            })
+        except Exception as e:
+            logger.warning(f"Could not clear storage for {origin}: {e}")
+
+    # Open a new window and close everything else so no page state survives
+    old_handles = list(driver.window_handles)
+    driver.switch_to.new_window('window')
+    new_handle = driver.current_window_handle
+    for handle in old_handles:
+        try:
+            driver.switch_to.window(handle)
+            driver.close()
+        except Exception:
+            continue
+    driver.switch_to.window(new_handle)
+
+
+class ChromeDriverPool:
+    """Thread-safe pool of warm Chrome drivers that are reset between uses and recycled when worn out."""
+
+    def __init__(self, factory, teardown, max_size=1, max_pages=25, max_rss_mb=1500,
+                 storage_origins=None):
+        self.factory = factory
+        self.teardown = teardown
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.storage_origins = storage_origins
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def warm(self, count=None):
+        """Start drivers ahead of time so the first country does not pay the cold start."""
+        count = self.max_size if count is None else min(count, self.max_size)
+        for _ in range(count):
+            driver = self._create()
+            if driver is None:
+                break
+            self._idle.put(driver)
+
+    def _create(self):
+        with self._lock:
+            if self._closed or self._created >= self.max_size:
+                return None
+            self._created += 1
+
+        start = time.time()
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+        driver.pages_served = 0
+        logger.info(f"Driver pool started a new Chrome instance in {time.time() - start:.2f}s")
+        return driver
+
+    def _destroy(self, driver):
+        with self._lock:
+            self._created -= 1
+        try:
+            self.teardown(driver)
+        except Exception as e:
+            logger.warning(f"Error shutting down pooled driver: {e}")
+
+    def acquire(self, timeout=None):
+        """Return a clean driver, creating one if the pool has room."""
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            driver = self._create()
+            if driver is None:
+                driver = self._idle.get(timeout=timeout)
+
+        if driver.pages_served == 0:
+            return driver
+
+        start = time.time()
+        try:
+            reset_driver_state(driver, self.storage_origins)
+        except Exception as e:
+            logger.warning(f"Driver reset failed, replacing the instance: {e}")
+            self._destroy(driver)
+            return self.acquire(timeout=timeout)
+
+        logger.info(f"Reused pooled Chrome driver after {(time.time() - start) * 1000:.0f}ms reset")
+        return driver
+
+    def release(self, driver, discard=False, pages=1):
+        """Return a driver to the pool, recycling it when it is broken or has done enough work.
+
+        pages is how many pages the driver loaded while borrowed, e.g. one per tab.
+        """
+        driver.pages_served = getattr(driver, 'pages_served', 0) + pages
+
+        if self._closed:
+            self._destroy(driver)
+            return
+
+        reason = None
+        if discard:
+            reason = "error during scrape"
+        elif self.max_pages and driver.pages_served >= self.max_pages:
+            reason = f"served {driver.pages_served} pages"
+        elif self.max_rss_mb:
+            rss_mb = get_driver_rss_mb(driver)
+            if rss_mb is not None and rss_mb > self.max_rss_mb:
+                reason = f"RSS {rss_mb:.0f}MB above {self.max_rss_mb}MB"
+
+        if reason:
+            logger.info(f"Recycling pooled Chrome driver: {reason}")
+            self._destroy(driver)
+        else:
+            self._idle.put(driver)
+
+    def close(self):
+        """Shut down every idle driver; drivers still in use are shut down when released."""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Batched, concurrent DynamoDB writer for scraped hotel records
+Sends BatchWriteItem requests of up to 25 items from a thread pool over one pooled client,
+retrying unprocessed items with backoff and reporting an outcome per item
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, BotoCoreError
+from boto3.dynamodb.types import TypeSerializer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 25  # DynamoDB BatchWriteItem limit
+
+RETRYABLE_ERROR_CODES = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'InternalServerError',
+    'ServiceUnavailable',
+}
+
+
+def _to_dynamodb_value(value):
+    """Convert Python values the DynamoDB serializer rejects (floats) into supported types."""
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamodb_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_dynamodb_value(v) for v in value]
+    return value
+
+
+class DynamoDBBatchWriter:
+    """Writes items to one DynamoDB table with BatchWriteItem, in parallel, with retries."""
+
+    def __init__(self, table_name='scraper', region_name='eu-west-1', endpoint_url=None,
+                 key_attributes=('country_hotel', 'scraped_at'), max_workers=4,
+                 max_retries=6, base_delay=0.1, max_delay=5.0, session=None):
+        self.table_name = table_name
+        self.key_attributes = key_attributes
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        session = session or boto3.session.Session()
+        self.client = session.client(
+            'dynamodb',
+            region_name=region_name,
+            endpoint_url=endpoint_url,
+            config=Config(max_pool_connections=max(10, max_workers * 2),
+                          retries={'max_attempts': 3, 'mode': 'adaptive'})
+        )
+        self._serializer = TypeSerializer()
+
+    def _serialize(self, item):
+        return {k: self._serializer.serialize(_to_dynamodb_value(v)) for k, v in item.items()}
+
+    def _backoff(self, attempt):
+        # Full jitter keeps parallel batches from retrying in lockstep
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        time.sleep(random.uniform(0, delay))
+
+    def _item_key(self, item):
+        return tuple(item.get(attribute) for attribute in self.key_attributes)
+
+    def _serialized_key(self, serialized_item):
+        return tuple(repr(serialized_item.get(attribute)) for attribute in self.key_attributes)
+
+    def _dedupe_key(self, item):
+        return self._serialized_key(self._serialize(
+            {attribute: item[attribute] for attribute in self.key_attributes if attribute in item}))
+
+    def _write_batch(self, batch):
+        """Write one batch of (index, item) pairs; returns {index: outcome}."""
+        outcomes = {}
+        attempts = {index: 0 for index, _ in batch}
+        pending = {}
+        requests = []
+        for index, item in batch:
+            serialized = self._serialize(item)
+            pending[self._serialized_key(serialized)] = index
+            requests.append({'PutRequest': {'Item': serialized}})
+
+        attempt = 0
+        last_error = None
+        while requests:
+            for key in pending:
+                attempts[pending[key]] += 1
+
+            try:
+                response = self.client.batch_write_item(RequestItems={self.table_name: requests})
+                unprocessed = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code not in RETRYABLE_ERROR_CODES:
+                    last_error = f"{code}: {e}"
+                    break
+                last_error = code
+                unprocessed = requests
+            except BotoCoreError as e:
+                last_error = str(e)
+                unprocessed = requests
+
+            # Everything not returned as unprocessed has been written
+            still_pending = {}
+            for request in unprocessed:
+                key = self._serialized_key(request['PutRequest']['Item'])
+                if key in pending:
+                    still_pending[key] = pending.pop(key)
+            for index in pending.values():
+                outcomes[index] = {'status': 'written', 'attempts': attempts[index], 'error': None}
+            pending = still_pending
+            requests = unprocessed
+
+            if not requests:
+                break
+            if attempt >= self.max_retries:
+                last_error = last_error or 'UnprocessedItems after retries'
+                break
+
+            attempt += 1
+            self._backoff(attempt)
+
+        for index in pending.values():
+            outcomes[index] = {'status': 'failed', 'attempts': attempts[index], 'error': last_error}
+
+        return outcomes
+
+    def write_items(self, items):
+        """Write items and return a list of per-item outcomes in input order.
+
+        Each outcome is {'key': ..., 'status': 'written' | 'failed', 'attempts': n, 'error': ...}.
+        When several items share a key, the last one is written.
+        """
+        items = list(items)
+        # BatchWriteItem rejects repeated keys, so only the last item with each key is written
+        # and earlier duplicates share its outcome
+        keys = [self._dedupe_key(item) for item in items]
+        latest = {key: index for index, key in enumerate(keys)}
+        indexed = [(index, items[index]) for index in sorted(latest.values())]
+        batches = [indexed[i:i + BATCH_SIZE] for i in range(0, len(indexed), BATCH_SIZE)]
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dynamodb-writer') as executor:
+            for outcomes in executor.map(self._write_batch, batches):
+                results.update(outcomes)
+
+        return [{'key': self._item_key(item), **results[latest[key]]} for item, key in zip(items, keys)]
+
+    def _update_item(self, key, values):
+        """Set values on an existing item; returns its outcome without touching missing items."""
+        names = {f"#a{i}": name for i, name in enumerate(values)}
+        request = {
+            'TableName': self.table_name,
+            'Key': self._serialize(key),
+            'UpdateExpression': 'SET ' + ', '.join(f"#a{i} = :v{i}" for i in range(len(values))),
+            'ConditionExpression': "attribute_exists(#k)",
+            'ExpressionAttributeNames': {**names, '#k': self.key_attributes[0]},
+            'ExpressionAttributeValues': self._serialize({f":v{i}": value for i, value in enumerate(values.values())}),
+        }
+
+        last_error = None
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                self.client.update_item(**request)
+                return {'status': 'updated', 'attempts': attempt, 'error': None}
+            except ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code == 'ConditionalCheckFailedException':
+                    return {'status': 'missing', 'attempts': attempt, 'error': None}
+                last_error = f"{code}: {e}"
+                if code not in RETRYABLE_ERROR_CODES:
+                    break
+            except BotoCoreError as e:
+                last_error = str(e)
+            self._backoff(attempt)
+
+        return {'status': 'failed', 'attempts': attempt, 'error': last_error}
+
+    def update_items(self, updates):
+        """Apply (key, {attribute: value}) updates to existing items in parallel.
+
+        Returns per-update outcomes in input order with status 'updated', 'missing' (no such item,
+        nothing was written) or 'failed'.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dynamodb-writer') as executor:
+            outcomes = list(executor.map(lambda update: self._update_item(*update), updates))
+        return [{'key': self._item_key(key), **outcome} for (key, _), outcome in zip(updates, outcomes)]
+
+
+_default_writer = None
+_default_writer_lock = threading.Lock()
+
+
+def get_dynamodb_writer():
+    """Return the process-wide writer, so the boto3 session and connection pool are reused.
+
+    DYNAMODB_ENDPOINT_URL points it at DynamoDB Local (e.g. http://localhost:8000) for testing.
+    """
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = DynamoDBBatchWriter(
+                table_name=os.environ.get('DYNAMODB_TABLE', 'scraper'),
+                region_name=os.environ.get('DYNAMODB_REGION', 'eu-west-1'),
+                endpoint_url=os.environ.get('DYNAMODB_ENDPOINT_URL')
+            )
+        return _default_writer
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+HTTP-only fast path for Booking.com hotel pages
+Fetches the server-rendered HTML over a pooled requests session and evaluates the same selector
+lists as the browser path with BeautifulSoup/lxml, so Chrome is only needed when this falls short
+"""
+
+import re
+import json
+import logging
+import threading
+
+from booking_selectors import FIELD_SELECTORS, FIELD_DEFAULTS
+
+logger = logging.getLogger(__name__)
+
+# Header set of the Chrome build setup_ec2_chrome_driver pretends to be
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-GB,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Sec-Ch-Ua": '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Linux"',
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+CHALLENGE_STATUS_CODES = {202, 403, 405, 429, 503}
+
+# Lower-cased fragments of bot-check pages served instead of the hotel page
+CHALLENGE_MARKERS = [
+    "awswafintegration",
+    "challenge.js",
+    "captcha-container",
+    "px-captcha",
+    "cf-chl-",
+    "are you a robot",
+]
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="text/html; charset=...">
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([a-zA-Z0-9_-]+)', re.IGNORECASE)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_http_session(proxy=None, pool_size=10):
+    """Return the pooled session for an egress proxy (None for the host route)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _sessions_lock:
+        session = _sessions.get(proxy)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(BROWSER_HEADERS)
+            if proxy:
+                session.proxies = {'http': proxy, 'https': proxy}
+            _sessions[proxy] = session
+        return session
+
+
+def reset_http_sessions():
+    """Drop pooled sessions, e.g. after the VPN route changed and kept-alive sockets went stale."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def is_challenge_page(status_code, html):
+    """Return True if the response looks like a bot challenge instead of the hotel page."""
+    if status_code in CHALLENGE_STATUS_CODES:
+        return True
+    lowered = html[:200000].lower()
+    return any(marker in lowered for marker in CHALLENGE_MARKERS)
+
+
+def _json_ld_hotel(soup):
+    """Return the Hotel JSON-LD object embedded in the page, if any."""
+    for script in soup.select("script[type='application/ld+json']"):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and item.get('@type') in ('Hotel', 'LodgingBusiness', 'Apartment'):
+                return item
+    return None
+
+
+def extract_fields_from_html(html, field_selectors=None):
+    """Evaluate the shared selector lists (or field_selectors, in that order) against static HTML.
+
+    Returns (fields, matched) like the in-page browser extractor, with embedded JSON-LD
+    filling in the name, address and rating when their selectors miss.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'lxml')
+    fields = {}
+    matched = {}
+
+    for field, selectors in (field_selectors or FIELD_SELECTORS).items():
+        for selector in selectors:
+            try:
+                elements = soup.select(selector) if field == 'raw_price' else [soup.select_one(selector)]
+            except Exception:
+                continue
+            for element in elements:
+                if element is None:
+                    continue
+                text = element.get_text(' ', strip=True)
+                if field == 'raw_price' and not any(char.isdigit() for char in text):
+                    continue
+                fields[field] = text
+                matched[field] = selector
+                break
+            if field in matched:
+                break
+
+    hotel = _json_ld_hotel(soup)
+    if hotel:
+        if 'hotel_name' not in fields and hotel.get('name'):
+            fields['hotel_name'] = hotel['name']
+            matched['hotel_name'] = 'json-ld:name'
+        address = hotel.get('address')
+        if 'address' not in fields and isinstance(address, dict) and address.get('streetAddress'):
+            fields['address'] = address['streetAddress']
+            matched['address'] = 'json-ld:address'
+        rating = hotel.get('aggregateRating')
+        if 'rating' not in fields and isinstance(rating, dict) and rating.get('ratingValue'):
+            fields['rating'] = str(rating['ratingValue'])
+            matched['rating'] = 'json-ld:aggregateRating'
+
+    return fields, matched
+
+
+def build_hotel_data(fields, matched):
+    """Turn extracted field texts into a hotel record, filling defaults for fields that missed."""
+    from price_normalization import parse_price
+
+    hotel_data = {}
+    for field, default in FIELD_DEFAULTS.items():
+        hotel_data[field] = fields.get(field, default)
+
+    if fields.get('raw_price'):
+        hotel_data['raw_price'] = fields['raw_price']
+        hotel_data['cleaned_price'], hotel_data['currency'] = parse_price(fields['raw_price'])
+
+    hotel_data['matched_selectors'] = matched
+    return hotel_data
+
+
+def decode_html(response):
+    """Decode a page with the charset of its Content-Type header, its <meta charset> or a guess.
+
+    requests falls back to ISO-8859-1 for text/* responses without a charset, which garbles
+    non-ASCII text of UTF-8 pages such as their "€" signs.
+    """
+    encoding = None
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        encoding = response.encoding
+    if encoding is None:
+        match = META_CHARSET_PATTERN.search(response.content[:4096])
+        encoding = match.group(1).decode('ascii') if match else response.apparent_encoding
+    try:
+        return response.content.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return response.content.decode('utf-8', errors='replace')
+
+
+def fetch_hotel_page(url, proxy=None, timeout=30):
+    """Fetch a hotel page over HTTP; returns (status_code, html, is_challenge)."""
+    response = get_http_session(proxy).get(url, timeout=timeout)
+    html = decode_html(response)
+    return response.status_code, html, is_challenge_page(response.status_code, html)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Parallel, cached egress IP detection for the EC2 multi-country scraper
+Queries several IP echo services at once and keeps the first answer until the VPN connection
+changes, optionally with country and ASN metadata to confirm the exit matches the requested country
+"""
+
+import ipaddress
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+IP_SERVICES = [
+    "https://ipinfo.io/ip",
+    "https://api.ipify.org",
+    "https://checkip.amazonaws.com"
+]
+
+# Returns country, country_code and connection.asn/org for an IP
+IP_METADATA_URL = "https://ipwho.is/{ip}"
+
+
+def normalize_country_name(country):
+    """Normalize NordVPN ('United_States') and geo-IP ('United States') country names for comparison."""
+    return (country or '').replace('_', ' ').strip().lower()
+
+
+class EgressIPResolver:
+    """Resolves the egress IP per route (host route or proxy URL) and caches it per connection."""
+
+    def __init__(self, services=None, timeout=5, metadata_url=IP_METADATA_URL, max_workers=6):
+        self.services = services or IP_SERVICES
+        self.timeout = timeout
+        self.metadata_url = metadata_url
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ip-resolver')
+        self._lock = threading.Lock()
+        self._ips = {}
+        self._metadata = {}
+
+    def invalidate(self, proxy=None, all_routes=True):
+        """Forget cached answers, e.g. after the VPN connection changed."""
+        with self._lock:
+            if all_routes:
+                self._ips.clear()
+                self._metadata.clear()
+            else:
+                self._ips.pop(proxy, None)
+                self._metadata.pop(proxy, None)
+
+    def _query(self, service, proxy):
+        import requests
+
+        proxies = {'http': proxy, 'https': proxy} if proxy else None
+        response = requests.get(service, proxies=proxies, timeout=self.timeout)
+        response.raise_for_status()
+        # Echo services send bare text without a charset, so don't let requests guess one
+        ip = response.content.decode('ascii', 'ignore').strip()
+        ipaddress.ip_address(ip)  # Reject HTML error pages and other junk
+        return ip
+
+    def resolve(self, proxy=None, refresh=False):
+        """Return the egress IP for the route, or None if no service answered.
+
+        All services are queried concurrently and the first valid answer wins; the rest are
+        left to finish in the background.
+        """
+        if not refresh:
+            with self._lock:
+                if proxy in self._ips:
+                    return self._ips[proxy]
+
+        futures = [self._executor.submit(self._query, service, proxy) for service in self.services]
+        ip = None
+        try:
+            for future in as_completed(futures, timeout=self.timeout + 1):
+                try:
+                    ip = future.result()
+                    break
+                except Exception as e:
+                    logger.debug(f"IP service failed: {e}")
+        except Exception:
+            logger.warning(f"No IP service answered within {self.timeout}s")
+
+        for future in futures:
+            future.cancel()
+
+        if ip:
+            with self._lock:
+                self._ips[proxy] = ip
+        return ip
+
+    def lookup(self, proxy=None, refresh=False):
+        """Return {ip, country, country_code, asn, org} for the route's egress, or None."""
+        if not refresh:
+            with self._lock:
+                if proxy in self._metadata:
+                    return self._metadata[proxy]
+
+        ip = self.resolve(proxy, refresh=refresh)
+        if not ip:
+            return None
+
+        try:
+            import requests
+
+            proxies = {'http': proxy, 'https': proxy} if proxy else None
+            response = requests.get(self.metadata_url.format(ip=ip), proxies=proxies, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            if data.get('success') is False:
+                logger.warning(f"IP metadata lookup failed for {ip}: {data.get('message')}")
+                return None
+        except Exception as e:
+            logger.warning(f"IP metadata lookup failed for {ip}: {e}")
+            return None
+
+        connection = data.get('connection') or {}
+        metadata = {
+            'ip': ip,
+            'country': data.get('country'),
+            'country_code': data.get('country_code'),
+            'asn': connection.get('asn'),
+            'org': connection.get('org') or connection.get('isp'),
+        }
+        with self._lock:
+            self._metadata[proxy] = metadata
+        return metadata
+
+    def exit_matches(self, country, proxy=None):
+        """Return (matches, metadata) for the requested country; matches is None if unknown."""
+        metadata = self.lookup(proxy)
+        if not metadata or not metadata.get('country'):
+            return None, metadata
+        return normalize_country_name(metadata['country']) == normalize_country_name(country), metadata
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_default_resolver = None
+_default_resolver_lock = threading.Lock()
+
+
+def get_ip_resolver():
+    """Return the process-wide resolver."""
+    global _default_resolver
+    with _default_resolver_lock:
+        if _default_resolver is None:
+            _default_resolver = EgressIPResolver()
+        return _default_resolver
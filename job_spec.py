@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Job specs for the EC2 multi-country scraper
+Expands hotel URLs x date ranges x guest configs into scrape targets and groups them by VPN country
+"""
+
+import json
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GUESTS = {"adults": 2, "children": 0, "rooms": 1, "children_ages": []}
+
+
+def load_job_spec(path):
+    """Load a JSON job spec file.
+
+    Example:
+        {
+          "hotels": ["https://www.booking.com/hotel/...html",
+                     {"url": "https://www.booking.com/hotel/...html", "countries": ["Germany", "Japan"]}],
+          "date_ranges": [{"checkin": "2026-02-17", "checkout": "2026-02-24"}],
+          "guests": [{"adults": 2, "children": 0, "rooms": 1}],
+          "countries": ["Germany", "Japan", "United_States"]
+        }
+
+    "guests" and "countries" are optional; hotel-level "countries" override the top-level list.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+
+    if not spec.get('hotels'):
+        raise ValueError(f"Job spec {path} does not list any hotels")
+    if not spec.get('date_ranges'):
+        raise ValueError(f"Job spec {path} does not list any date ranges")
+
+    return spec
+
+
+def build_target_url(hotel_url, checkin, checkout, guests=None):
+    """Rewrite the checkin/checkout and guest query params of a Booking.com hotel URL."""
+    guests = {**DEFAULT_GUESTS, **(guests or {})}
+    adults = int(guests['adults'])
+    children_ages = [int(age) for age in guests.get('children_ages') or []]
+    children = int(guests.get('children') or len(children_ages))
+
+    parts = urlsplit(hotel_url)
+    overrides = {
+        'checkin': checkin,
+        'checkout': checkout,
+        'group_adults': str(adults),
+        'req_adults': str(adults),
+        'group_children': str(children),
+        'req_children': str(children),
+        'no_rooms': str(int(guests['rooms'])),
+        'room1': ','.join(['A'] * adults + [str(age) for age in children_ages]),
+    }
+
+    # Drop the params being rewritten, plus any stale child ages, and keep everything else in order
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key not in overrides and key != 'age']
+    query.extend(overrides.items())
+    query.extend(('age', str(age)) for age in children_ages)
+
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def hotel_key(hotel_url):
+    """Return a stable identifier for a hotel URL, e.g. 'eg-golden-palace-suites'."""
+    path = urlsplit(hotel_url).path.strip('/').split('/')
+    if len(path) >= 3 and path[0] == 'hotel':
+        return f"{path[1]}-{path[2].split('.')[0]}"
+    return (path[-1].split('.')[0] if path and path[-1] else 'unknown')
+
+
+def expand_job_spec(spec):
+    """Expand a job spec into a flat list of scrape targets."""
+    targets = []
+    guest_configs = spec.get('guests') or [DEFAULT_GUESTS]
+
+    for hotel in spec['hotels']:
+        if isinstance(hotel, str):
+            hotel = {'url': hotel}
+
+        for date_range in spec['date_ranges']:
+            for guests in guest_configs:
+                guests = {**DEFAULT_GUESTS, **guests}
+                targets.append({
+                    'hotel_url': hotel['url'],
+                    'url': build_target_url(hotel['url'], date_range['checkin'],
+                                            date_range['checkout'], guests),
+                    'checkin': date_range['checkin'],
+                    'checkout': date_range['checkout'],
+                    'adults': int(guests['adults']),
+                    'children': int(guests.get('children') or len(guests.get('children_ages') or [])),
+                    'rooms': int(guests['rooms']),
+                    'countries': hotel.get('countries') or spec.get('countries'),
+                })
+
+    logger.info(f"Expanded job spec into {len(targets)} targets")
+    return targets
+
+
+def group_targets_by_country(targets, available_countries):
+    """Group targets by VPN country so each connection scrapes its whole batch before switching.
+
+    Returns (country, targets) pairs in the order of available_countries.
+    """
+    available_by_name = {country.lower(): country for country in available_countries}
+    batches = {country: [] for country in available_countries}
+    unavailable = set()
+
+    for target in targets:
+        wanted = target.get('countries') or available_countries
+        for name in wanted:
+            country = available_by_name.get(name.lower())
+            if country is None:
+                unavailable.add(name)
+                continue
+            batches[country].append(target)
+
+    if unavailable:
+        logger.warning(f"Skipping countries not available in NordVPN: {', '.join(sorted(unavailable))}")
+
+    return [(country, batch) for country, batch in batches.items() if batch]
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing instrumentation for the EC2 multi-country scraper
+Spans record how long each phase (VPN connect, page load, extraction, uploads, ...) took per
+country, and the collected histograms are exported as a Prometheus textfile or a JSON file
+"""
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Label used for spans that do not belong to one country, e.g. a batched DynamoDB write
+ALL_COUNTRIES = 'all'
+
+METRIC_NAME = 'hotel_scraper_phase_seconds'
+
+
+def percentile(sorted_values, fraction):
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class MetricsRegistry:
+    """Thread-safe store of phase durations keyed by (phase, country)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._errors = {}
+
+    def observe(self, phase, seconds, country=None, failed=False):
+        key = (phase, country or ALL_COUNTRIES)
+        with self._lock:
+            self._samples.setdefault(key, []).append(seconds)
+            if failed:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    @contextmanager
+    def span(self, phase, country=None):
+        """Time the enclosed block as one observation of phase; exceptions are counted and re-raised."""
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.observe(phase, time.perf_counter() - start, country, failed)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._errors.clear()
+
+    def snapshot(self):
+        """Return {(phase, country): (sorted durations, error count)}."""
+        with self._lock:
+            return {key: (sorted(values), self._errors.get(key, 0)) for key, values in self._samples.items()}
+
+    def to_dict(self):
+        """Return histograms per phase and country as a JSON-serializable dict."""
+        histograms = []
+        for (phase, country), (values, errors) in sorted(self.snapshot().items()):
+            histograms.append({
+                'phase': phase,
+                'country': country,
+                'count': len(values),
+                'errors': errors,
+                'sum': round(sum(values), 6),
+                'p50': percentile(values, 0.5),
+                'p90': percentile(values, 0.9),
+                'max': values[-1],
+                'buckets': {str(bound): sum(1 for value in values if value <= bound) for bound in self.buckets},
+            })
+        return {'generated_at': time.time(), 'histograms': histograms}
+
+    def to_prometheus(self):
+        """Return the histograms in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of scraper phases in seconds",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        errors = []
+        for (phase, country), (values, error_count) in sorted(self.snapshot().items()):
+            labels = f'phase="{phase}",country="{country}"'
+            for bound in self.buckets:
+                count = sum(1 for value in values if value <= bound)
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {len(values)}')
+            lines.append(f'{METRIC_NAME}_sum{{{labels}}} {sum(values):.6f}')
+            lines.append(f'{METRIC_NAME}_count{{{labels}}} {len(values)}')
+            errors.append(f'hotel_scraper_phase_errors_total{{{labels}}} {error_count}')
+
+        lines.append("# HELP hotel_scraper_phase_errors_total Phases that raised an exception")
+        lines.append("# TYPE hotel_scraper_phase_errors_total counter")
+        lines.extend(errors)
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write the metrics to path: Prometheus textfile for *.prom, JSON otherwise.
+
+        The file is replaced atomically so a textfile collector never reads a partial file.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2)
+        os.replace(temp_path, path)
+        logger.info(f"Metrics written to {path}")
+
+    def summary_table(self):
+        """Return a per-phase summary across all countries as a printable table."""
+        durations = {}
+        errors = {}
+        for (phase, _), (values, error_count) in self.snapshot().items():
+            durations.setdefault(phase, []).extend(values)
+            errors[phase] = errors.get(phase, 0) + error_count
+
+        header = f"{'Phase':<18}{'Count':>7}{'Errors':>8}{'Total s':>10}{'Mean s':>9}{'p50 s':>9}{'p90 s':>9}{'Max s':>9}"
+        lines = [header, "-" * len(header)]
+        # Phases that took the most time overall come first
+        for phase, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+            values.sort()
+            total = sum(values)
+            lines.append(f"{phase:<18}{len(values):>7}{errors[phase]:>8}{total:>10.2f}{total / len(values):>9.2f}"
+                         f"{percentile(values, 0.5):>9.2f}{percentile(values, 0.9):>9.2f}{values[-1]:>9.2f}")
+        return "\n".join(lines)
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry."""
+    return _registry
+
+
+def span(phase, country=None):
+    """Time a block on the process-wide registry: `with span('page_load', country): ...`."""
+    return _registry.span(phase, country)
@@ -5,237 +5,193 @@ Specifically designed for Amazon Linux EC2 instances
 """
 
 import os
+import sys
+import glob
 import time
-import re
 import random
 import shutil
 import uuid
-import pandas as pd
-import subprocess
-import json
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.common.action_chains import ActionChains
-import tempfile
-from selenium.webdriver.common.keys import Keys
+import argparse
+import functools
 from datetime import datetime
 import logging
-import boto3
-from botocore.exceptions import ClientError
-import pymysql
-
-# Set up logging for EC2
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('hotel_scraper.log'),
-        logging.StreamHandler()
-    ]
-)
+# Selenium, boto3, pandas, requests and BeautifulSoup are imported by the functions that use them,
+# so commands that need none of them (countries, report, --help) start quickly
+from driver_pool import ChromeDriverPool
+from job_spec import load_job_spec, expand_job_spec, group_targets_by_country
+from proxy_workers import load_proxy_map, run_proxy_sweep
+from booking_selectors import (PRICE_SELECTORS, PRICING_SECTION_SELECTORS, FIELD_SELECTORS,
+                               POPUP_CLOSE_SELECTORS)
+from http_fetcher import build_hotel_data, fetch_hotel_page, extract_fields_from_html, reset_http_sessions
+from ip_resolver import get_ip_resolver
+from metrics import get_metrics, span
+from price_history import DEFAULT_HISTORY_PATH, PriceHistory, print_rows
+from change_filter import CHANGED, UNCHANGED, ChangeFilter, file_sha256
+from selector_stats import DEFAULT_SELECTOR_STATS_PATH, SelectorStats
+from run_state import RunState, task_id
+from result_sink import JsonlResultSink, RecordingSink, iter_jsonl_chunks, write_parquet_partitions
+from resource_blocking import BLOCKING_PRESETS, apply_resource_blocking
+from vpn_manager import get_vpn_manager
+from waits import (WAIT_CEILINGS, set_wait_ceilings, wait_for_document_ready, wait_for_any_selector,
+                   drain_network_events, wait_for_network_idle, wait_for_scroll_settle)
+from multi_tab import run_tabs
+from snapshot_archive import DEFAULT_SNAPSHOT_DIR, SnapshotArchive
+from country_health import DEFAULT_HEALTH_PATH, CountryHealth, run_with_retries
+from work_queue import (LeaseHeartbeat, QueueAcker, group_leases_by_country, open_work_queue,
+                        tasks_from_schedule)
+
+# Heavy dependencies that must stay out of the module's import; checked by tests/test_imports.py
+# and the import_time benchmark
+LAZY_IMPORTS = {'pandas', 'numpy', 'selenium', 'webdriver_manager', 'boto3', 'botocore', 'requests', 'bs4', 'PIL'}
+
+# Run-wide scrape behaviour, set from the command line in main()
+SCRAPE_OPTIONS = {
+    'observe_popups': False,
+    'block_preset': 'screenshot',
+    'block_patterns': [],
+    'http_first': False,
+    'screenshots': 'always',
+    'selector_stats': None,
+    'tabs': 1,
+    'tab_stagger': 0.5,
+    'snapshot_archive': None,
+}
+
 logger = logging.getLogger(__name__)
 
-def insert_hotel_data_to_dynamodb(all_hotel_data):
-    """Insert hotel data into DynamoDB"""
-    try:
-        dynamodb = boto3.resource('dynamodb', region_name='eu-west-1')
-        table = dynamodb.Table('scraper')
-
-        for data in all_hotel_data:
-            table.put_item(
-                Item={
-                    'country_hotel': data.get('country'),
-                    'scraped_at': data.get('scraped_at'),
-                    'raw_price': data.get('raw_price'),
-                    'checkin_date': data.get('checkin_date'),
-                    'checkout_date': data.get('checkout_date'),
-                    'url': data.get('url'),
-                    'ip_address': data.get('ip_address'),
-                    'screenshot': data.get('screenshot'),
-                    'screenshot_s3_url': data.get('screenshot_s3_url')
-                })
-
-        return True
+def configure_logging(log_file='hotel_scraper.log'):
+    """Set up logging for EC2: to the console and to log_file. Called by main(), not on import."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+
+def build_dynamodb_item(data):
+    """Map a scraped record onto the attributes stored in the DynamoDB table."""
+    return {
+        'country_hotel': data.get('country'),
+        'scraped_at': data.get('scraped_at'),
+        'raw_price': data.get('raw_price'),
+        'checkin_date': data.get('checkin_date'),
+        'checkout_date': data.get('checkout_date'),
+        'url': data.get('url'),
+        'ip_address': data.get('ip_address'),
+        'screenshot': data.get('screenshot'),
+        'screenshot_s3_url': data.get('screenshot_s3_url')
+    }
 
-    except Exception as e:
-        logger.error(f"Error inserting hotel data to DynamoDB: {e}")
-        return False
+def write_hotel_data_to_dynamodb(all_hotel_data):
+    """Write hotel records to DynamoDB with batched, parallel writes; returns per-record outcomes."""
+    from dynamodb_writer import get_dynamodb_writer
 
-def upload_screenshot_to_s3(local_file_path, bucket_name="apartmentscreenshots"):
-    """Upload a screenshot file to S3 bucket"""
     try:
-        # Create S3 client
-        s3_client = boto3.client('s3')
+        writer = get_dynamodb_writer()
+        with span('dynamodb_write'):
+            outcomes = writer.write_items([build_dynamodb_item(data) for data in all_hotel_data])
+    except Exception as e:
+        logger.error(f"Error inserting hotel data to DynamoDB: {e}")
+        return [{'key': None, 'status': 'failed', 'attempts': 0, 'error': str(e)} for _ in all_hotel_data]
 
-        # Extract filename from path
-        filename = os.path.basename(local_file_path)
+    failed = [outcome for outcome in outcomes if outcome['status'] != 'written']
+    for outcome in failed:
+        logger.error(f"DynamoDB write failed for {outcome['key']} after "
+                     f"{outcome['attempts']} attempts: {outcome['error']}")
 
-        # Create S3 key with timestamp prefix for organization
-        timestamp_prefix = datetime.now().strftime("%Y/%m/%d")
-        s3_key = f"hotel-scraper/{timestamp_prefix}/{filename}"
+    logger.info(f"DynamoDB: {len(outcomes) - len(failed)}/{len(outcomes)} records written")
+    return outcomes
 
-        # Upload file
-        logger.info(f"Uploading {filename} to S3 bucket {bucket_name}")
-        s3_client.upload_file(local_file_path, bucket_name, s3_key)
+def insert_hotel_data_to_dynamodb(all_hotel_data):
+    """Insert hotel data into DynamoDB with batched, parallel writes.
 
-        # Generate S3 URL
-        s3_url = f"s3://{bucket_name}/{s3_key}"
-        logger.info(f"Screenshot uploaded successfully: {s3_url}")
+    Returns True only if every record was written; failures are logged per record.
+    """
+    return all(outcome['status'] == 'written' for outcome in write_hotel_data_to_dynamodb(all_hotel_data))
 
-        return s3_url
+def heartbeat_hotel_data_in_dynamodb(keys_and_records):
+    """Set last_seen_at on the stored items of unchanged records; returns per-record outcomes.
 
-    except ClientError as e:
-        logger.error(f"Failed to upload screenshot to S3: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error uploading to S3: {e}")
-        return None
+    keys_and_records is a list of (DynamoDB key of the last full item, record).
+    """
+    from dynamodb_writer import get_dynamodb_writer
 
-def get_nordvpn_countries():
-    """Get list of available NordVPN countries - EC2 optimized."""
     try:
-        logger.info("Getting available NordVPN countries...")
-
-        # First check if NordVPN daemon is running
-        daemon_check = subprocess.run(['systemctl', 'is-active', 'nordvpnd'],
-                                    capture_output=True, text=True)
-        if daemon_check.returncode != 0:
-            logger.info("Starting NordVPN daemon...")
-            subprocess.run(['sudo', 'systemctl', 'start', 'nordvpnd'], check=False)
-            time.sleep(5)
+        writer = get_dynamodb_writer()
+        with span('dynamodb_heartbeat'):
+            outcomes = writer.update_items([
+                (key, {'last_seen_at': data.get('scraped_at'), 'last_seen_ip': data.get('ip_address')})
+                for key, data in keys_and_records
+            ])
+    except Exception as e:
+        logger.error(f"Error updating DynamoDB heartbeats: {e}")
+        return [{'key': key, 'status': 'failed', 'attempts': 0, 'error': str(e)} for key, _ in keys_and_records]
 
-        result = subprocess.run(['nordvpn', 'countries'], capture_output=True, text=True, timeout=30)
+    for outcome in outcomes:
+        if outcome['status'] == 'failed':
+            logger.error(f"DynamoDB heartbeat failed for {outcome['key']}: {outcome['error']}")
+    logger.info(f"DynamoDB: {sum(1 for o in outcomes if o['status'] == 'updated')}/{len(outcomes)} heartbeats written")
+    return outcomes
 
-        if result.returncode == 0:
-            countries_text = result.stdout.strip()
-            logger.info(f"NordVPN countries output: {countries_text[:200]}...")
+def upload_screenshot_to_s3(local_file_path, bucket_name="apartmentscreenshots"):
+    """Upload a screenshot file to S3 bucket"""
+    from screenshot_uploader import get_screenshot_uploader
 
-            countries = []
+    return get_screenshot_uploader(bucket_name).upload(local_file_path)
 
-            if ',' in countries_text:
-                countries = [country.strip() for country in countries_text.split(',') if country.strip()]
-            else:
-                lines = countries_text.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('-') and not line.startswith('Available'):
-                        parts = line.split()
-                        for part in parts:
-                            if len(part) > 2 and part.isalpha():
-                                countries.append(part)
-
-            # Filter and clean country names
-            unique_countries = []
-            seen = set()
-            for country in countries:
-                country_clean = country.strip().replace(',', '').replace('.', '')
-                if (len(country_clean) > 2 and
-                    country_clean.isalpha() and
-                    country_clean.lower() not in seen and
-                    country_clean.lower() not in ['available', 'countries', 'nordvpn']):
-                    unique_countries.append(country_clean)
-                    seen.add(country_clean.lower())
-
-            logger.info(f"Found {len(unique_countries)} available countries")
-            return unique_countries
-        else:
-            logger.error(f"Error getting NordVPN countries: {result.stderr}")
-            return []
-
-    except subprocess.TimeoutExpired:
-        logger.error("Timeout getting NordVPN countries")
-        return []
-    except Exception as e:
-        logger.error(f"Error getting NordVPN countries: {e}")
-        return []
+def get_nordvpn_countries():
+    """Get list of available NordVPN countries - EC2 optimized, cached between runs."""
+    return get_vpn_manager().countries()
 
 def connect_to_nordvpn_country(country):
     """Connect to a specific NordVPN country - EC2 optimized."""
-    try:
-        logger.info(f"Connecting to NordVPN country: {country}")
-
-        # Disconnect first
-        subprocess.run(['nordvpn', 'disconnect'], capture_output=True, text=True, timeout=30)
-        time.sleep(3)
-
-        # Connect to country
-        result = subprocess.run(['nordvpn', 'connect', country], capture_output=True, text=True, timeout=90)
-
-        if result.returncode == 0:
-            logger.info(f"Successfully connected to {country}")
+    with span('vpn_connect', country):
+        connected = get_vpn_manager().connect(country)
 
-            # Wait longer for EC2 connection to stabilize
-            time.sleep(15)
-
-            # Verify connection
-            status_result = subprocess.run(['nordvpn', 'status'], capture_output=True, text=True, timeout=30)
-            if status_result.returncode == 0:
-                logger.info(f"Connection status: {status_result.stdout.strip()}")
-
-            return True
-        else:
-            logger.error(f"Failed to connect to {country}: {result.stderr}")
-            return False
-
-    except subprocess.TimeoutExpired:
-        logger.error(f"Timeout connecting to {country}")
-        return False
-    except Exception as e:
-        logger.error(f"Error connecting to {country}: {e}")
-        return False
+    # Kept-alive HTTP connections and the cached egress IP belong to the previous route
+    get_ip_resolver().invalidate()
+    if connected:
+        reset_http_sessions()
+    return connected
 
 def disconnect_nordvpn():
     """Disconnect from NordVPN - EC2 optimized."""
-    try:
-        logger.info("Disconnecting from NordVPN...")
-        result = subprocess.run(['nordvpn', 'disconnect'], capture_output=True, text=True, timeout=30)
+    get_ip_resolver().invalidate()
+    with span('vpn_disconnect'):
+        return get_vpn_manager().disconnect()
+
+def get_current_ip(proxy=None):
+    """Get current IP address - EC2 optimized.
+
+    When a proxy URL is given, the egress IP of that proxy is returned instead. Answers are
+    cached until the VPN connection changes.
+    """
+    return get_ip_resolver().resolve(proxy) or "Unknown"
+
+def check_exit_country(country, proxy=None):
+    """Log whether the egress geolocates to the requested country; returns the IP metadata."""
+    with span('ip_lookup', country):
+        matches, metadata = get_ip_resolver().exit_matches(country, proxy)
+    if matches is False:
+        logger.warning(f"Exit for {country} geolocates to {metadata['country']} "
+                       f"({metadata['ip']}, {metadata['org']})")
+    elif matches:
+        logger.info(f"Exit for {country} confirmed: {metadata['ip']} ({metadata['org']})")
+    return metadata
+
+def setup_ec2_chrome_driver(proxy_server=None, remote_debugging_port=9222):
+    """Set up Chrome WebDriver optimized for EC2 using pip-only approach.
+
+    proxy_server routes all browser traffic through a proxy; parallel workers pass
+    remote_debugging_port=0 so each Chrome picks its own free port.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
 
-        if result.returncode == 0:
-            logger.info("Successfully disconnected from NordVPN")
-            time.sleep(5)
-            return True
-        else:
-            logger.error(f"Error disconnecting from NordVPN: {result.stderr}")
-            return False
-
-    except subprocess.TimeoutExpired:
-        logger.error("Timeout disconnecting from NordVPN")
-        return False
-    except Exception as e:
-        logger.error(f"Error disconnecting from NordVPN: {e}")
-        return False
-
-def get_current_ip():
-    """Get current IP address - EC2 optimized."""
-    try:
-        # Try multiple IP services for reliability
-        services = [
-            "https://ipinfo.io/ip",
-            "https://api.ipify.org",
-            "https://checkip.amazonaws.com"
-        ]
-
-        for service in services:
-            try:
-                result = subprocess.run(["curl", "-s", "--max-time", "10", service],
-                                      capture_output=True, text=True)
-                if result.returncode == 0 and result.stdout.strip():
-                    return result.stdout.strip()
-            except:
-                continue
-
-        return "Unknown"
-    except:
-        return "Unknown"
-
-def setup_ec2_chrome_driver():
-    """Set up Chrome WebDriver optimized for EC2 using pip-only approach."""
     chrome_options = Options()
 
     # EC2-specific Chrome options for pip-only setup
@@ -248,7 +204,7 @@ def setup_ec2_chrome_driver():
     chrome_options.add_argument("--disable-popup-blocking")
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--remote-debugging-port=9222")
+    chrome_options.add_argument(f"--remote-debugging-port={remote_debugging_port}")
     chrome_options.add_argument("--disable-web-security")
     chrome_options.add_argument("--disable-features=VizDisplayCompositor")
     chrome_options.add_argument("--disable-application-cache")
@@ -269,6 +225,9 @@ def setup_ec2_chrome_driver():
     chrome_options.add_argument("--disable-features=TranslateUI")
     chrome_options.add_argument("--disable-ipc-flooding-protection")
 
+    if proxy_server:
+        chrome_options.add_argument(f"--proxy-server={proxy_server}")
+
     # Memory optimization for EC2
     chrome_options.add_argument("--memory-pressure-off")
     chrome_options.add_argument("--max_old_space_size=4096")
@@ -284,6 +243,9 @@ def setup_ec2_chrome_driver():
     # User agent
     chrome_options.add_argument("--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
 
+    # Expose CDP Network events through the performance log for network-idle waits
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
     # Exclude automation flags
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
@@ -341,88 +303,122 @@ def setup_ec2_chrome_driver():
     driver.temp_dir = temp_dir
     return driver
 
-def extract_hotel_info_and_price(driver):
-    """Extract hotel information and price from Booking.com page."""
-    hotel_data = {}
-
+def shutdown_ec2_chrome_driver(driver):
+    """Quit a Chrome WebDriver and remove its temporary profile directory."""
+    temp_dir = getattr(driver, 'temp_dir', None)
     try:
-        # Hotel name
-        hotel_name_selectors = [
-            "h2[data-testid='header-title']",
-            ".pp-header__title",
-            "h1[data-testid='title']",
-            "h1.hp__hotel-name"
-        ]
+        driver.quit()
+    except:
+        pass
 
-        for selector in hotel_name_selectors:
-            try:
-                hotel_name = driver.find_element(By.CSS_SELECTOR, selector)
-                hotel_data['hotel_name'] = hotel_name.text.strip()
-                break
-            except:
-                continue
+    # Clean up temp directory
+    if temp_dir and os.path.exists(temp_dir):
+        try:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            logger.info(f"Cleaned up temp directory: {temp_dir}")
+        except Exception as e:
+            logger.warning(f"Could not clean up temp directory {temp_dir}: {e}")
+
+# Evaluates every selector list in the page and returns {fields: {...}, matched: {...}} in one round trip
+IN_PAGE_EXTRACTION_SCRIPT = """
+    const fieldSelectors = arguments[0];
+    const fields = {};
+    const matched = {};
+    for (const [field, selectors] of Object.entries(fieldSelectors)) {
+        for (const selector of selectors) {
+            let elements;
+            try {
+                elements = field === 'raw_price'
+                    ? Array.from(document.querySelectorAll(selector))
+                    : [document.querySelector(selector)].filter(Boolean);
+            } catch (e) {
+                continue;
+            }
+            for (const element of elements) {
+                const text = (element.innerText || '').trim();
+                if (field === 'raw_price' && !/\\d/.test(text)) continue;
+                fields[field] = text;
+                matched[field] = selector;
+                break;
+            }
+            if (field in matched) break;
+        }
+    }
+    return {fields: fields, matched: matched};
+"""
 
-        if 'hotel_name' not in hotel_data:
-            hotel_data['hotel_name'] = "Unknown"
+def ordered_field_selectors():
+    """FIELD_SELECTORS with each list in recent hit-rate order when selector statistics are on."""
+    stats = SCRAPE_OPTIONS['selector_stats']
+    return stats.ordered_fields(FIELD_SELECTORS) if stats is not None else FIELD_SELECTORS
 
-        # Hotel address
-        try:
-            address = driver.find_element(By.CSS_SELECTOR, "[data-testid='address']")
-            hotel_data['address'] = address.text.strip()
-        except:
-            hotel_data['address'] = "Unknown"
+def ordered_pricing_section_selectors():
+    stats = SCRAPE_OPTIONS['selector_stats']
+    return (stats.ordered('pricing_section', PRICING_SECTION_SELECTORS) if stats is not None
+            else PRICING_SECTION_SELECTORS)
 
-        # Rating
-        try:
-            rating = driver.find_element(By.CSS_SELECTOR, "[data-testid='review-score-component'] .ac78a73c96")
-            hotel_data['rating'] = rating.text.strip()
-        except:
-            hotel_data['rating'] = "No rating"
-
-        # Price extraction with multiple selectors
-        price_selectors = [
-            "[data-testid='price-and-discounted-price'] .prco-valign-middle-helper",
-            ".prco-valign-middle-helper",
-            ".bui-price-display__value",
-            ".sr-card__price--urgency .bui-price-display__value",
-            ".bui-price-display__original",
-            "[data-testid='price-and-discounted-price']",
-            ".bui-price-display__label",
-            ".prco-text-nowrap-helper"
-        ]
+def record_selector_hits(field_selectors, matched):
+    """Record which selector matched each field of a page in the selector statistics."""
+    stats = SCRAPE_OPTIONS['selector_stats']
+    if stats is None:
+        return
+    try:
+        stats.record_page(field_selectors, matched)
+    except Exception as e:
+        logger.warning(f"Could not record selector statistics: {e}")
+
+def extract_hotel_info_in_page(driver, field_selectors=None):
+    """Extract hotel information and price with a single execute_script round trip."""
+    result = driver.execute_script(IN_PAGE_EXTRACTION_SCRIPT, field_selectors or FIELD_SELECTORS)
+    if not isinstance(result, dict) or 'fields' not in result:
+        raise ValueError(f"Unexpected in-page extraction result: {result!r}")
+    return build_hotel_data(result['fields'], result.get('matched') or {})
+
+def extract_hotel_info_per_selector(driver, field_selectors=None):
+    """Extract hotel information and price with one WebDriver lookup per selector."""
+    from selenium.webdriver.common.by import By
 
-        for selector in price_selectors:
+    fields = {}
+    matched = {}
+
+    for field, selectors in (field_selectors or FIELD_SELECTORS).items():
+        for selector in selectors:
             try:
-                price_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                if price_elements:
-                    for element in price_elements:
+                # find_elements returns an empty list on a miss instead of raising
+                elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                if field == 'raw_price':
+                    for element in elements:
                         price_text = element.text.strip()
                         if price_text and any(char.isdigit() for char in price_text):
-                            hotel_data['raw_price'] = price_text
-                            hotel_data['cleaned_price'] = clean_price(price_text)
+                            fields[field] = price_text
                             break
-                    if 'raw_price' in hotel_data:
-                        break
-            except:
+                elif elements:
+                    fields[field] = elements[0].text.strip()
+            except Exception:
                 continue
 
-        # Extract dates
-        try:
-            checkin_element = driver.find_element(By.CSS_SELECTOR, "[data-testid='date-display-field-start']")
-            checkout_element = driver.find_element(By.CSS_SELECTOR, "[data-testid='date-display-field-end']")
-            hotel_data['checkin_date'] = checkin_element.text.strip()
-            hotel_data['checkout_date'] = checkout_element.text.strip()
-        except:
-            hotel_data['checkin_date'] = "Unknown"
-            hotel_data['checkout_date'] = "Unknown"
-
-        # Extract nights
-        try:
-            nights_element = driver.find_element(By.CSS_SELECTOR, "[data-testid='price-summary'] .bp-price-summary__duration")
-            hotel_data['nights'] = nights_element.text.strip()
-        except:
-            hotel_data['nights'] = "Unknown"
+            if field in fields:
+                matched[field] = selector
+                break
+
+    return build_hotel_data(fields, matched)
+
+def extract_hotel_info_and_price(driver):
+    """Extract hotel information and price from Booking.com page.
 
+    Selectors are tried in recent hit-rate order, and the ones that matched are recorded.
+    """
+    field_selectors = ordered_field_selectors()
+    try:
+        hotel_data = extract_hotel_info_in_page(driver, field_selectors)
+        record_selector_hits(field_selectors, hotel_data['matched_selectors'])
+        return hotel_data
+    except Exception as e:
+        logger.warning(f"In-page extraction failed, falling back to per-selector lookups: {e}")
+
+    try:
+        hotel_data = extract_hotel_info_per_selector(driver, field_selectors)
+        record_selector_hits(field_selectors, hotel_data['matched_selectors'])
         return hotel_data
 
     except Exception as e:
@@ -439,120 +435,137 @@ def extract_hotel_info_and_price(driver):
         }
 
 def clean_price(price_text):
-    """Clean and convert price text to float."""
-    try:
-        cleaned = re.sub(r'[^\d.,]', '', price_text)
-
-        if ',' in cleaned and '.' in cleaned:
-            cleaned = cleaned.replace(',', '')
-        elif ',' in cleaned and len(cleaned.split(',')[-1]) == 3:
-            cleaned = cleaned.replace(',', '')
-        elif ',' in cleaned and len(cleaned.split(',')[-1]) <= 2:
-            cleaned = cleaned.replace(',', '.')
+    """Clean and convert price text to float; see price_normalization for the parsing rules."""
+    from price_normalization import parse_price
+
+    return parse_price(price_text)[0]
+
+# Clicks every visible close button at once and returns the selectors that matched.
+# With arguments[1] set, a MutationObserver keeps dismissing banners that appear later.
+DISMISS_POPUPS_SCRIPT = """
+    const selectors = arguments[0];
+    const dismiss = () => {
+        const closed = [];
+        for (const selector of selectors) {
+            let buttons;
+            try {
+                buttons = document.querySelectorAll(selector);
+            } catch (e) {
+                continue;
+            }
+            for (const button of buttons) {
+                if (button.disabled || button.getClientRects().length === 0) continue;
+                button.click();
+                if (!closed.includes(selector)) closed.push(selector);
+            }
+        }
+        return closed;
+    };
+    const closed = dismiss();
+    if (arguments[1] && !window.__popupObserver && document.body) {
+        let scheduled = false;
+        window.__popupObserver = new MutationObserver(() => {
+            if (scheduled) return;
+            scheduled = true;
+            requestAnimationFrame(() => { scheduled = false; dismiss(); });
+        });
+        window.__popupObserver.observe(document.body, {childList: true, subtree: true});
+    }
+    return closed;
+"""
 
-        return float(cleaned)
-    except:
-        return None
+def handle_booking_popups(driver, observe=False):
+    """Handle popups on Booking.com.
 
-def handle_booking_popups(driver):
-    """Handle popups on Booking.com."""
+    Dismisses every known popup in one in-page check; with observe=True, popups appearing
+    later on the same page are dismissed automatically.
+    """
     try:
-        popup_selectors = [
-            "[data-testid='header-banner-close-button']",
-            ".bui-modal__close",
-            ".bui-button--close",
-            "[aria-label='Close']",
-            ".close-button",
-            ".modal-close"
-        ]
-
-        for selector in popup_selectors:
-            try:
-                close_button = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.CSS_SELECTOR, selector))
-                )
-                close_button.click()
-                time.sleep(1)
-                logger.info(f"Closed popup using selector: {selector}")
-                return True
-            except:
-                continue
-
-        return False
-    except:
+        closed = driver.execute_script(DISMISS_POPUPS_SCRIPT, POPUP_CLOSE_SELECTORS, observe) or []
+        for selector in closed:
+            logger.info(f"Closed popup using selector: {selector}")
+        return bool(closed)
+    except Exception as e:
+        logger.warning(f"Could not dismiss popups: {e}")
         return False
 
-def scrape_hotel_for_country(hotel_url, country):
-    """Scrape hotel price for a specific country - EC2 optimized."""
-    driver = setup_ec2_chrome_driver()
-
+def archive_page_source(hotel_data, html):
+    """Store the page's HTML in the snapshot archive, if enabled, and reference it from the record."""
+    archive = SCRAPE_OPTIONS['snapshot_archive']
+    if archive is None:
+        return
     try:
-        logger.info(f"Scraping hotel for country: {country}")
-        current_ip = get_current_ip()
-        logger.info(f"Current IP: {current_ip}")
+        with span('snapshot', hotel_data.get('country')):
+            hotel_data['page_snapshot'] = archive.put(html)
+    except Exception as e:
+        logger.warning(f"Could not archive page source: {e}")
 
-        # Navigate to hotel URL with longer timeout for EC2
-        driver.set_page_load_timeout(60)
-        driver.get(hotel_url)
-        time.sleep(8)  # Longer wait for EC2
+def harvest_hotel_page(driver, hotel_url, country, current_ip, wait_for_content=True):
+    """Dismiss popups, extract the hotel record and take the screenshot of a loaded page.
 
-        # Handle popups
-        handle_booking_popups(driver)
+    With wait_for_content=False the caller has already waited for the price section, e.g.
+    the multi-tab loader, whose tabs share one performance log.
+    """
+    from selenium.webdriver.common.by import By
 
-        # Wait for page load
-        try:
-            WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-        except TimeoutException:
-            logger.warning("Timeout waiting for page to load")
+    # Handle popups
+    with span('popups', country):
+        handle_booking_popups(driver, observe=SCRAPE_OPTIONS['observe_popups'])
 
-        time.sleep(5)
+    # Wait for the price/availability section and for late XHRs to settle
+    if wait_for_content:
+        with span('content_wait', country):
+            if not wait_for_any_selector(driver, PRICE_SELECTORS + PRICING_SECTION_SELECTORS):
+                logger.warning("No price or availability section appeared")
+            wait_for_network_idle(driver)
 
-        # Extract hotel data
+    # Extract hotel data
+    with span('extraction', country):
         hotel_data = extract_hotel_info_and_price(driver)
-        hotel_data['country'] = country
-        hotel_data['scraped_at'] = datetime.now().isoformat()
-        hotel_data['url'] = hotel_url
-        hotel_data['ip_address'] = current_ip
-
-        # Scroll to pricing section and take screenshot
-        os.makedirs("screenshots", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # Include milliseconds
-        screenshot_file = f"screenshots/hotel_{country}_{timestamp}.png"
-        logger.info(f"Taking screenshot: {screenshot_file}")
-
+    hotel_data['country'] = country
+    hotel_data['scraped_at'] = datetime.now().isoformat()
+    hotel_data['url'] = hotel_url
+    hotel_data['ip_address'] = current_ip
+    archive_page_source(hotel_data, driver.page_source)
+
+    # Scroll to pricing section and take screenshot
+    os.makedirs("screenshots", exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # Include milliseconds
+    screenshot_file = f"screenshots/hotel_{country}_{timestamp}.png"
+    logger.info(f"Taking screenshot: {screenshot_file}")
+
+    with span('screenshot', country):
         try:
             # Try to find and scroll to the availability/pricing section
-            pricing_selectors = [
-                "[data-testid='availability-calendar-date-picker']",  # Date picker section
-                ".hprt-table",  # Room table
-                ".hp_rt_rooms_table",  # Alternative room table
-                ".availability",  # Availability section
-                "[data-testid='property-section-prices']",  # Prices section
-                ".bui-price-display",  # Price display
-                ".hprt-occupancy-occupancy-info"  # Occupancy info
-            ]
-
             pricing_element = None
+            pricing_selectors = ordered_pricing_section_selectors()
             for selector in pricing_selectors:
                 try:
-                    pricing_element = driver.find_element(By.CSS_SELECTOR, selector)
-                    if pricing_element:
-                        logger.info(f"Found pricing section with selector: {selector}")
-                        break
-                except:
+                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                except Exception:
                     continue
+                if elements:
+                    pricing_element = elements[0]
+                    logger.info(f"Found pricing section with selector: {selector}")
+                    break
+            record_selector_hits({'pricing_section': pricing_selectors},
+                                 {'pricing_section': selector} if pricing_element else {})
 
             if pricing_element:
                 # Scroll to the pricing section
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", pricing_element)
-                time.sleep(3)  # Wait for scroll to complete
+                driver.execute_script("arguments[0].scrollIntoView({behavior: 'instant', block: 'center'});", pricing_element)
+                wait_for_scroll_settle(driver)
                 logger.info("Scrolled to pricing section")
+
+                # Remember where the section sits in the viewport so the upload can be clipped to it
+                hotel_data['screenshot_clip'] = driver.execute_script(
+                    "const r = arguments[0].getBoundingClientRect();"
+                    "return {x: r.left, y: r.top, width: r.width, height: r.height,"
+                    " device_pixel_ratio: window.devicePixelRatio};", pricing_element)
             else:
                 # Fallback: scroll down to middle of page
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight / 2);")
-                time.sleep(2)
+                wait_for_scroll_settle(driver)
                 logger.info("Scrolled to middle of page as fallback")
 
         except Exception as e:
@@ -560,162 +573,1009 @@ def scrape_hotel_for_country(hotel_url, country):
             # Continue with screenshot anyway
 
         driver.save_screenshot(screenshot_file)
-        hotel_data['screenshot'] = screenshot_file
-        hotel_data['screenshot_s3_url'] = None  # Will be set after VPN disconnect
-        logger.info(f"Screenshot saved: {screenshot_file}")
+    hotel_data['screenshot'] = screenshot_file
+    hotel_data['screenshot_s3_url'] = None  # Will be set after VPN disconnect
+    hotel_data['fetch_method'] = 'browser'
+    logger.info(f"Screenshot saved: {screenshot_file}")
+
+    logger.info(f"Successfully scraped hotel data for {country}: {hotel_data.get('hotel_name', 'Unknown')} - {hotel_data.get('raw_price', 'No price')}")
+
+    return hotel_data
+
+def scrape_error_record(hotel_url, country, error, ip_address):
+    """Record returned in place of hotel data when a scrape fails."""
+    return {
+        'country': country,
+        'hotel_name': 'Error',
+        'address': 'Error',
+        'rating': 'Error',
+        'raw_price': f'Error: {str(error)}',
+        'cleaned_price': None,
+        'checkin_date': 'Error',
+        'checkout_date': 'Error',
+        'nights': 'Error',
+        'scraped_at': datetime.now().isoformat(),
+        'url': hotel_url,
+        'ip_address': ip_address,
+        'screenshot': None
+    }
 
-        logger.info(f"Successfully scraped hotel data for {country}: {hotel_data.get('hotel_name', 'Unknown')} - {hotel_data.get('raw_price', 'No price')}")
+def scrape_failure(hotel_data):
+    """Return why a scraped record is not a usable observation, or None when it is.
+
+    Error records from scrape_error_record and pages on which no price selector matched
+    (no raw_price, or the 'No price found' placeholder) are failures.
+    """
+    if not hotel_data:
+        return 'No data'
+    raw_price = hotel_data.get('raw_price')
+    if hotel_data.get('hotel_name') == 'Error' or str(raw_price or '').startswith('Error'):
+        return raw_price or 'Scrape error'
+    if not raw_price or raw_price == 'No price found':
+        return 'No price found'
+    return None
+
+def scrape_hotel_for_country(hotel_url, country, driver_pool=None, proxy=None):
+    """Scrape hotel price for a specific country - EC2 optimized.
+
+    When a driver pool is given, a warm driver is borrowed from it instead of starting Chrome.
+    proxy is the egress proxy the driver uses, if any, so the reported IP matches it.
+    """
+    with span('driver_setup', country):
+        if driver_pool is not None:
+            driver = driver_pool.acquire()
+        else:
+            driver = setup_ec2_chrome_driver()
+    scrape_failed = False
 
-        return hotel_data
+    try:
+        logger.info(f"Scraping hotel for country: {country}")
+        with span('ip_lookup', country):
+            current_ip = get_current_ip(proxy)
+        logger.info(f"Current IP: {current_ip}")
+
+        # Navigate to hotel URL with longer timeout for EC2
+        driver.set_page_load_timeout(60)
+        apply_resource_blocking(driver, SCRAPE_OPTIONS['block_preset'], SCRAPE_OPTIONS['block_patterns'])
+        drain_network_events(driver)
+        with span('page_load', country):
+            driver.get(hotel_url)
+            wait_for_document_ready(driver)
+
+        return harvest_hotel_page(driver, hotel_url, country, current_ip)
 
     except Exception as e:
         logger.error(f"Error scraping hotel for {country}: {str(e)}")
-        return {
-            'country': country,
-            'hotel_name': 'Error',
-            'address': 'Error',
-            'rating': 'Error',
-            'raw_price': f'Error: {str(e)}',
-            'cleaned_price': None,
-            'checkin_date': 'Error',
-            'checkout_date': 'Error',
-            'nights': 'Error',
-            'scraped_at': datetime.now().isoformat(),
-            'url': hotel_url,
-            'ip_address': get_current_ip(),
-            'screenshot': None
-        }
+        scrape_failed = True
+        return scrape_error_record(hotel_url, country, e, get_current_ip(proxy))
 
     finally:
         # Cleanup
-        temp_dir = getattr(driver, 'temp_dir', None)
+        with span('driver_release', country):
+            if driver_pool is not None:
+                driver_pool.release(driver, discard=scrape_failed)
+            else:
+                shutdown_ec2_chrome_driver(driver)
+
+def scrape_hotels_in_tabs(targets, country, driver_pool=None, proxy=None, max_tabs=4):
+    """Scrape several targets in concurrent tabs of one Chrome instance under the same egress.
+
+    Yields (target, hotel_data) in the order the tabs become ready; failed targets get an
+    error record like scrape_hotel_for_country.
+    """
+    with span('driver_setup', country):
+        if driver_pool is not None:
+            driver = driver_pool.acquire()
+        else:
+            driver = setup_ec2_chrome_driver()
+    scrape_failed = False
+    pages = 0
+
+    try:
+        with span('ip_lookup', country):
+            current_ip = get_current_ip(proxy)
+        logger.info(f"Scraping {len(targets)} targets for {country} in up to {max_tabs} tabs, IP {current_ip}")
+
+        driver.set_page_load_timeout(60)
+
+        def block(tab_driver):
+            apply_resource_blocking(tab_driver, SCRAPE_OPTIONS['block_preset'], SCRAPE_OPTIONS['block_patterns'])
+
+        def harvest(tab_driver, target, ready):
+            if not ready:
+                logger.warning(f"No price or availability section appeared for {target['url']}")
+            return harvest_hotel_page(tab_driver, target['url'], country, current_ip, wait_for_content=False)
+
+        for target, result, load_seconds in run_tabs(
+                driver, targets, lambda target: target['url'], harvest, max_tabs=max_tabs,
+                ready_selectors=PRICE_SELECTORS + PRICING_SECTION_SELECTORS,
+                timeout=WAIT_CEILINGS['document_ready'] + WAIT_CEILINGS['price_selectors'],
+                prepare=block, open_interval=SCRAPE_OPTIONS['tab_stagger'],
+                max_rss_mb=driver_pool.max_rss_mb if driver_pool is not None else None):
+            pages += 1
+            get_metrics().observe('page_load', load_seconds, country, failed=isinstance(result, Exception))
+            if isinstance(result, Exception):
+                logger.error(f"Error scraping hotel for {country} in a tab: {result}")
+                result = scrape_error_record(target['url'], country, result, current_ip)
+            yield target, result
+
+    except Exception as e:
+        logger.error(f"Multi-tab scrape failed for {country}: {e}")
+        scrape_failed = True
+        raise
+
+    finally:
+        with span('driver_release', country):
+            if driver_pool is not None:
+                driver_pool.release(driver, discard=scrape_failed, pages=max(pages, 1))
+            else:
+                shutdown_ec2_chrome_driver(driver)
+
+# Subcommands of main(); heavy dependencies are only imported by the ones that need them
+COMMANDS = ('countries', 'scrape', 'upload', 'report')
+
+DEFAULT_HOTEL_URL = "https://www.booking.com/hotel/eg/golden-palace-suites.en-gb.html?aid=898224&app_hotel_id=9507435&checkin=2026-02-17&checkout=2026-02-24&from_sn=ios&group_adults=2&group_children=0&label=hotel_details-LflnMU%401769982911&no_rooms=1&req_adults=2&req_children=0&room1=A%2CA%2C&chal_t=1770043814137&force_referer=&selected_currency=EUR"
+
+def add_target_arguments(parser):
+    """Arguments selecting what is scraped and through which egress."""
+    parser.add_argument('--jobs', help="JSON job spec with hotels, date ranges and guest configs "
+                                       "(defaults to the built-in hotel URL)")
+    parser.add_argument('--proxies', help="JSON map of country -> proxy URL; scrapes countries in "
+                                          "parallel through the proxies instead of switching NordVPN")
+
+def add_upload_arguments(parser):
+    """Arguments controlling how results are stored: screenshots, DynamoDB and price history."""
+    parser.add_argument('--screenshot-format', choices=['webp', 'jpeg', 'png'], default='webp',
+                        help="Format screenshots are converted to before upload (default: webp)")
+    parser.add_argument('--screenshot-quality', type=int, default=80,
+                        help="WebP/JPEG quality for uploaded screenshots (default: 80)")
+    parser.add_argument('--clip-screenshots', action='store_true',
+                        help="Clip uploaded screenshots to the pricing section when it was found")
+    parser.add_argument('--history-db', default=DEFAULT_HISTORY_PATH,
+                        help=f"SQLite price history every run is ingested into (default: {DEFAULT_HISTORY_PATH})")
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help="Only store observations in full when their price changed; unchanged ones "
+                             "refresh last_seen_at on the stored DynamoDB item and upload no screenshot")
+    parser.add_argument('--store-every-hours', type=float, default=24,
+                        help="With --skip-unchanged, still store each observation in full at least this "
+                             "often (default: 24)")
+    parser.add_argument('--last-seen-db', default='hotel_prices/last_seen.db',
+                        help="SQLite cache of the last stored price per hotel/country/stay "
+                             "(default: hotel_prices/last_seen.db)")
+
+def add_scrape_arguments(parser):
+    """Arguments of the scrape command, which are also accepted without a command."""
+    add_target_arguments(parser)
+    add_upload_arguments(parser)
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Number of countries scraped concurrently in proxy mode (default: 4)")
+    parser.add_argument('--upload-during-scrape', action='store_true',
+                        help="Upload screenshots while scraping instead of after the VPN disconnects "
+                             "(always on in proxy mode)")
+    parser.add_argument('--observe-popups', action='store_true',
+                        help="Keep a MutationObserver on each page that dismisses popups appearing later")
+    parser.add_argument('--block', choices=sorted(BLOCKING_PRESETS), default='screenshot',
+                        help="Request blocking preset: 'extract-only' blocks everything non-essential, "
+                             "'screenshot' keeps what the evidence screenshot needs (default: screenshot)")
+    parser.add_argument('--block-pattern', action='append', default=[], metavar='PATTERN',
+                        help="Extra URL pattern to block, e.g. '*example.com*' (repeatable)")
+    parser.add_argument('--http-first', action='store_true',
+                        help="Try a plain HTTP fetch before Chrome and only launch the browser when "
+                             "the price is missing or a challenge page is served")
+    parser.add_argument('--screenshots', choices=['always', 'fallback'], default='always',
+                        help="'always' takes a browser screenshot of every target; 'fallback' only "
+                             "when the HTTP fast path falls back to Chrome (default: always)")
+    parser.add_argument('--state-file', default='hotel_prices/run_state.db',
+                        help="SQLite file recording the status of every task (default: hotel_prices/run_state.db)")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the run recorded in --state-file, skipping completed tasks "
+                             "and retrying failed ones")
+    parser.add_argument('--wait-ceiling', action='append', default=[], metavar='NAME=SECONDS',
+                        help="Override a readiness wait ceiling, e.g. network_idle=5 (repeatable)")
+    parser.add_argument('--metrics-file',
+                        help="Where to write per-phase timing histograms; *.prom writes a Prometheus "
+                             "textfile, anything else JSON (default: hotel_prices/metrics_<timestamp>.json)")
+    parser.add_argument('--selector-stats', default=DEFAULT_SELECTOR_STATS_PATH,
+                        help="SQLite file of selector hit counts used to try the usual match first "
+                             f"(default: {DEFAULT_SELECTOR_STATS_PATH})")
+    parser.add_argument('--selector-stale-after', type=int, default=50,
+                        help="Warn about selectors that matched before but not in this many pages (default: 50)")
+    parser.add_argument('--fixed-selector-order', action='store_true',
+                        help="Always try selectors in their listed order and record no statistics")
+    parser.add_argument('--tabs', type=int, default=1,
+                        help="Load up to this many targets of a country at once in tabs of one Chrome "
+                             "(default: 1, one page at a time)")
+    parser.add_argument('--tab-stagger', type=float, default=0.5,
+                        help="Seconds between opening two tabs, to avoid bursts of requests (default: 0.5)")
+    parser.add_argument('--snapshots', action='store_true',
+                        help="Archive every scraped page's HTML as a compressed, deduplicated blob for "
+                             "offline re-extraction with snapshot_archive.py reextract")
+    parser.add_argument('--snapshot-dir', default=DEFAULT_SNAPSHOT_DIR,
+                        help=f"Page snapshot archive directory (default: {DEFAULT_SNAPSHOT_DIR})")
+    parser.add_argument('--country-retries', type=int, default=2,
+                        help="Times the failed targets of a country are retried at the end of the run (default: 2)")
+    parser.add_argument('--country-retry-backoff', type=float, default=30,
+                        help="Base delay in seconds before a country's retry, jittered and doubled per "
+                             "attempt (default: 30)")
+    parser.add_argument('--country-health-db', default=DEFAULT_HEALTH_PATH,
+                        help=f"SQLite failure history per country (default: {DEFAULT_HEALTH_PATH})")
+    parser.add_argument('--breaker-threshold', type=int, default=3,
+                        help="Consecutive failed attempts after which a country is skipped (default: 3)")
+    parser.add_argument('--breaker-cooldown-hours', type=float, default=6,
+                        help="How long a failing country is skipped, doubled per further failure (default: 6)")
+    parser.add_argument('--no-circuit-breaker', action='store_true',
+                        help="Attempt every country regardless of its failure history")
+    parser.add_argument('--queue', metavar='URL',
+                        help="Shared work queue: an SQS queue URL or sqlite:///path/to/queue.db")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--enqueue', action='store_true',
+                      help="Coordinator: put every target/country task on --queue and exit")
+    mode.add_argument('--worker', action='store_true',
+                      help="Worker: scrape tasks leased from --queue until it stays empty")
+    parser.add_argument('--lease-batch', type=int, default=10,
+                        help="Tasks a worker leases at once (default: 10, the SQS maximum)")
+    parser.add_argument('--visibility-timeout', type=int, default=600,
+                        help="Seconds a leased task stays hidden without a heartbeat before another "
+                             "worker may take it (default: 600)")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="Attempts per task before it is given up (default: 3)")
+    parser.add_argument('--retry-delay', type=float, default=60,
+                        help="Base delay in seconds before a failed task is retried, doubled per attempt "
+                             "(default: 60)")
+    parser.add_argument('--idle-exit', type=int, default=60,
+                        help="A worker stops after the queue stayed empty this many seconds (default: 60)")
+
+def parse_args(argv=None):
+    """Parse command line arguments.
+
+    Without a command, the arguments are those of scrape, so existing invocations keep working.
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        argv = ['scrape'] + argv
+
+    parser = argparse.ArgumentParser(description="EC2 multi-country hotel price scraper")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    countries = subparsers.add_parser('countries', help="List the countries a run would scrape, in order, "
+                                                        "with their number of targets")
+    add_target_arguments(countries)
+    countries.add_argument('--refresh', action='store_true',
+                           help="Ask NordVPN for its countries instead of using the cached list")
+
+    scrape = subparsers.add_parser('scrape', help="Scrape every target from every country and store the "
+                                                  "results (the default command)")
+    add_scrape_arguments(scrape)
+
+    upload = subparsers.add_parser('upload', help="Store a JSONL result file: screenshots to S3, items to "
+                                                  "DynamoDB, Parquet partitions and the price history")
+    upload.add_argument('results_file', help="JSONL result file of a run, e.g. one whose scrape crashed")
+    add_upload_arguments(upload)
+
+    report = subparsers.add_parser('report', help="Summarize a JSONL result file per country")
+    report.add_argument('results_file', nargs='?',
+                        help="JSONL result file (default: the latest hotel_prices/ec2_hotel_prices_*.jsonl)")
+
+    args = parser.parse_args(argv)
+    if args.command == 'scrape' and (args.enqueue or args.worker) and not args.queue:
+        scrape.error("--enqueue and --worker need --queue")
+    return args
+
+def load_targets(jobs_path=None):
+    """Load scrape targets from a job spec file, or fall back to the built-in hotel URL."""
+    if jobs_path:
+        return expand_job_spec(load_job_spec(jobs_path))
+
+    return expand_job_spec({
+        'hotels': [DEFAULT_HOTEL_URL],
+        'date_ranges': [{'checkin': '2026-02-17', 'checkout': '2026-02-24'}],
+    })
+
+def scrape_hotel_http(hotel_url, country, proxy=None):
+    """Scrape hotel price over plain HTTP without a browser.
+
+    Returns the hotel record, or None when the page is a challenge or has no price, in which
+    case the caller should fall back to the Selenium path.
+    """
+    try:
+        with span('http_fetch', country):
+            status_code, html, challenged = fetch_hotel_page(hotel_url, proxy)
+        if challenged:
+            logger.info(f"HTTP fast path hit a challenge page for {country} (status {status_code})")
+            return None
+
+        field_selectors = ordered_field_selectors()
+        fields, matched = extract_fields_from_html(html, field_selectors)
+        if not fields.get('raw_price'):
+            logger.info(f"HTTP fast path found no price for {country}")
+            return None
+        # Pages without a server-rendered price fall back to Chrome and are recorded there
+        record_selector_hits(field_selectors, matched)
+
+        hotel_data = build_hotel_data(fields, matched)
+        hotel_data['country'] = country
+        hotel_data['scraped_at'] = datetime.now().isoformat()
+        hotel_data['url'] = hotel_url
+        hotel_data['ip_address'] = get_current_ip(proxy)
+        archive_page_source(hotel_data, html)
+        hotel_data['screenshot'] = None
+        hotel_data['screenshot_s3_url'] = None
+        hotel_data['fetch_method'] = 'http'
+
+        logger.info(f"Successfully scraped hotel data over HTTP for {country}: {hotel_data['hotel_name']} - {hotel_data['raw_price']}")
+        return hotel_data
+
+    except Exception as e:
+        logger.warning(f"HTTP fast path failed for {country}: {e}")
+        return None
+
+def scrape_country_batch(country, batch, driver_pool, proxy=None, uploader=None, sink=None,
+                         state=None, change_filter=None):
+    """Scrape every target of a country batch; returns (records, failed_targets).
+
+    Each record is appended to the sink as soon as it is scraped, and each target is marked
+    done or failed in the run state. With an uploader, each screenshot is also queued for
+    upload as soon as it is taken, unless the change filter finds the price unchanged.
+    With SCRAPE_OPTIONS['tabs'] above 1, the browser targets load in concurrent tabs.
+    """
+    records = []
+    failed_targets = 0
+    exit_metadata = check_exit_country(country, proxy) or {}
+
+    def fail(target, error):
+        nonlocal failed_targets
+        logger.error(f"Error for {country}: {error}")
+        failed_targets += 1
+        if state is not None:
+            state.mark_failed(target, country, str(error))
+
+    def collect(target, hotel_data):
+        nonlocal failed_targets
         try:
-            driver.quit()
-        except:
-            pass
+            failure = scrape_failure(hotel_data)
+            if failure is None:
+                hotel_data['hotel_url'] = target['hotel_url']
+                hotel_data['requested_checkin'] = target['checkin']
+                hotel_data['requested_checkout'] = target['checkout']
+                hotel_data['adults'] = target['adults']
+                hotel_data['children'] = target['children']
+                hotel_data['rooms'] = target['rooms']
+                hotel_data['exit_country'] = exit_metadata.get('country')
+                hotel_data['exit_asn'] = exit_metadata.get('asn')
+                if change_filter is not None:
+                    hotel_data['change_status'], hotel_data['change_reason'] = change_filter.classify(hotel_data)
+                if sink is not None:
+                    sink.write(hotel_data)
+                if state is not None:
+                    state.mark_done(target, country)
+                if (uploader is not None and hotel_data.get('screenshot')
+                        and hotel_data.get('change_status') != UNCHANGED):
+                    uploader.submit(hotel_data['screenshot'], hotel_data.get('screenshot_clip'), country)
+                records.append(hotel_data)
+            else:
+                logger.warning(f"No data for {country}: {target['url']} ({failure})")
+                failed_targets += 1
+                if state is not None:
+                    state.mark_failed(target, country, failure)
 
-        # Clean up temp directory
-        if temp_dir and os.path.exists(temp_dir):
-            try:
-                shutil.rmtree(temp_dir, ignore_errors=True)
-                logger.info(f"Cleaned up temp directory: {temp_dir}")
-            except Exception as e:
-                logger.warning(f"Could not clean up temp directory {temp_dir}: {e}")
+        except Exception as e:
+            fail(target, e)
 
-def main():
-    """Main function optimized for EC2."""
-    logger.info("Starting EC2 multi-country hotel price scraper")
+    # Over plain HTTP first when screenshots are only needed as a fallback
+    browser_targets = []
+    for j, target in enumerate(batch, 1):
+        if not (SCRAPE_OPTIONS['http_first'] and SCRAPE_OPTIONS['screenshots'] == 'fallback'):
+            browser_targets.append(target)
+            continue
+        logger.info(f"{country}: HTTP target {j}/{len(batch)} {target['checkin']} -> {target['checkout']}")
+        try:
+            hotel_data = scrape_hotel_http(target['url'], country, proxy)
+        except Exception as e:
+            hotel_data = None
+            logger.warning(f"HTTP fast path failed for {country}: {e}")
+        if hotel_data is None:
+            browser_targets.append(target)
+        else:
+            collect(target, hotel_data)
 
-    # Hotel URL
-    hotel_url = "https://www.booking.com/hotel/eg/golden-palace-suites.en-gb.html?aid=898224&app_hotel_id=9507435&checkin=2026-02-17&checkout=2026-02-24&from_sn=ios&group_adults=2&group_children=0&label=hotel_details-LflnMU%401769982911&no_rooms=1&req_adults=2&req_children=0&room1=A%2CA%2C&chal_t=1770043814137&force_referer=&selected_currency=EUR"
+    if SCRAPE_OPTIONS['tabs'] > 1 and len(browser_targets) > 1:
+        # The egress is the same for the whole batch, so its pages can load side by side
+        done = set()
+        try:
+            for target, hotel_data in scrape_hotels_in_tabs(browser_targets, country, driver_pool, proxy,
+                                                            max_tabs=SCRAPE_OPTIONS['tabs']):
+                done.add(id(target))
+                collect(target, hotel_data)
+        except Exception as e:
+            logger.warning(f"Falling back to one page at a time for {country}: {e}")
+        browser_targets = [target for target in browser_targets if id(target) not in done]
 
-    print("EC2 Multi-Country Hotel Price Scraper")
-    print("========================================")
+    for j, target in enumerate(browser_targets, 1):
+        logger.info(f"{country}: target {j}/{len(browser_targets)} {target['checkin']} -> {target['checkout']}")
+        try:
+            hotel_data = scrape_hotel_for_country(target['url'], country, driver_pool, proxy)
+        except Exception as e:
+            fail(target, e)
+            continue
+        collect(target, hotel_data)
 
-    # Get NordVPN countries
-    countries = get_nordvpn_countries()
-    if not countries:
-        logger.error("No NordVPN countries available")
-        return
+    return records, failed_targets
 
-    # Run on all countries
-    countries = countries
-    logger.info(f"Processing {len(countries)} countries: {', '.join(countries)}")
+def run_vpn_sweep(schedule, uploader=None, sink=None, state=None, change_filter=None):
+    """Scrape country batches one at a time, switching the host-wide NordVPN connection.
 
-    all_hotel_data = []
+    Returns (record_count, successful_countries, failed_countries, failed_targets).
+    """
+    record_count = 0
     successful_countries = []
     failed_countries = []
+    failed_targets = 0
 
     # Disconnect from VPN first
     disconnect_nordvpn()
 
-    # Process countries
-    logger.info(f"Processing {len(countries)} countries: {countries}")
+    # Keep one warm browser for the whole run; it is reset between countries
+    driver_pool = ChromeDriverPool(setup_ec2_chrome_driver, shutdown_ec2_chrome_driver,
+                                   max_size=1, max_pages=25, max_rss_mb=1500)
 
-    for i, country in enumerate(countries, 1):
-        logger.info(f"Processing country {i}/{len(countries)}: {country}")
+    for i, (country, batch) in enumerate(schedule, 1):
+        logger.info(f"Processing country {i}/{len(schedule)}: {country} ({len(batch)} targets)")
 
         # Connect to VPN
         if not connect_to_nordvpn_country(country):
             logger.error(f"Failed to connect to {country}")
             failed_countries.append(country)
+            failed_targets += len(batch)
+            if state is not None:
+                for target in batch:
+                    state.mark_failed(target, country, 'VPN connection failed')
             continue
 
-        try:
-            # Scrape hotel data
-            hotel_data = scrape_hotel_for_country(hotel_url, country)
-
-            if hotel_data and hotel_data.get('raw_price') != 'No price found':
-                all_hotel_data.append(hotel_data)
-                successful_countries.append(country)
-                logger.info(f"Success for {country}")
-            else:
-                logger.warning(f"No data for {country}")
-                failed_countries.append(country)
+        records, country_failed_targets = scrape_country_batch(country, batch, driver_pool,
+                                                               uploader=uploader, sink=sink,
+                                                               state=state, change_filter=change_filter)
+        record_count += len(records)
+        failed_targets += country_failed_targets
 
-        except Exception as e:
-            logger.error(f"Error for {country}: {e}")
+        if records:
+            successful_countries.append(country)
+            logger.info(f"Success for {country}: {len(records)}/{len(batch)} targets")
+        else:
             failed_countries.append(country)
 
-        # Longer pause between countries on EC2
-        if i < len(countries):
-            time.sleep(10)
+    # Shut down pooled browsers before leaving the VPN
+    driver_pool.close()
 
     # Final disconnect
     disconnect_nordvpn()
 
-    # Upload all screenshots to S3 after VPN disconnect
-    logger.info("Uploading screenshots to S3...")
-    for data in all_hotel_data:
+    return record_count, successful_countries, failed_countries, failed_targets
+
+def run_queue_worker(work_queue, uploader=None, sink=None, state=None, change_filter=None, proxy_map=None,
+                     lease_batch=10, visibility_timeout=600, max_attempts=3, retry_delay=60, idle_exit=60,
+                     workers=4, store_batch=None):
+    """Scrape tasks leased from a shared work queue until it stays empty for idle_exit seconds.
+
+    Leased tasks are grouped by country. Once a leased batch is scraped, store_batch(records)
+    stores its records and returns the ones it could not store; only then are the scraped
+    tasks acked, so a worker lost mid-batch loses no acked result. Failed and unstored tasks
+    are nacked for a delayed retry. Without proxy_map the host-wide NordVPN connection is
+    switched per country, and tasks of the connected country are leased first.
+    Returns (record_count, successful_countries, failed_countries, failed_targets).
+    """
+    record_count = 0
+    successful_countries = set()
+    failed_countries = set()
+    failed_targets = 0
+
+    heartbeat = LeaseHeartbeat(work_queue, visibility_timeout)
+    driver_pool = None
+    current_country = None
+    if proxy_map is None:
+        disconnect_nordvpn()
+        driver_pool = ChromeDriverPool(setup_ec2_chrome_driver, shutdown_ec2_chrome_driver,
+                                       max_size=1, max_pages=25, max_rss_mb=1500)
+
+    idle_since = time.time()
+    try:
+        while True:
+            leases = work_queue.lease(lease_batch, visibility_timeout, prefer_country=current_country,
+                                      wait_seconds=min(20, idle_exit))
+            if not leases:
+                # Tasks waiting for a retry or held by other workers may still come back
+                if time.time() - idle_since >= idle_exit and not any(work_queue.counts().values()):
+                    logger.info(f"Work queue empty for {idle_exit}s, stopping worker")
+                    break
+                continue
+
+            heartbeat.add(leases)
+            acker = QueueAcker(work_queue, heartbeat, leases, state, max_attempts=max_attempts,
+                               retry_delay=retry_delay, defer_acks=store_batch is not None)
+            batch_sink = RecordingSink(sink)
+            schedule = [(country, [lease['task']['target'] for lease in group])
+                        for country, group in group_leases_by_country(leases)]
+            logger.info(f"Leased {len(leases)} tasks: {', '.join(f'{c} ({len(b)})' for c, b in schedule)}")
+            if state is not None:
+                # The run state only updates tasks it knows, so every leased task is added first
+                state.register(schedule)
+            try:
+                if proxy_map is not None:
+                    count, successful, failed, batch_failed_targets = run_proxy_sweep(
+                        schedule, proxy_map,
+                        functools.partial(scrape_country_batch, uploader=uploader, sink=batch_sink, state=acker,
+                                          change_filter=change_filter),
+                        setup_ec2_chrome_driver, shutdown_ec2_chrome_driver, max_workers=workers)
+                    record_count += count
+                    failed_targets += batch_failed_targets
+                    successful_countries.update(successful)
+                    failed_countries.update(failed)
+                else:
+                    for country, batch in schedule:
+                        if country != current_country:
+                            current_country = None
+                            if not connect_to_nordvpn_country(country):
+                                logger.error(f"Failed to connect to {country}")
+                                failed_countries.add(country)
+                                failed_targets += len(batch)
+                                for target in batch:
+                                    acker.mark_failed(target, country, 'VPN connection failed')
+                                continue
+                            current_country = country
+
+                        records, country_failed_targets = scrape_country_batch(
+                            country, batch, driver_pool, uploader=uploader, sink=batch_sink, state=acker,
+                            change_filter=change_filter)
+                        record_count += len(records)
+                        failed_targets += country_failed_targets
+                        (successful_countries if records else failed_countries).add(country)
+            finally:
+                acker.fail_unfinished()
+                if store_batch is not None:
+                    # If storing fails outright, the scraped tasks stay leased and expire for a retry
+                    unstored = store_batch(batch_sink.records) if batch_sink.records else []
+                    acker.ack_scraped({task_id({'url': data['url']}, data['country']) for data in unstored})
+                logger.info(f"Work queue: {acker.acked} acked, {acker.nacked} retried, {work_queue.counts()}")
+            idle_since = time.time()
+    finally:
+        heartbeat.close()
+        if driver_pool is not None:
+            driver_pool.close()
+            disconnect_nordvpn()
+
+    return record_count, sorted(successful_countries), sorted(failed_countries - successful_countries), failed_targets
+
+def build_schedule(targets, proxy_map=None):
+    """Group targets by the countries to scrape from; returns None when no country is available."""
+    if proxy_map is not None:
+        # Each country leaves through its own proxy, so the host VPN is left alone
+        return group_targets_by_country(targets, list(proxy_map))
+
+    # Get NordVPN countries
+    countries = get_nordvpn_countries()
+    if not countries:
+        logger.error("No NordVPN countries available")
+        return None
+
+    # Reliable, fast-connecting countries first; the circuit breaker skips countries that keep failing
+    countries = get_vpn_manager().order_countries(countries)
+
+    # Group every target by country so each VPN connection scrapes its whole batch
+    return group_targets_by_country(targets, countries)
+
+def enqueue_targets(queue_url, targets, proxy_map=None):
+    """Coordinator mode: put every (target, country) task on the work queue; returns the number enqueued."""
+    schedule = build_schedule(targets, proxy_map)
+    if not schedule:
+        return 0
+
+    work_queue = open_work_queue(queue_url)
+    try:
+        enqueued = work_queue.put_many(tasks_from_schedule(schedule))
+        logger.info(f"Enqueued {enqueued} tasks across {len(schedule)} countries to {queue_url}: "
+                    f"{work_queue.counts()}")
+        return enqueued
+    finally:
+        work_queue.close()
+
+def store_records(records, uploader, part_name, change_filter=None):
+    """Upload screenshots, write DynamoDB items and a Parquet part for a list of records.
+
+    With a change filter, unchanged observations skip the screenshot upload and only refresh
+    last_seen_at on their last full DynamoDB item.
+    Returns (s3_uploads, unstored) where unstored are the records DynamoDB did not take.
+    """
+    changed, unchanged = records, []
+    if change_filter is not None:
+        changed, unchanged = classify_changes(records, change_filter)
+
+    # Screenshots already queued during the scrape are not uploaded twice
+    hashes = {}
+    uploads = []
+    for data in changed:
+        upload = None
         if data.get('screenshot') and os.path.exists(data['screenshot']):
-            s3_url = upload_screenshot_to_s3(data['screenshot'])
-            data['screenshot_s3_url'] = s3_url
-
-    # Insert all hotel data to DynamoDB in one call
-    logger.info("Inserting hotel data into DynamoDB")
-    if all_hotel_data:
-        if insert_hotel_data_to_dynamodb(all_hotel_data):
-            logger.info(f"DynamoDB: Successfully inserted {len(all_hotel_data)} records")
+            last = change_filter.last_stored(data) if change_filter is not None else None
+            hashes[id(data)] = file_sha256(data['screenshot']) if change_filter is not None else None
+            if last and last['screenshot_s3_url'] and last['screenshot_sha256'] == hashes[id(data)]:
+                data['screenshot_s3_url'] = last['screenshot_s3_url']
+            else:
+                upload = uploader.submit(data['screenshot'], data.get('screenshot_clip'), data.get('country'))
+        uploads.append(upload)
+    for data, upload in zip(changed, uploads):
+        if upload is not None:
+            data['screenshot_s3_url'] = upload.result()
+    s3_uploads = sum(1 for upload in uploads if upload is not None and upload.result())
+
+    outcomes = write_hotel_data_to_dynamodb(changed) if changed else []
+    unstored = [data for data, outcome in zip(changed, outcomes) if outcome['status'] != 'written']
+
+    if change_filter is not None:
+        from dynamodb_writer import get_dynamodb_writer
+
+        key_attributes = get_dynamodb_writer().key_attributes
+        for data, outcome in zip(changed, outcomes):
+            if outcome['status'] == 'written':
+                change_filter.mark_stored(data, dict(zip(key_attributes, outcome['key'])),
+                                          hashes.get(id(data)))
+        if unchanged:
+            heartbeats = heartbeat_hotel_data_in_dynamodb(
+                [(change_filter.last_stored(data)['dynamodb_key'], data) for data in unchanged])
+            for data, outcome in zip(unchanged, heartbeats):
+                if outcome['status'] == 'updated':
+                    change_filter.mark_seen(data)
+                elif outcome['status'] == 'missing':
+                    # The item it pointed at is gone, so the next scrape is stored in full again
+                    change_filter.forget(data)
+                else:
+                    unstored.append(data)
+
+    with span('parquet_write'):
+        write_parquet_partitions(records, os.path.join("hotel_prices", "parquet"), part_name)
+
+    return s3_uploads, unstored
+
+def skip_records(chunks, skip):
+    """Yield the record chunks with the first skip records left out."""
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        yield chunk[skip:]
+        skip = 0
+
+def store_results(results_file, uploader, chunk_size=500, change_filter=None, skip=0):
+    """Store the records of a JSONL result file with store_records, one chunk at a time.
+
+    Records are streamed from the file in chunks, so memory use does not grow with the run.
+    The first skip records, stored by an earlier attempt of a resumed run, are passed over.
+    Returns (record_count, s3_uploads, dynamodb_failures) for the records stored.
+    """
+    record_count = 0
+    s3_uploads = 0
+    dynamodb_failures = 0
+    part_prefix = os.path.splitext(os.path.basename(results_file))[0]
+    if skip:
+        # Parquet parts of the earlier attempt keep their names
+        part_prefix = f"{part_prefix}-s{skip}"
+
+    for i, chunk in enumerate(skip_records(iter_jsonl_chunks(results_file, chunk_size), skip)):
+        uploads, unstored = store_records(chunk, uploader, f"{part_prefix}-{i:05d}", change_filter)
+        s3_uploads += uploads
+        dynamodb_failures += len(unstored)
+
+        for data in chunk:
+            print(f"\n{data['country']}: {data['hotel_name']} {data['requested_checkin']} -> "
+                  f"{data['requested_checkout']}: {data['raw_price']}")
+        record_count += len(chunk)
+
+    return record_count, s3_uploads, dynamodb_failures
+
+def classify_changes(chunk, change_filter):
+    """Split records into (changed, unchanged), honouring a change_status set during the scrape."""
+    changed = []
+    unchanged = []
+    for data in chunk:
+        if not data.get('change_status'):
+            data['change_status'], data['change_reason'] = change_filter.classify(data)
+        # A heartbeat needs the key of the last full item
+        last = change_filter.last_stored(data) if data['change_status'] == UNCHANGED else None
+        if last:
+            data['screenshot_s3_url'] = last['screenshot_s3_url']
+            unchanged.append(data)
         else:
-            logger.error(f"DynamoDB: Failed to insert {len(all_hotel_data)} records")
-    else:
-        logger.info("DynamoDB: No data to insert")
+            data['change_status'] = CHANGED
+            changed.append(data)
+
+    if unchanged:
+        logger.info(f"Change filter: {len(unchanged)}/{len(chunk)} observations unchanged, "
+                    f"sending heartbeats instead of full items")
+    return changed, unchanged
+
+def ingest_price_history(results_file, history_path=DEFAULT_HISTORY_PATH):
+    """Add a run's results to the local price history; failures only cost the history, not the run."""
+    try:
+        with span('history_ingest'):
+            history = PriceHistory(history_path)
+            try:
+                history.ingest_jsonl(results_file)
+            finally:
+                history.close()
+    except Exception as e:
+        logger.error(f"Could not ingest {results_file} into price history {history_path}: {e}")
 
-    # Save results
-    if all_hotel_data:
-        df = pd.DataFrame(all_hotel_data)
+def export_metrics(metrics_file=None):
+    """Write the per-phase timings and print a summary table of where the run spent its time."""
+    metrics = get_metrics()
+    if not metrics.snapshot():
+        return
 
-        os.makedirs("hotel_prices", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_file = f"hotel_prices/ec2_hotel_prices_{timestamp}.csv"
-        json_file = f"hotel_prices/ec2_hotel_prices_{timestamp}.json"
+    metrics_file = metrics_file or f"hotel_prices/metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    try:
+        metrics.export(metrics_file)
+    except OSError as e:
+        logger.error(f"Could not write metrics to {metrics_file}: {e}")
+
+    print("\n" + "="*60)
+    print("PHASE TIMINGS")
+    print("="*60)
+    print(metrics.summary_table())
+
+def close_selector_stats():
+    """Warn about selectors that stopped matching and close the selector statistics."""
+    stats = SCRAPE_OPTIONS['selector_stats']
+    if stats is None:
+        return
+    for stale in stats.stale_selectors():
+        if stale['selector'] is None:
+            logger.warning(f"No selector matched {stale['field']} in the last {stale['pages_since_hit']} pages")
+        else:
+            logger.warning(f"Stale selector for {stale['field']}: {stale['selector']} "
+                           f"(no hit in {stale['pages_since_hit']} pages, last hit {stale['last_hit_at']})")
+    stats.close()
+    SCRAPE_OPTIONS['selector_stats'] = None
+
+def create_uploader(args):
+    """Screenshot uploader configured from the command line; boto3 is only imported from here on."""
+    from screenshot_uploader import ScreenshotUploader
+
+    return ScreenshotUploader(image_format=args.screenshot_format,
+                              quality=args.screenshot_quality,
+                              clip_to_pricing=args.clip_screenshots)
+
+def list_countries(jobs_path=None, proxies_path=None, refresh=False):
+    """Print the countries a run would scrape, in scrape order, with their number of targets."""
+    if refresh:
+        get_vpn_manager().countries(refresh=True)
+    schedule = build_schedule(load_targets(jobs_path), load_proxy_map(proxies_path) if proxies_path else None)
+    if not schedule:
+        print("No countries available")
+        return
+    print_rows([{'country': country, 'targets': len(batch)} for country, batch in schedule])
 
-        df.to_csv(csv_file, index=False)
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(all_hotel_data, f, indent=2, ensure_ascii=False)
+def upload_results(args):
+    """Store an existing JSONL result file the way a run does once scraping is done."""
+    uploader = create_uploader(args)
+    change_filter = ChangeFilter(args.last_seen_db, args.store_every_hours) if args.skip_unchanged else None
+    try:
+        stored_count, s3_uploads, dynamodb_failures = store_results(args.results_file, uploader,
+                                                                    change_filter=change_filter)
+    finally:
+        if change_filter is not None:
+            change_filter.close()
+        uploader.close()
+    ingest_price_history(args.results_file, args.history_db)
+
+    print(f"\nRecords stored: {stored_count}")
+    print(f"Screenshots uploaded to S3: {s3_uploads}/{stored_count}")
+    if dynamodb_failures:
+        logger.error(f"DynamoDB: Not all of {stored_count} records were inserted")
+
+def report_results(results_file=None):
+    """Print records, prices found and the cheapest price per country of a JSONL result file."""
+    if results_file is None:
+        result_files = sorted(glob.glob("hotel_prices/ec2_hotel_prices_*.jsonl"))
+        if not result_files:
+            print("No result files in hotel_prices/")
+            return
+        results_file = result_files[-1]
+
+    countries = {}
+    for chunk in iter_jsonl_chunks(results_file):
+        for data in chunk:
+            row = countries.setdefault(data.get('country'), {
+                'country': data.get('country'), 'records': 0, 'priced': 0, 'errors': 0,
+                'cheapest': None, 'currency': None,
+            })
+            row['records'] += 1
+            if data.get('hotel_name') == 'Error':
+                row['errors'] += 1
+            price = data.get('cleaned_price')
+            if price is not None:
+                row['priced'] += 1
+                if row['cheapest'] is None or price < row['cheapest']:
+                    row['cheapest'], row['currency'] = price, data.get('currency')
+
+    print(results_file)
+    print_rows(sorted(countries.values(), key=lambda row: (row['cheapest'] is None, row['cheapest'] or 0)))
+
+def run_scrape(args):
+    """Scrape every target from every country, then store the results."""
+    set_wait_ceilings(args.wait_ceiling)
+    SCRAPE_OPTIONS['observe_popups'] = args.observe_popups
+    SCRAPE_OPTIONS['block_preset'] = args.block
+    SCRAPE_OPTIONS['block_patterns'] = args.block_pattern
+    SCRAPE_OPTIONS['http_first'] = args.http_first
+    SCRAPE_OPTIONS['screenshots'] = args.screenshots
+    SCRAPE_OPTIONS['tabs'] = max(1, args.tabs)
+    SCRAPE_OPTIONS['tab_stagger'] = args.tab_stagger
+    if not args.fixed_selector_order:
+        SCRAPE_OPTIONS['selector_stats'] = SelectorStats(args.selector_stats, args.selector_stale_after)
+    if args.snapshots:
+        try:
+            SCRAPE_OPTIONS['snapshot_archive'] = SnapshotArchive(args.snapshot_dir)
+        except ImportError as e:
+            logger.warning(f"Page snapshots disabled: {e}")
+    if args.http_first and args.screenshots == 'always':
+        logger.warning("--http-first has no effect with --screenshots always, every target needs Chrome")
+    logger.info("Starting EC2 multi-country hotel price scraper")
 
-        logger.info(f"Results saved to {csv_file} and {json_file}")
+    targets = load_targets(args.jobs)
+    if args.enqueue:
+        enqueue_targets(args.queue, targets, load_proxy_map(args.proxies) if args.proxies else None)
+        return
+
+    print("EC2 Multi-Country Hotel Price Scraper")
+    print("========================================")
 
-        # Print summary
+    uploader = create_uploader(args)
+    # Proxy mode never takes over the host route, so uploads can always run alongside scraping
+    scrape_uploader = uploader if (args.upload_during_scrape or args.proxies) else None
+
+    # Every task's status is recorded so an interrupted run can be resumed
+    os.makedirs(os.path.dirname(args.state_file) or '.', exist_ok=True)
+    state = RunState(args.state_file)
+    change_filter = ChangeFilter(args.last_seen_db, args.store_every_hours) if args.skip_unchanged else None
+    try:
+        results_file = state.get_value('results_file') if args.resume else None
+        if args.resume and results_file:
+            logger.info(f"Resuming run recorded in {args.state_file}: {state.counts()}")
+        else:
+            if args.resume:
+                logger.warning(f"No run to resume in {args.state_file}, starting a new one")
+            state.reset()
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            results_file = f"hotel_prices/ec2_hotel_prices_{timestamp}.jsonl"
+            state.set_value('results_file', results_file)
+
+        # Every record is appended here as soon as it is scraped, so a crash loses nothing
+        sink = JsonlResultSink(results_file)
+        worker_stored = {'batches': 0, 'records': 0, 's3_uploads': 0, 'dynamodb_failures': 0}
+        logger.info(f"Streaming results to {results_file}")
+
+        try:
+            proxy_map = load_proxy_map(args.proxies) if args.proxies else None
+            if args.worker:
+                part_prefix = os.path.splitext(os.path.basename(results_file))[0]
+
+                def store_batch(records):
+                    # Each leased batch is stored before its tasks are acked
+                    part_name = f"{part_prefix}-b{worker_stored['batches']:05d}"
+                    uploads, unstored = store_records(records, uploader, part_name, change_filter)
+                    worker_stored['batches'] += 1
+                    worker_stored['records'] += len(records)
+                    worker_stored['s3_uploads'] += uploads
+                    worker_stored['dynamodb_failures'] += len(unstored)
+                    return unstored
+
+                work_queue = open_work_queue(args.queue)
+                try:
+                    record_count, successful_countries, failed_countries, failed_targets = run_queue_worker(
+                        work_queue, uploader=scrape_uploader, sink=sink, state=state, change_filter=change_filter,
+                        proxy_map=proxy_map, lease_batch=args.lease_batch,
+                        visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts,
+                        retry_delay=args.retry_delay, idle_exit=args.idle_exit, workers=args.workers,
+                        store_batch=store_batch)
+                finally:
+                    work_queue.close()
+                skipped_countries = []
+            else:
+                schedule = build_schedule(targets, proxy_map)
+                if schedule is None:
+                    return
+
+                state.register(schedule)
+                schedule = state.remaining(schedule)
+                logger.info(f"Processing {sum(len(batch) for _, batch in schedule)} remaining targets across "
+                            f"{len(schedule)} countries: {', '.join(country for country, _ in schedule)}")
+
+                def run_pass(pass_schedule, pass_state):
+                    if args.proxies:
+                        return run_proxy_sweep(
+                            pass_schedule, proxy_map,
+                            functools.partial(scrape_country_batch, uploader=scrape_uploader, sink=sink,
+                                              state=pass_state, change_filter=change_filter),
+                            setup_ec2_chrome_driver, shutdown_ec2_chrome_driver, max_workers=args.workers)
+                    return run_vpn_sweep(pass_schedule, uploader=scrape_uploader, sink=sink, state=pass_state,
+                                         change_filter=change_filter)
+
+                # Failed targets are retried at the end; countries that keep failing are skipped for a while
+                health = None if args.no_circuit_breaker else CountryHealth(
+                    args.country_health_db, args.breaker_threshold, args.breaker_cooldown_hours)
+                try:
+                    (record_count, successful_countries, failed_countries, failed_targets,
+                     skipped_countries) = run_with_retries(run_pass, schedule, state, health,
+                                                           args.country_retries, args.country_retry_backoff)
+                finally:
+                    if health is not None:
+                        health.close()
+        finally:
+            sink.close()
+
+        # Records from earlier attempts of a resumed run are stored together with the new ones,
+        # skipping those a previous attempt already stored
+        stored_before = int(state.get_value('stored_records') or 0)
+        if args.resume and not args.worker and os.path.exists(results_file):
+            record_count = sum(len(chunk) for chunk in iter_jsonl_chunks(results_file)) - stored_before
+        logger.info(f"Run state: {state.counts()}")
+        close_selector_stats()
+
+        if not record_count:
+            logger.warning("No data collected")
+            export_metrics(args.metrics_file)
+            return
+
+        # Upload screenshots to S3 and insert into DynamoDB after VPN disconnect, in parallel batches
+        logger.info("Uploading screenshots to S3 and inserting hotel data into DynamoDB...")
         print("\n" + "="*60)
         print("EC2 HOTEL PRICE SUMMARY")
         print("="*60)
 
-        for data in all_hotel_data:
-            print(f"\n{data['country']}: {data['raw_price']}")
+        if args.worker:
+            stored_count, s3_uploads, dynamodb_failures = (
+                worker_stored['records'], worker_stored['s3_uploads'], worker_stored['dynamodb_failures'])
+        else:
+            stored_count, s3_uploads, dynamodb_failures = store_results(
+                results_file, uploader, change_filter=change_filter, skip=stored_before)
+            state.set_value('stored_records', str(stored_before + stored_count))
+        ingest_price_history(results_file, args.history_db)
+
+        if dynamodb_failures:
+            logger.error(f"DynamoDB: Not all of {stored_count} records were inserted")
+        else:
+            logger.info(f"DynamoDB: Successfully inserted {stored_count} records")
+        logger.info(f"Results saved to {results_file} and hotel_prices/parquet/")
 
         print(f"\nSuccessful: {len(successful_countries)}")
         print(f"Failed: {len(failed_countries)}")
+        if skipped_countries:
+            print(f"Skipped, circuit open: {len(skipped_countries)} ({', '.join(skipped_countries)})")
+        print(f"Failed targets: {failed_targets}")
 
         # Count S3 uploads
-        s3_uploads = sum(1 for data in all_hotel_data if data.get('screenshot_s3_url'))
-        print(f"Screenshots uploaded to S3: {s3_uploads}/{len(all_hotel_data)}")
+        print(f"Screenshots uploaded to S3: {s3_uploads}/{stored_count}")
 
         if s3_uploads > 0:
             print(f"S3 bucket: apartmentscreenshots/hotel-scraper/")
 
+        export_metrics(args.metrics_file)
+    finally:
+        uploader.close()
+        if change_filter is not None:
+            change_filter.close()
+        state.close()
+
+def main(argv=None):
+    """Main function optimized for EC2."""
+    args = parse_args(argv)
+    configure_logging()
+    if args.command == 'countries':
+        list_countries(args.jobs, args.proxies, args.refresh)
+    elif args.command == 'upload':
+        upload_results(args)
+    elif args.command == 'report':
+        report_results(args.results_file)
     else:
-        logger.warning("No data collected")
+        run_scrape(args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Concurrent page loads in tabs of one Chrome instance for the EC2 multi-country scraper
+Keeps up to N targets loading at once under the same egress and hands each tab over for
+extraction as soon as its page is ready
+"""
+
+import time
+import logging
+
+from driver_pool import get_driver_rss_mb
+
+logger = logging.getLogger(__name__)
+
+# Polled in every open tab: the document has loaded and a price or pricing section is present
+TAB_READY_SCRIPT = """
+    if (document.readyState !== 'complete') return null;
+    for (const selector of arguments[0]) {
+        try {
+            if (document.querySelector(selector)) return selector;
+        } catch (e) {}
+    }
+    return null;
+"""
+
+
+def open_tab(driver, url, prepare=None):
+    """Open url in a new tab without waiting for it to load; returns the tab's window handle.
+
+    prepare(driver) runs in the blank tab first, e.g. to set up CDP resource blocking, which
+    applies per tab.
+    """
+    driver.switch_to.new_window('tab')
+    if prepare is not None:
+        prepare(driver)
+    driver.execute_script("window.location.href = arguments[0];", url)
+    return driver.current_window_handle
+
+
+def close_tab(driver, handle, home_handle):
+    try:
+        driver.switch_to.window(handle)
+        driver.close()
+    except Exception as e:
+        logger.warning(f"Could not close tab: {e}")
+    driver.switch_to.window(home_handle)
+
+
+def run_tabs(driver, items, url_of, harvest, max_tabs=4, ready_selectors=(), timeout=50,
+             prepare=None, open_interval=0.5, max_rss_mb=None, poll_interval=0.25):
+    """Load items in up to max_tabs concurrent tabs; yields (item, result, load_seconds) as tabs finish.
+
+    A tab is harvested with harvest(driver, item, ready) once its document is complete and one
+    of ready_selectors matches, or after timeout seconds with ready False. result is what
+    harvest returned, or the exception it (or opening the tab) raised. New tabs are opened at
+    most every open_interval seconds, and not while Chrome uses more than max_rss_mb.
+    """
+    pending = list(items)
+    home_handle = driver.current_window_handle
+    open_tabs = []  # [item, handle, opened_at]
+    last_open = 0.0
+
+    try:
+        while pending or open_tabs:
+            # Top up the open tabs, staggered so the site does not see a burst of navigations
+            while pending and len(open_tabs) < max_tabs and time.time() - last_open >= open_interval:
+                if open_tabs and max_rss_mb:
+                    rss_mb = get_driver_rss_mb(driver)
+                    if rss_mb is not None and rss_mb > max_rss_mb:
+                        logger.info(f"Not opening another tab: Chrome RSS {rss_mb:.0f}MB above {max_rss_mb}MB")
+                        break
+                item = pending.pop(0)
+                last_open = time.time()
+                try:
+                    open_tabs.append([item, open_tab(driver, url_of(item), prepare), last_open])
+                except Exception as e:
+                    logger.warning(f"Could not open tab for {url_of(item)}: {e}")
+                    driver.switch_to.window(home_handle)
+                    yield item, e, 0.0
+
+            for tab in list(open_tabs):
+                item, handle, opened_at = tab
+                try:
+                    driver.switch_to.window(handle)
+                    ready = bool(driver.execute_script(TAB_READY_SCRIPT, list(ready_selectors)))
+                except Exception:
+                    ready = False
+                load_seconds = time.time() - opened_at
+                if not ready and load_seconds < timeout:
+                    continue
+
+                if not ready:
+                    logger.warning(f"Tab for {url_of(item)} not ready after {timeout}s, extracting anyway")
+                try:
+                    result = harvest(driver, item, ready)
+                except Exception as e:
+                    result = e
+                open_tabs.remove(tab)
+                close_tab(driver, handle, home_handle)
+                yield item, result, load_seconds
+
+            if open_tabs or pending:
+                time.sleep(poll_interval)
+    finally:
+        for item, handle, _ in open_tabs:
+            close_tab(driver, handle, home_handle)
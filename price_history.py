@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Local price-history store for the EC2 multi-country scraper
+Every run's JSONL results are ingested into an indexed SQLite database, so questions like "cheapest
+country for this hotel and stay over the last 30 days" are answered without loading every result file
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from job_spec import hotel_key
+from result_sink import iter_jsonl_chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = 'hotel_prices/price_history.db'
+
+OBSERVATION_COLUMNS = [
+    'hotel_key', 'hotel_url', 'hotel_name', 'country', 'checkin', 'checkout', 'adults', 'children',
+    'rooms', 'scraped_at', 'amount', 'currency', 'raw_price', 'fetch_method', 'ip_address',
+    'screenshot_s3_url', 'source_file',
+]
+
+
+def resolve_hotel(hotel):
+    """Accept a hotel key ('eg-golden-palace-suites') or a Booking.com hotel URL."""
+    return hotel_key(hotel) if '://' in hotel else hotel
+
+
+def since_timestamp(days):
+    """ISO timestamp days ago, comparable with the stored scraped_at strings."""
+    return (datetime.now() - timedelta(days=days)).isoformat() if days else ''
+
+
+class PriceHistory:
+    """SQLite store of price observations with indexes for per-hotel, per-stay queries."""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS observations (
+                id INTEGER PRIMARY KEY,
+                hotel_key TEXT NOT NULL,
+                hotel_url TEXT,
+                hotel_name TEXT,
+                country TEXT NOT NULL,
+                checkin TEXT,
+                checkout TEXT,
+                adults INTEGER,
+                children INTEGER,
+                rooms INTEGER,
+                scraped_at TEXT NOT NULL,
+                amount REAL,
+                currency TEXT,
+                raw_price TEXT,
+                fetch_method TEXT,
+                ip_address TEXT,
+                screenshot_s3_url TEXT,
+                source_file TEXT
+            )
+        """)
+        # Re-ingesting a run file must not duplicate its observations
+        self._conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS observations_identity
+            ON observations (hotel_key, country, checkin, checkout, adults, children, rooms, scraped_at)
+        """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS observations_stay
+            ON observations (hotel_key, checkin, checkout, scraped_at)
+        """)
+        self._conn.execute("""
+            CREATE INDEX IF NOT EXISTS observations_country
+            ON observations (country, scraped_at)
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS observations_scraped_at ON observations (scraped_at)")
+
+    def ingest_records(self, records, source_file=None):
+        """Insert scraped records that have a price; returns the number of new observations."""
+        import pandas as pd
+
+        from price_normalization import normalize_prices
+
+        records = [record for record in records if record.get('country') and record.get('scraped_at')]
+        if not records:
+            return 0
+
+        # Older result files carry no currency, so amounts and currencies are parsed again in one pass
+        normalized = normalize_prices([record.get('raw_price') for record in records])
+        rows = []
+        hotel_keys = {}
+        for record, amount, currency in zip(records, normalized['amount'], normalized['currency']):
+            if amount != amount:  # NaN: error records and pages without a price
+                continue
+            hotel_url = record.get('hotel_url') or record.get('url') or ''
+            if hotel_url not in hotel_keys:
+                hotel_keys[hotel_url] = hotel_key(hotel_url)
+            rows.append((
+                hotel_keys[hotel_url], hotel_url, record.get('hotel_name'), record['country'],
+                record.get('requested_checkin') or record.get('checkin_date'),
+                record.get('requested_checkout') or record.get('checkout_date'),
+                record.get('adults'), record.get('children'), record.get('rooms'),
+                record['scraped_at'], float(amount), None if currency is pd.NA else str(currency),
+                record.get('raw_price'), record.get('fetch_method'), record.get('ip_address'),
+                record.get('screenshot_s3_url'), source_file,
+            ))
+
+        placeholders = ', '.join('?' for _ in OBSERVATION_COLUMNS)
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO observations ({', '.join(OBSERVATION_COLUMNS)}) VALUES ({placeholders})",
+                rows)
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def ingest_jsonl(self, path, chunk_size=5000):
+        """Ingest a run's JSONL result file; returns the number of new observations."""
+        inserted = 0
+        for chunk in iter_jsonl_chunks(path, chunk_size):
+            inserted += self.ingest_records(chunk, source_file=os.path.basename(path))
+        logger.info(f"Price history: {inserted} new observations from {path}")
+        return inserted
+
+    def _query(self, sql, params):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _stay_filter(hotel, checkin, checkout, days):
+        clauses = ["hotel_key = ?", "scraped_at >= ?"]
+        params = [resolve_hotel(hotel), since_timestamp(days)]
+        if checkin:
+            clauses.append("checkin = ?")
+            params.append(checkin)
+        if checkout:
+            clauses.append("checkout = ?")
+            params.append(checkout)
+        return " AND ".join(clauses), params
+
+    def cheapest_by_country(self, hotel, checkin=None, checkout=None, days=30):
+        """Lowest observed price per country (and currency), cheapest first."""
+        where, params = self._stay_filter(hotel, checkin, checkout, days)
+        return self._query(f"""
+            SELECT country, currency, MIN(amount) AS min_amount, AVG(amount) AS avg_amount,
+                   COUNT(*) AS observations, MAX(scraped_at) AS last_seen
+            FROM observations
+            WHERE {where}
+            GROUP BY country, currency
+            ORDER BY currency, min_amount
+        """, params)
+
+    def price_trend(self, hotel, checkin=None, checkout=None, country=None, days=30):
+        """Daily min/avg/max price, per country and currency, oldest day first."""
+        where, params = self._stay_filter(hotel, checkin, checkout, days)
+        if country:
+            where += " AND country = ?"
+            params.append(country)
+        return self._query(f"""
+            SELECT substr(scraped_at, 1, 10) AS day, country, currency,
+                   MIN(amount) AS min_amount, AVG(amount) AS avg_amount, MAX(amount) AS max_amount,
+                   COUNT(*) AS observations
+            FROM observations
+            WHERE {where}
+            GROUP BY day, country, currency
+            ORDER BY day, country
+        """, params)
+
+    def price_spread(self, hotel, checkin=None, checkout=None, days=30):
+        """Spread between the cheapest and priciest country per stay and currency.
+
+        Each country contributes its latest observation in the window.
+        """
+        where, params = self._stay_filter(hotel, checkin, checkout, days)
+        latest = self._query(f"""
+            SELECT checkin, checkout, currency, country, amount
+            FROM (
+                SELECT checkin, checkout, currency, country, amount,
+                       ROW_NUMBER() OVER (PARTITION BY checkin, checkout, currency, country
+                                          ORDER BY scraped_at DESC) AS recency
+                FROM observations
+                WHERE {where}
+            )
+            WHERE recency = 1
+        """, params)
+
+        stays = {}
+        for row in latest:
+            stays.setdefault((row['checkin'], row['checkout'], row['currency']), []).append(row)
+
+        spreads = []
+        for (stay_checkin, stay_checkout, currency), rows in sorted(stays.items(), key=lambda item: str(item[0])):
+            cheapest = min(rows, key=lambda row: row['amount'])
+            priciest = max(rows, key=lambda row: row['amount'])
+            spread = priciest['amount'] - cheapest['amount']
+            spreads.append({
+                'checkin': stay_checkin,
+                'checkout': stay_checkout,
+                'currency': currency,
+                'countries': len(rows),
+                'cheapest_country': cheapest['country'],
+                'min_amount': cheapest['amount'],
+                'priciest_country': priciest['country'],
+                'max_amount': priciest['amount'],
+                'spread': spread,
+                'spread_pct': round(spread / cheapest['amount'] * 100, 2) if cheapest['amount'] else None,
+            })
+        return spreads
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def print_rows(rows):
+    """Print query results as an aligned table."""
+    if not rows:
+        print("No observations")
+        return
+    columns = list(rows[0])
+    formatted = [[f"{value:.2f}" if isinstance(value, float) else str(value) for value in row.values()]
+                 for row in rows]
+    widths = [max(len(column), *(len(row[i]) for row in formatted)) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in formatted:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the local hotel price history")
+    parser.add_argument('--db', default=DEFAULT_HISTORY_PATH,
+                        help=f"Price history database (default: {DEFAULT_HISTORY_PATH})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest = subparsers.add_parser('ingest', help="Ingest JSONL result files")
+    ingest.add_argument('files', nargs='+')
+
+    for name, help_text in (('cheapest', "Cheapest price per country"),
+                            ('trend', "Daily price trend"),
+                            ('spread', "Price spread between countries per stay")):
+        query = subparsers.add_parser(name, help=help_text)
+        query.add_argument('hotel', help="Hotel key (e.g. eg-golden-palace-suites) or Booking.com URL")
+        query.add_argument('--checkin', help="Check-in date, YYYY-MM-DD")
+        query.add_argument('--checkout', help="Check-out date, YYYY-MM-DD")
+        query.add_argument('--days', type=int, default=30, help="Look back this many days (0: all, default: 30)")
+        if name == 'trend':
+            query.add_argument('--country', help="Only this country")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    history = PriceHistory(args.db)
+    try:
+        if args.command == 'ingest':
+            for path in args.files:
+                history.ingest_jsonl(path)
+            print(f"{history.count()} observations in {args.db}")
+        elif args.command == 'cheapest':
+            print_rows(history.cheapest_by_country(args.hotel, args.checkin, args.checkout, args.days))
+        elif args.command == 'trend':
+            print_rows(history.price_trend(args.hotel, args.checkin, args.checkout, args.country, args.days))
+        elif args.command == 'spread':
+            print_rows(history.price_spread(args.hotel, args.checkin, args.checkout, args.days))
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Vectorized price normalization for scraped and historical raw_price strings
+Detects the currency symbol or ISO code and the locale's grouping/decimal separators over whole
+pandas columns, producing typed amount and currency columns
+"""
+
+import os
+import logging
+import functools
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Symbols as Booking.com prints them; longer symbols first so "US$" wins over "$"
+CURRENCY_SYMBOLS = {
+    'US$': 'USD',
+    'NZ$': 'NZD',
+    'AU$': 'AUD',
+    'A$': 'AUD',
+    'CA$': 'CAD',
+    'C$': 'CAD',
+    'HK$': 'HKD',
+    'S$': 'SGD',
+    'R$': 'BRL',
+    'MX$': 'MXN',
+    'zł': 'PLN',
+    'Kč': 'CZK',
+    'lei': 'RON',
+    '€': 'EUR',
+    '£': 'GBP',
+    '¥': 'JPY',
+    '₹': 'INR',
+    '₩': 'KRW',
+    '₪': 'ILS',
+    '₺': 'TRY',
+    '฿': 'THB',
+    '₫': 'VND',
+    '₱': 'PHP',
+    '$': 'USD',
+}
+
+# ISO 4217 codes Booking.com shows as text, e.g. "EGP 12,345" or "2,150 AED"
+CURRENCY_CODES = [
+    'AED', 'ARS', 'AUD', 'AZN', 'BGN', 'BHD', 'BRL', 'CAD', 'CHF', 'CLP', 'CNY', 'COP', 'CZK',
+    'DKK', 'EGP', 'EUR', 'FJD', 'GBP', 'GEL', 'HKD', 'HUF', 'IDR', 'ILS', 'INR', 'ISK', 'JOD',
+    'JPY', 'KRW', 'KWD', 'KZT', 'MAD', 'MDL', 'MXN', 'MYR', 'NOK', 'NZD', 'OMR', 'PHP', 'PLN',
+    'QAR', 'RON', 'RUB', 'SAR', 'SEK', 'SGD', 'THB', 'TRY', 'TWD', 'UAH', 'USD', 'VND', 'XOF', 'ZAR',
+]
+
+# Any three-letter code matches here and is checked against CURRENCY_CODES afterwards, which is far
+# cheaper than one regex alternative per code
+CURRENCY_PATTERN = r'(\b[A-Z]{3}\b|' + '|'.join(
+    symbol.replace('$', r'\$') for symbol in sorted(CURRENCY_SYMBOLS, key=len, reverse=True)
+) + ')'
+
+# First number in the text, including grouping separators. Punctuation must be followed by a digit
+# and a space by exactly three, so "€ 450 2 nights" stops at 450 while "1 234 567" stays whole
+NUMBER_PATTERN = r"(\d(?:\d|[.,'’](?=\d)|[\s  ](?=\d{3}(?!\d)))*)"
+
+GROUPING_SPACES = r"['’\s  ]"
+
+
+def _normalize_unique(text):
+    """Vectorized parse of a string Series; returns (amount float64 array, currency Series)."""
+    currency = text.str.extract(CURRENCY_PATTERN, expand=False)
+    currency = currency.map(lambda value: CURRENCY_SYMBOLS.get(value, value), na_action='ignore')
+    currency = currency.where(currency.isin(CURRENCY_CODES)).astype('string')
+
+    number = text.str.extract(NUMBER_PATTERN, expand=False).str.replace(GROUPING_SPACES, '', regex=True)
+
+    last_comma = number.str.rfind(',').astype('Int64')
+    last_dot = number.str.rfind('.').astype('Int64')
+    length = number.str.len().astype('Int64')
+    commas = number.str.count(',').astype('Int64')
+    dots = number.str.count(r'\.').astype('Int64')
+
+    last_separator = np.maximum(last_comma.fillna(-1), last_dot.fillna(-1))
+    digits_after = (length.fillna(0) - last_separator - 1)
+    comma_is_last = (last_comma.fillna(-1) > last_dot.fillna(-1))
+
+    # Decimal separator: the last one when both kinds occur, else a single one not followed by 3 digits
+    both = (commas > 0) & (dots > 0)
+    single_comma = (commas == 1) & (dots == 0) & (digits_after != 3)
+    single_dot = (dots == 1) & (commas == 0) & (digits_after != 3)
+    decimal_comma = ((both & comma_is_last) | single_comma).fillna(False).astype(bool)
+    decimal_dot = ((both & ~comma_is_last) | single_dot).fillna(False).astype(bool)
+
+    plain = number.str.replace(r'[.,]', '', regex=True)
+    comma_decimal = number.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    dot_decimal = number.str.replace(',', '', regex=False)
+    normalized = plain.mask(decimal_comma, comma_decimal).mask(decimal_dot, dot_decimal)
+
+    amount = pd.to_numeric(normalized, errors='coerce').astype('float64')
+    return amount.to_numpy(), currency
+
+
+def normalize_prices(raw_prices):
+    """Parse a column of raw price strings into a DataFrame with 'amount' and 'currency' columns.
+
+    A separator that occurs last and is followed by one or two digits is the decimal separator
+    (1.234,56 and 1,234.56 both give 1234.56); a lone separator followed by three digits and
+    repeated separators are grouping (1,234 and 1.234 both give 1234). Unparseable prices get
+    NaN / <NA> instead of raising. The result keeps the index of raw_prices.
+    """
+    text = raw_prices if isinstance(raw_prices, pd.Series) else pd.Series(raw_prices)
+
+    # Price histories repeat the same strings a lot, so each distinct one is parsed once
+    codes, uniques = pd.factorize(text.astype('string'))
+    amount, currency = _normalize_unique(pd.Series(uniques, dtype='string'))
+
+    missing = codes < 0
+    codes = np.where(missing, 0, codes)
+    amount = np.where(missing, np.nan, amount[codes]) if len(uniques) else np.full(len(text), np.nan)
+    currency = (currency.take(codes).where(~missing).array if len(uniques)
+                else pd.array([pd.NA] * len(text), dtype='string'))
+    return pd.DataFrame({'amount': amount, 'currency': currency}, index=text.index)
+
+
+def normalize_price_column(df, column='raw_price', prefix='price'):
+    """Return df with <prefix>_amount and <prefix>_currency columns parsed from column."""
+    normalized = normalize_prices(df[column])
+    return df.assign(**{f"{prefix}_amount": normalized['amount'], f"{prefix}_currency": normalized['currency']})
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_price(price_text):
+    """Parse one raw price string into (amount, currency); either may be None."""
+    row = normalize_prices([price_text]).iloc[0]
+    amount = None if pd.isna(row['amount']) else float(row['amount'])
+    currency = None if pd.isna(row['currency']) else str(row['currency'])
+    return amount, currency
+
+
+def read_price_history(path):
+    """Read a Parquet file/directory or a CSV file of scraped records into a DataFrame."""
+    if path.endswith('.csv'):
+        return pd.read_csv(path, dtype={'raw_price': 'string'})
+    if path.endswith('.jsonl'):
+        return pd.read_json(path, lines=True, dtype={'raw_price': 'string'})
+    return pd.read_parquet(path)
+
+
+def normalize_history(input_path, output_path, column='raw_price'):
+    """Re-normalize the prices of a historical dataset and write it as Parquet; returns the row count."""
+    df = normalize_price_column(read_price_history(input_path), column)
+
+    unparsed = int(df['price_amount'].isna().sum())
+    if unparsed:
+        logger.warning(f"{unparsed}/{len(df)} prices in {input_path} could not be parsed")
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    df.to_parquet(output_path, index=False)
+    logger.info(f"Normalized {len(df)} prices from {input_path} into {output_path}")
+    return len(df)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-normalize raw_price strings of a historical dataset")
+    parser.add_argument('input', help="Parquet file/directory, CSV or JSONL file of scraped records")
+    parser.add_argument('output', help="Parquet file to write with price_amount/price_currency columns")
+    parser.add_argument('--column', default='raw_price', help="Column holding the raw price text")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    normalize_history(args.input, args.output, args.column)
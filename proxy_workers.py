@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Parallel multi-country scraping through per-worker proxy egress
+Each worker drives its own Chrome process whose traffic leaves through the proxy of one country,
+so several countries can be scraped at once without touching the host-wide NordVPN route
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit, urlunsplit
+
+from driver_pool import ChromeDriverPool
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_PROXY_SCHEMES = ('http', 'https', 'socks4', 'socks5')
+
+
+def load_proxy_map(path):
+    """Load a JSON file mapping NordVPN country names to proxy URLs.
+
+    Example:
+        {
+          "Germany": "socks5://127.0.0.1:1081",
+          "Japan": "http://127.0.0.1:8082"
+        }
+
+    Chrome cannot authenticate against a proxy given on the command line, so credentialed
+    NordVPN SOCKS/HTTP endpoints should be fronted by a local forwarder per country.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        proxy_map = json.load(f)
+
+    for country, proxy_url in proxy_map.items():
+        scheme = urlsplit(proxy_url).scheme
+        if scheme not in SUPPORTED_PROXY_SCHEMES:
+            raise ValueError(f"Unsupported proxy scheme '{scheme}' for {country}: {proxy_url}")
+
+    return proxy_map
+
+
+def chrome_proxy_server(proxy_url):
+    """Return the proxy URL in the form Chrome's --proxy-server accepts (no credentials)."""
+    parts = urlsplit(proxy_url)
+    if parts.username or parts.password:
+        logger.warning(f"Chrome ignores proxy credentials, use a local forwarder for {parts.hostname}")
+
+    netloc = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+    return urlunsplit((parts.scheme, netloc, '', '', ''))
+
+
+def curl_proxy_url(proxy_url):
+    """Return the proxy URL for curl, resolving DNS through SOCKS5 proxies like Chrome does."""
+    if proxy_url.startswith('socks5://'):
+        return 'socks5h://' + proxy_url[len('socks5://'):]
+    return proxy_url
+
+
+def run_proxy_sweep(schedule, proxy_map, scrape_batch, driver_factory, driver_teardown,
+                    max_workers=4, max_pages=25, max_rss_mb=1500):
+    """Scrape up to max_workers countries concurrently, each through its own proxy.
+
+    scrape_batch(country, batch, driver_pool, proxy) must return (records, failed_targets).
+    Returns (record_count, successful_countries, failed_countries, failed_targets).
+    """
+    proxies_by_name = {country.lower(): proxy for country, proxy in proxy_map.items()}
+
+    record_count = 0
+    successful_countries = []
+    failed_countries = []
+    failed_targets = 0
+
+    def run_country(country, batch, proxy_url):
+        # A Chrome proxy is fixed at launch, so every country gets its own browser process
+        driver_pool = ChromeDriverPool(
+            lambda: driver_factory(proxy_server=chrome_proxy_server(proxy_url), remote_debugging_port=0),
+            driver_teardown, max_size=1, max_pages=max_pages, max_rss_mb=max_rss_mb)
+        try:
+            return scrape_batch(country, batch, driver_pool, curl_proxy_url(proxy_url))
+        finally:
+            driver_pool.close()
+
+    runnable = []
+    for country, batch in schedule:
+        proxy_url = proxies_by_name.get(country.lower())
+        if proxy_url is None:
+            logger.warning(f"No proxy configured for {country}, skipping {len(batch)} targets")
+            failed_countries.append(country)
+            failed_targets += len(batch)
+            continue
+        runnable.append((country, batch, proxy_url))
+
+    logger.info(f"Scraping {len(runnable)} countries with up to {max_workers} parallel proxy workers")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='proxy-worker') as executor:
+        futures = {
+            executor.submit(run_country, country, batch, proxy_url): (country, batch)
+            for country, batch, proxy_url in runnable
+        }
+
+        for future in as_completed(futures):
+            country, batch = futures[future]
+            try:
+                records, country_failed_targets = future.result()
+            except Exception as e:
+                logger.error(f"Proxy worker for {country} failed: {e}")
+                records, country_failed_targets = [], len(batch)
+
+            record_count += len(records)
+            failed_targets += country_failed_targets
+            if records:
+                successful_countries.append(country)
+                logger.info(f"Success for {country}: {len(records)}/{len(batch)} targets")
+            else:
+                failed_countries.append(country)
+
+    return record_count, successful_countries, failed_countries, failed_targets
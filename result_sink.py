@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Streaming result sink for the EC2 multi-country scraper
+Appends each record to an fsync'd JSONL file as soon as it is scraped, and rolls finished records
+into Parquet files partitioned by scrape date and hotel
+"""
+
+import os
+import json
+import logging
+import threading
+
+from job_spec import hotel_key
+
+logger = logging.getLogger(__name__)
+
+# Nested fields stored as JSON strings in Parquet so every part file shares one schema
+JSON_ENCODED_FIELDS = ('matched_selectors', 'screenshot_clip')
+
+
+class JsonlResultSink:
+    """Thread-safe append-only JSONL writer that makes every record durable before returning."""
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record):
+        """Append one record and flush it to disk so readers can tail the file live."""
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RecordingSink:
+    """Forwards records to another sink and keeps them, e.g. to store one leased batch on its own."""
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.records = []
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        if self.sink is not None:
+            self.sink.write(record)
+        with self._lock:
+            self.records.append(record)
+
+
+def iter_jsonl_chunks(path, chunk_size=500):
+    """Yield lists of up to chunk_size records from a JSONL file, skipping a torn last line."""
+    chunk = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                chunk.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping unreadable line {line_number} of {path}")
+                continue
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def write_parquet_partitions(records, output_dir, part_name):
+    """Write records under output_dir/scrape_date=YYYY-MM-DD/hotel=<key>/<part_name>.parquet.
+
+    Returns the list of files written; empty if pandas/pyarrow are unavailable.
+    """
+    try:
+        import pandas as pd
+        import pyarrow  # noqa: F401 - pandas needs it to write Parquet
+    except ImportError:
+        logger.warning("pandas/pyarrow not installed, skipping Parquet output")
+        return []
+
+    partitions = {}
+    for record in records:
+        row = dict(record)
+        for field in JSON_ENCODED_FIELDS:
+            if field in row and not isinstance(row[field], str):
+                row[field] = json.dumps(row[field], ensure_ascii=False)
+        scrape_date = (row.get('scraped_at') or 'unknown')[:10]
+        hotel = hotel_key(row.get('hotel_url') or row.get('url') or '')
+        partitions.setdefault((scrape_date, hotel), []).append(row)
+
+    written = []
+    for (scrape_date, hotel), rows in partitions.items():
+        partition_dir = os.path.join(output_dir, f"scrape_date={scrape_date}", f"hotel={hotel}")
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, f"{part_name}.parquet")
+        pd.DataFrame(rows).to_parquet(path, index=False)
+        written.append(path)
+
+    return written
+
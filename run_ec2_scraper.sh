@@ -103,7 +103,7 @@ deactivate
 
 echo ""
 echo "Check results in:"
-echo "   - hotel_prices/ directory for CSV/JSON files"
+echo "   - hotel_prices/ directory for JSONL/Parquet results"
 echo "   - screenshots/ directory for visual evidence"
 echo "   - hotel_scraper.log for detailed logs"
 echo ""
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Durable run state for long country sweeps
+Records every (hotel, dates, guests, country) task as pending, done or failed in SQLite, so an
+interrupted run can be resumed without re-scraping completed work
+"""
+
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def task_id(target, country):
+    """Return a stable id for a target scraped from a country."""
+    key = json.dumps([target['url'], country], ensure_ascii=False)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class RunState:
+    """SQLite-backed task ledger for one sweep."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                hotel_url TEXT NOT NULL,
+                url TEXT NOT NULL,
+                checkin TEXT,
+                checkout TEXT,
+                country TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """)
+
+    def reset(self):
+        """Forget all tasks, for a fresh (non-resumed) run."""
+        with self._lock:
+            self._conn.execute("DELETE FROM tasks")
+            self._conn.execute("DELETE FROM runs")
+
+    def set_value(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO runs (key, value) VALUES (?, ?)", (key, value))
+
+    def get_value(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM runs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def register(self, schedule):
+        """Add every (country, target) of the schedule as pending unless it is already known."""
+        now = datetime.now().isoformat()
+        rows = [
+            (task_id(target, country), target['hotel_url'], target['url'], target['checkin'],
+             target['checkout'], country, PENDING, now)
+            for country, batch in schedule for target in batch
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("""
+                INSERT OR IGNORE INTO tasks
+                    (task_id, hotel_url, url, checkin, checkout, country, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.execute("COMMIT")
+
+    def _set_status(self, target, country, status, error=None):
+        with self._lock:
+            self._conn.execute("""
+                UPDATE tasks SET status = ?, attempts = attempts + 1, last_error = ?, updated_at = ?
+                WHERE task_id = ?
+            """, (status, error, datetime.now().isoformat(), task_id(target, country)))
+
+    def mark_done(self, target, country):
+        self._set_status(target, country, DONE)
+
+    def mark_failed(self, target, country, error=None):
+        self._set_status(target, country, FAILED, error)
+
+    def remaining(self, schedule):
+        """Filter a schedule down to the tasks that are not done yet."""
+        with self._lock:
+            done = {row[0] for row in self._conn.execute("SELECT task_id FROM tasks WHERE status = ?", (DONE,))}
+
+        remaining = []
+        for country, batch in schedule:
+            todo = [target for target in batch if task_id(target, country) not in done]
+            if todo:
+                remaining.append((country, todo))
+        return remaining
+
+    def counts(self):
+        """Return {status: number of tasks}."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
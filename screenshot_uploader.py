@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Concurrent, compressed screenshot upload pipeline for S3
+Converts PNG screenshots to WebP/JPEG (optionally clipped to the pricing section) and uploads them
+from a thread pool over one shared S3 client, so uploads can overlap with scraping
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from metrics import span
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; screenshots are uploaded as PNG without it
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+# Extra context kept around the pricing section when clipping, in CSS pixels
+CLIP_MARGIN = 40
+
+
+def convert_screenshot(local_file_path, image_format='webp', quality=80, clip=None):
+    """Convert a PNG screenshot to image_format, cropped to clip if given.
+
+    clip is {'x', 'y', 'width', 'height', 'device_pixel_ratio'} in viewport CSS pixels.
+    Returns (path, format) of the file to upload; the PNG itself when no conversion happens.
+    A crop is written next to the screenshot as <name>_clip.<ext>, so the full page is kept.
+    """
+    if image_format == 'png' and not clip:
+        return local_file_path, 'png'
+    if Image is None:
+        logger.warning("Pillow is not installed, uploading screenshots as PNG")
+        return local_file_path, 'png'
+
+    with Image.open(local_file_path) as image:
+        clipped = False
+        if clip:
+            ratio = clip.get('device_pixel_ratio') or 1
+            left = max(0, int((clip['x'] - CLIP_MARGIN) * ratio))
+            top = max(0, int((clip['y'] - CLIP_MARGIN) * ratio))
+            right = min(image.width, int((clip['x'] + clip['width'] + CLIP_MARGIN) * ratio))
+            bottom = min(image.height, int((clip['y'] + clip['height'] + CLIP_MARGIN) * ratio))
+            if right > left and bottom > top:
+                image = image.crop((left, top, right, bottom))
+                clipped = True
+
+        if image_format == 'png' and not clipped:
+            return local_file_path, 'png'
+
+        extension = 'jpg' if image_format == 'jpeg' else image_format
+        output_path = f"{os.path.splitext(local_file_path)[0]}{'_clip' if clipped else ''}.{extension}"
+        if image_format == 'jpeg':
+            image.convert('RGB').save(output_path, 'JPEG', quality=quality, optimize=True)
+        elif image_format == 'webp':
+            image.save(output_path, 'WEBP', quality=quality, method=4)
+        else:
+            image.save(output_path, 'PNG', optimize=True)
+
+    return output_path, image_format
+
+
+class ScreenshotUploader:
+    """Uploads screenshots to S3 from a thread pool over a shared client."""
+
+    def __init__(self, bucket_name="apartmentscreenshots", key_prefix="hotel-scraper",
+                 image_format='webp', quality=80, clip_to_pricing=False, max_workers=4,
+                 s3_client=None):
+        self.bucket_name = bucket_name
+        self.key_prefix = key_prefix
+        self.image_format = image_format
+        self.quality = quality
+        self.clip_to_pricing = clip_to_pricing
+
+        self.s3_client = s3_client or boto3.client(
+            's3', config=Config(max_pool_connections=max(10, max_workers * 2))
+        )
+        # Screenshots are small, so single-part uploads with some per-file concurrency are enough
+        self.transfer_config = TransferConfig(
+            multipart_threshold=16 * 1024 * 1024,
+            max_concurrency=2,
+            use_threads=True
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='s3-upload')
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+
+    def upload(self, local_file_path, clip=None, country=None):
+        """Convert and upload one screenshot; returns its s3:// URL or None on failure."""
+        try:
+            upload_path, image_format = convert_screenshot(
+                local_file_path, self.image_format, self.quality,
+                clip if self.clip_to_pricing else None
+            )
+
+            # Create S3 key with timestamp prefix for organization
+            filename = os.path.basename(upload_path)
+            timestamp_prefix = datetime.now().strftime("%Y/%m/%d")
+            s3_key = f"{self.key_prefix}/{timestamp_prefix}/{filename}"
+
+            logger.info(f"Uploading {filename} to S3 bucket {self.bucket_name}")
+            with span('s3_upload', country):
+                self.s3_client.upload_file(
+                    upload_path, self.bucket_name, s3_key,
+                    ExtraArgs={'ContentType': CONTENT_TYPES[image_format]},
+                    Config=self.transfer_config
+                )
+
+            s3_url = f"s3://{self.bucket_name}/{s3_key}"
+            logger.info(f"Screenshot uploaded successfully: {s3_url}")
+            return s3_url
+
+        except ClientError as e:
+            logger.error(f"Failed to upload screenshot to S3: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error uploading to S3: {e}")
+            return None
+
+    def submit(self, local_file_path, clip=None, country=None):
+        """Queue a screenshot for upload; returns a future resolving to its s3:// URL or None.
+
+        Submitting the same file again returns the existing future instead of uploading twice.
+        """
+        with self._futures_lock:
+            future = self._futures.get(local_file_path)
+            if future is None:
+                future = self._executor.submit(self.upload, local_file_path, clip, country)
+                self._futures[local_file_path] = future
+            return future
+
+    def close(self, wait=True):
+        """Stop accepting uploads, optionally waiting for queued ones to finish."""
+        self._executor.shutdown(wait=wait)
+
+
+_default_uploaders = {}
+_default_uploaders_lock = threading.Lock()
+
+
+def get_screenshot_uploader(bucket_name="apartmentscreenshots"):
+    """Return a shared PNG uploader for bucket_name, reusing its S3 client between calls."""
+    with _default_uploaders_lock:
+        if bucket_name not in _default_uploaders:
+            _default_uploaders[bucket_name] = ScreenshotUploader(bucket_name, image_format='png')
+        return _default_uploaders[bucket_name]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Persisted selector statistics for Booking.com extraction
+Records which selector matched each field on every page, orders selector lists by their recent
+hit rate so the usual match is tried first, and flags selectors that have stopped matching
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SELECTOR_STATS_PATH = 'hotel_prices/selector_stats.db'
+
+# Weight kept by the hit-rate score per page, so a layout change takes over within ~20 pages
+SCORE_DECAY = 0.9
+
+# Price selectors form a priority list (the discounted price wins over the struck-through original
+# when both are on the page), so they are tracked but never reordered
+FIXED_ORDER_FIELDS = {'raw_price'}
+
+
+class SelectorStats:
+    """SQLite-backed per-field selector hit counts with an in-memory copy for ordering.
+
+    Each recorded page updates every selector of a field: the matching one gains a hit, the
+    others age. A selector that matched before but not in the last stale_after pages is stale.
+    """
+
+    def __init__(self, path=DEFAULT_SELECTOR_STATS_PATH, stale_after=50):
+        self.path = path
+        self.stale_after = stale_after
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS selector_stats (
+                field TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                score REAL NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0,
+                pages INTEGER NOT NULL DEFAULT 0,
+                pages_since_hit INTEGER NOT NULL DEFAULT 0,
+                last_hit_at TEXT,
+                PRIMARY KEY (field, selector)
+            )
+        """)
+        self._stats = {}
+        for row in self._conn.execute("""
+            SELECT field, selector, score, hits, pages, pages_since_hit, last_hit_at FROM selector_stats
+        """):
+            self._stats[(row[0], row[1])] = {
+                'score': row[2], 'hits': row[3], 'pages': row[4],
+                'pages_since_hit': row[5], 'last_hit_at': row[6],
+            }
+
+    def ordered(self, field, selectors):
+        """Return selectors with the best recent hit rate first; ties keep their listed order."""
+        if field in FIXED_ORDER_FIELDS:
+            return list(selectors)
+        with self._lock:
+            scores = [self._stats.get((field, selector), {}).get('score', 0) for selector in selectors]
+        return [selector for _, _, selector in
+                sorted(zip((-score for score in scores), range(len(selectors)), selectors))]
+
+    def ordered_fields(self, field_selectors):
+        """Return a {field: selectors} mapping with every list ordered by ordered()."""
+        return {field: self.ordered(field, selectors) for field, selectors in field_selectors.items()}
+
+    def record(self, field, selectors, matched=None):
+        """Record one page on which matched (or nothing, with None) won among selectors."""
+        self.record_page({field: selectors}, {field: matched} if matched else {})
+
+    def record_page(self, field_selectors, matched):
+        """Record one page's extraction: field_selectors as tried, matched as {field: selector}."""
+        now = datetime.now().isoformat()
+        rows = []
+        newly_stale = []
+        with self._lock:
+            for field, selectors in field_selectors.items():
+                for selector in selectors:
+                    stats = self._stats.setdefault((field, selector), {
+                        'score': 0, 'hits': 0, 'pages': 0, 'pages_since_hit': 0, 'last_hit_at': None,
+                    })
+                    hit = matched.get(field) == selector
+                    stats['score'] = stats['score'] * SCORE_DECAY + (1 if hit else 0)
+                    stats['pages'] += 1
+                    if hit:
+                        stats['hits'] += 1
+                        stats['pages_since_hit'] = 0
+                        stats['last_hit_at'] = now
+                    else:
+                        stats['pages_since_hit'] += 1
+                        if stats['hits'] and stats['pages_since_hit'] == self.stale_after:
+                            newly_stale.append((field, selector, stats['last_hit_at']))
+                    rows.append((field, selector, stats['score'], stats['hits'], stats['pages'],
+                                 stats['pages_since_hit'], stats['last_hit_at']))
+
+            self._conn.execute("BEGIN")
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO selector_stats
+                    (field, selector, score, hits, pages, pages_since_hit, last_hit_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.execute("COMMIT")
+
+        for field, selector, last_hit_at in newly_stale:
+            logger.warning(f"Selector for {field} stopped matching: {selector} "
+                           f"(no hit in {self.stale_after} pages, last hit {last_hit_at})")
+
+    def stale_selectors(self):
+        """Return selectors that matched before but not in the last stale_after pages.
+
+        A field on which no selector matched for stale_after pages is reported once with
+        selector None, since its whole list may need updating.
+        """
+        stale = []
+        with self._lock:
+            fields = {}
+            for (field, selector), stats in self._stats.items():
+                fields.setdefault(field, []).append((selector, stats))
+            for field, entries in sorted(fields.items()):
+                for selector, stats in entries:
+                    if stats['hits'] and stats['pages_since_hit'] >= self.stale_after:
+                        stale.append({'field': field, 'selector': selector, 'hits': stats['hits'],
+                                      'pages_since_hit': stats['pages_since_hit'],
+                                      'last_hit_at': stats['last_hit_at']})
+                if min(stats['pages_since_hit'] for _, stats in entries) >= self.stale_after:
+                    last_hits = [stats['last_hit_at'] for _, stats in entries if stats['last_hit_at']]
+                    stale.append({'field': field, 'selector': None,
+                                  'hits': sum(stats['hits'] for _, stats in entries),
+                                  'pages_since_hit': min(stats['pages_since_hit'] for _, stats in entries),
+                                  'last_hit_at': max(last_hits) if last_hits else None})
+        return stale
+
+    def report(self):
+        """Return every tracked selector with its hit rate, best first within each field."""
+        with self._lock:
+            rows = [{'field': field, 'selector': selector, 'score': round(stats['score'], 3),
+                     'hits': stats['hits'], 'pages': stats['pages'],
+                     'hit_rate': round(stats['hits'] / stats['pages'], 3) if stats['pages'] else None,
+                     'pages_since_hit': stats['pages_since_hit'], 'last_hit_at': stats['last_hit_at']}
+                    for (field, selector), stats in self._stats.items()]
+        return sorted(rows, key=lambda row: (row['field'], -row['score'], -row['hits']))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    import argparse
+
+    from price_history import print_rows
+
+    parser = argparse.ArgumentParser(description="Report selector hit rates and stale selectors")
+    parser.add_argument('--db', default=DEFAULT_SELECTOR_STATS_PATH,
+                        help=f"Selector statistics database (default: {DEFAULT_SELECTOR_STATS_PATH})")
+    parser.add_argument('--stale-after', type=int, default=50,
+                        help="Pages without a hit after which a selector is stale (default: 50)")
+    parser.add_argument('--stale', action='store_true', help="Only list stale selectors")
+    args = parser.parse_args(argv)
+
+    stats = SelectorStats(args.db, args.stale_after)
+    try:
+        rows = stats.stale_selectors() if args.stale else stats.report()
+        if rows:
+            print_rows(rows)
+        else:
+            print("No stale selectors" if args.stale else f"No selector statistics in {args.db}")
+    finally:
+        stats.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Content-addressed archive of scraped page sources for the EC2 multi-country scraper
+Stores each page's HTML once as a zstd-compressed blob named by its SHA-256, and re-runs the
+extractor over archived pages offline, without a browser or VPN
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:  # zstandard is only needed when page snapshots are enabled
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_DIR = 'hotel_prices/snapshots'
+
+# Record fields rewritten by a re-extraction; everything else is kept from the original scrape
+EXTRACTED_FIELDS = ('hotel_name', 'address', 'rating', 'raw_price', 'cleaned_price', 'currency',
+                    'checkin_date', 'checkout_date', 'nights', 'matched_selectors')
+
+
+class SnapshotArchive:
+    """Directory of <root>/<sha[:2]>/<sha>.html.zst blobs, one per distinct page source.
+
+    Identical pages, e.g. the same hotel served alike in several countries, share one blob.
+    Blobs are written to a temporary file and renamed, so concurrent writers never leave a
+    partial blob behind.
+    """
+
+    def __init__(self, root=DEFAULT_SNAPSHOT_DIR, level=3):
+        if zstandard is None:
+            raise ImportError("zstandard is required for page snapshots (pip install zstandard)")
+        self.root = root
+        self.level = level
+        self._local = threading.local()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], f"{digest}.html.zst")
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, html):
+        """Store a page source unless an identical one is archived already; returns its digest."""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            return digest
+
+        # Compressor objects are not thread-safe, so every scraping thread keeps its own
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        compressed = compressor.compress(data)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest):
+        """Return an archived page source; raises FileNotFoundError for unknown digests."""
+        with open(self.path(digest), 'rb') as f:
+            compressed = f.read()
+        return zstandard.ZstdDecompressor().decompress(compressed).decode('utf-8')
+
+    def digests(self):
+        """Yield the digest of every archived page."""
+        for prefix in sorted(os.listdir(self.root)):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in sorted(os.listdir(prefix_dir)):
+                if name.endswith('.html.zst'):
+                    yield name[:-len('.html.zst')]
+
+    def stats(self):
+        """Return the number of blobs and their compressed and original sizes."""
+        blobs = compressed_bytes = original_bytes = 0
+        for digest in self.digests():
+            with open(self.path(digest), 'rb') as f:
+                header = f.read(18)  # Longest zstd frame header
+            blobs += 1
+            compressed_bytes += os.path.getsize(self.path(digest))
+            content_size = zstandard.frame_content_size(header)
+            original_bytes += max(content_size, 0)
+        return {
+            'blobs': blobs,
+            'compressed_mb': compressed_bytes / 1024 / 1024,
+            'original_mb': original_bytes / 1024 / 1024,
+            'ratio': original_bytes / compressed_bytes if compressed_bytes else 0.0,
+        }
+
+
+_worker_archive = None
+
+
+def _extract_snapshot(root, digest):
+    """Process pool worker: re-extract one archived page; returns (digest, fields, matched, error)."""
+    global _worker_archive
+    from http_fetcher import extract_fields_from_html
+
+    if _worker_archive is None or _worker_archive.root != root:
+        _worker_archive = SnapshotArchive(root)
+    try:
+        fields, matched = extract_fields_from_html(_worker_archive.get(digest))
+        return digest, fields, matched, None
+    except Exception as e:
+        return digest, None, None, str(e)
+
+
+def reextract(result_paths, output_path, root=DEFAULT_SNAPSHOT_DIR, workers=None):
+    """Re-run the extractor over the archived page of every record in result_paths.
+
+    Each distinct snapshot is extracted once in a process pool with the current selector
+    lists. Records are written to output_path with their extracted fields replaced; records
+    without a usable snapshot are copied unchanged. Returns a summary dict.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from http_fetcher import build_hotel_data
+    from result_sink import JsonlResultSink, iter_jsonl_chunks
+
+    archive = SnapshotArchive(root)
+    digests = set()
+    for path in result_paths:
+        for chunk in iter_jsonl_chunks(path):
+            digests.update(record['page_snapshot'] for record in chunk if record.get('page_snapshot'))
+    missing = {digest for digest in digests if digest not in archive}
+    if missing:
+        logger.warning(f"{len(missing)} snapshots referenced by the results are not in {root}")
+
+    extracted = {}
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        todo = sorted(digests - missing)
+        for digest, fields, matched, error in executor.map(_extract_snapshot, [root] * len(todo), todo,
+                                                           chunksize=16):
+            if error:
+                logger.warning(f"Could not re-extract snapshot {digest}: {error}")
+                failed += 1
+                continue
+            extracted[digest] = build_hotel_data(fields, matched)
+
+    summary = {'records': 0, 'reextracted': 0, 'snapshots': len(extracted), 'missing_snapshots': len(missing),
+               'failed_snapshots': failed, 'price_changed': 0, 'price_recovered': 0}
+    with JsonlResultSink(output_path, fsync=False) as sink:
+        for path in result_paths:
+            for chunk in iter_jsonl_chunks(path):
+                for record in chunk:
+                    summary['records'] += 1
+                    hotel_data = extracted.get(record.get('page_snapshot'))
+                    if hotel_data is None:
+                        sink.write(record)
+                        continue
+
+                    updated = dict(record)
+                    updated.update({'raw_price': 'No price found', 'cleaned_price': None, 'currency': None})
+                    updated.update({field: hotel_data[field] for field in EXTRACTED_FIELDS if field in hotel_data})
+                    updated['reextracted_at'] = datetime.now().isoformat()
+                    summary['reextracted'] += 1
+                    if updated['cleaned_price'] != record.get('cleaned_price'):
+                        summary['price_changed'] += 1
+                        if record.get('cleaned_price') is None:
+                            summary['price_recovered'] += 1
+                    sink.write(updated)
+
+    logger.info(f"Re-extracted {summary['reextracted']} of {summary['records']} records into {output_path}")
+    return summary
+
+
+def main(argv=None):
+    import argparse
+
+    from price_history import print_rows
+
+    parser = argparse.ArgumentParser(description="Inspect the page snapshot archive or re-extract records from it")
+    parser.add_argument('--snapshot-dir', default=DEFAULT_SNAPSHOT_DIR,
+                        help=f"Snapshot archive directory (default: {DEFAULT_SNAPSHOT_DIR})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    reextract_parser = subparsers.add_parser('reextract', help="Re-run the extractor over archived pages")
+    reextract_parser.add_argument('results', nargs='+', help="JSONL result files whose records to re-extract")
+    reextract_parser.add_argument('--output', help="Output JSONL file "
+                                  "(default: hotel_prices/reextracted_<timestamp>.jsonl)")
+    reextract_parser.add_argument('--workers', type=int, help="Extraction processes (default: CPU count)")
+
+    subparsers.add_parser('stats', help="Show the archive's size and compression ratio")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == 'stats':
+        print_rows([SnapshotArchive(args.snapshot_dir).stats()])
+        return
+
+    output = args.output or f"hotel_prices/reextracted_{datetime.now():%Y%m%d_%H%M%S}.jsonl"
+    print_rows([reextract(args.results, output, args.snapshot_dir, args.workers)])
+
+
+if __name__ == "__main__":
+    main()
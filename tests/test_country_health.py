@@ -0,0 +1,63 @@
+import multi_country_hotel_scraper_ec2 as scraper
+from country_health import CountryHealth, run_with_retries
+
+
+class RecordingHealth:
+    """Breaker that never opens and remembers every recorded attempt."""
+
+    def __init__(self):
+        self.records = []
+
+    def filter_schedule(self, schedule):
+        return schedule, []
+
+    def allow(self, country):
+        return True
+
+    def record(self, country, succeeded, targets=None, failed_targets=None, error=None):
+        self.records.append((country, succeeded, targets, failed_targets, error))
+
+
+def test_error_record_is_retried_and_recorded_as_failure(monkeypatch):
+    attempts = []
+
+    def scrape(url, country, driver_pool=None, proxy=None):
+        attempts.append(url)
+        if len(attempts) == 1:
+            return scraper.scrape_error_record(url, country, 'Timed out', '1.2.3.4')
+        return {'hotel_name': 'Golden', 'raw_price': '€ 900', 'cleaned_price': 900.0}
+
+    monkeypatch.setattr(scraper, 'check_exit_country', lambda country, proxy=None: {})
+    monkeypatch.setattr(scraper, 'scrape_hotel_for_country', scrape)
+    target = {'url': 'a', 'hotel_url': 'a', 'checkin': '2026-02-17', 'checkout': '2026-02-24',
+              'adults': 2, 'children': 0, 'rooms': 1}
+
+    def run_pass(schedule, state):
+        record_count = 0
+        for country, batch in schedule:
+            records, _ = scraper.scrape_country_batch(country, batch, None, state=state)
+            record_count += len(records)
+        return record_count, [], [], 0
+
+    health = RecordingHealth()
+    record_count, successful, failed, failed_targets, skipped = run_with_retries(
+        run_pass, [('Germany', [target])], health=health, max_retries=1, retry_backoff=0)
+
+    assert attempts == ['a', 'a']
+    assert health.records == [('Germany', False, 1, 1, 'Error: Timed out'), ('Germany', True, 1, 0, None)]
+    assert (record_count, successful, failed, failed_targets, skipped) == (1, ['Germany'], [], 0, [])
+
+
+def test_breaker_opens_after_threshold(tmp_path):
+    health = CountryHealth(str(tmp_path / 'health.db'), threshold=2, cooldown_hours=1)
+    try:
+        health.record('Japan', False, 1, 1, 'Error: Timed out')
+        assert health.allow('Japan')
+        health.record('Japan', False, 1, 1, 'Error: Timed out')
+        assert not health.allow('Japan')
+        assert health.filter_schedule([('Japan', [{}]), ('France', [{}])]) == ([('France', [{}])], [('Japan', [{}])])
+
+        health.reset('Japan')
+        assert health.allow('Japan')
+    finally:
+        health.close()
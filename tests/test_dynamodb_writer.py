@@ -0,0 +1,27 @@
+import boto3
+from moto import mock_aws
+
+from dynamodb_writer import DynamoDBBatchWriter
+
+
+def test_items_with_the_same_key_are_written_once_last_one_wins():
+    with mock_aws():
+        client = boto3.client('dynamodb', region_name='eu-west-1')
+        client.create_table(
+            TableName='scraper',
+            KeySchema=[{'AttributeName': 'country_hotel', 'KeyType': 'HASH'},
+                       {'AttributeName': 'scraped_at', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'country_hotel', 'AttributeType': 'S'},
+                                  {'AttributeName': 'scraped_at', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST')
+
+        items = [{'country_hotel': f'Germany#{i % 15}', 'scraped_at': '2026-02-17T10:00:00', 'price': i}
+                 for i in range(30)]
+        outcomes = DynamoDBBatchWriter(max_workers=2).write_items(items)
+
+        assert [outcome['status'] for outcome in outcomes] == ['written'] * 30
+        assert outcomes[3]['key'] == ('Germany#3', '2026-02-17T10:00:00')
+        stored = client.scan(TableName='scraper')['Items']
+        assert len(stored) == 15
+        assert {item['country_hotel']['S']: int(item['price']['N']) for item in stored} == {
+            f'Germany#{i}': i + 15 for i in range(15)}
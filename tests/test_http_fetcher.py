@@ -0,0 +1,40 @@
+import functools
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_fetcher import build_hotel_data, extract_fields_from_html, fetch_hotel_page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fixture_server():
+    # SimpleHTTPRequestHandler sends "Content-Type: text/html" without a charset
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=FIXTURES_DIR))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetched_fixture_keeps_its_utf8_currency(fixture_server):
+    status_code, html, is_challenge = fetch_hotel_page(f"{fixture_server}/golden_palace_suites.html")
+    assert (status_code, is_challenge) == (200, False)
+
+    hotel_data = build_hotel_data(*extract_fields_from_html(html))
+    assert hotel_data['raw_price'] == '€ 896'
+    assert (hotel_data['cleaned_price'], hotel_data['currency']) == (896.0, 'EUR')
+
+
+def test_fixture_file_extracts_the_same_price():
+    with open(os.path.join(FIXTURES_DIR, 'golden_palace_suites.html'), encoding='utf-8') as f:
+        hotel_data = build_hotel_data(*extract_fields_from_html(f.read()))
+    assert (hotel_data['raw_price'], hotel_data['currency']) == ('€ 896', 'EUR')
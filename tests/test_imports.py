@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+
+from multi_country_hotel_scraper_ec2 import LAZY_IMPORTS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(*args):
+    return subprocess.run([sys.executable, *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+
+
+def loaded_modules(statement):
+    """Top-level modules in sys.modules after running statement in a fresh interpreter."""
+    code = f"import sys\n{statement}\nprint('\\n'.join(sorted({{name.split('.')[0] for name in sys.modules}})))"
+    return set(run_python('-c', code).stdout.split())
+
+
+def test_entry_point_leaves_heavy_dependencies_unimported():
+    assert not loaded_modules("import multi_country_hotel_scraper_ec2") & LAZY_IMPORTS
+
+
+def test_help_leaves_heavy_dependencies_unimported():
+    statement = ("import contextlib, io\nimport multi_country_hotel_scraper_ec2 as scraper\n"
+                 "with contextlib.redirect_stdout(io.StringIO()):\n"
+                 "    try:\n        scraper.parse_args(['--help'])\n    except SystemExit:\n        pass")
+    assert not loaded_modules(statement) & LAZY_IMPORTS
+
+
+def test_importtime_lists_no_heavy_module():
+    result = run_python('-X', 'importtime', '-c', 'import multi_country_hotel_scraper_ec2')
+    # Lines look like "import time:  self_us | cumulative_us | <indent>module", after one header line
+    imported = {line.split('|')[-1].strip().split('.')[0]
+                for line in result.stderr.splitlines() if line.startswith('import time:')}
+    assert 'multi_country_hotel_scraper_ec2' in imported
+    assert not imported & LAZY_IMPORTS
@@ -0,0 +1,85 @@
+import json
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from job_spec import build_target_url, expand_job_spec, group_targets_by_country, hotel_key, load_job_spec
+
+HOTEL_URL = ('https://www.booking.com/hotel/eg/golden-palace-suites.html'
+             '?aid=304142&checkin=2025-01-01&checkout=2025-01-05&group_adults=1&age=7&age=9&lang=en-gb#tab-main')
+
+
+def query(url):
+    return parse_qsl(urlsplit(url).query, keep_blank_values=True)
+
+
+def test_target_url_rewrites_dates_and_guests():
+    url = build_target_url(HOTEL_URL, '2026-02-17', '2026-02-24',
+                           {'adults': 3, 'rooms': 2, 'children_ages': [4, 11]})
+    params = query(url)
+
+    assert {key: value for key, value in params if key != 'age'} == {
+        'aid': '304142', 'lang': 'en-gb', 'checkin': '2026-02-17', 'checkout': '2026-02-24',
+        'group_adults': '3', 'req_adults': '3', 'group_children': '2', 'req_children': '2',
+        'no_rooms': '2', 'room1': 'A,A,A,4,11',
+    }
+    # Stale ages from the template are replaced by one age param per child, in order
+    assert [value for key, value in params if key == 'age'] == ['4', '11']
+    # Untouched params keep their place ahead of the rewritten ones
+    assert [key for key, _ in params][:2] == ['aid', 'lang']
+    assert url.startswith('https://www.booking.com/hotel/eg/golden-palace-suites.html?')
+    assert url.endswith('#tab-main')
+
+
+def test_target_url_defaults_to_two_adults_without_children():
+    params = query(build_target_url(HOTEL_URL, '2026-02-17', '2026-02-24'))
+    assert dict(params)['group_adults'] == '2'
+    assert dict(params)['group_children'] == '0'
+    assert dict(params)['no_rooms'] == '1'
+    assert dict(params)['room1'] == 'A,A'
+    assert 'age' not in dict(params)
+
+
+def test_expand_job_spec_crosses_hotels_dates_and_guests():
+    spec = {
+        'hotels': ['https://www.booking.com/hotel/eg/golden-palace-suites.html',
+                   {'url': 'https://www.booking.com/hotel/jp/sakura.html', 'countries': ['Japan']}],
+        'date_ranges': [{'checkin': '2026-02-17', 'checkout': '2026-02-24'},
+                        {'checkin': '2026-03-01', 'checkout': '2026-03-03'}],
+        'guests': [{'adults': 2}, {'adults': 1, 'children_ages': [5]}],
+        'countries': ['Germany', 'Japan'],
+    }
+    targets = expand_job_spec(spec)
+
+    assert len(targets) == 8
+    first = targets[0]
+    assert (first['hotel_url'], first['checkin'], first['checkout']) == (
+        'https://www.booking.com/hotel/eg/golden-palace-suites.html', '2026-02-17', '2026-02-24')
+    assert (first['adults'], first['children'], first['rooms']) == (2, 0, 1)
+    assert dict(query(first['url']))['checkin'] == '2026-02-17'
+    assert (targets[1]['adults'], targets[1]['children']) == (1, 1)
+    assert dict(query(targets[1]['url']))['age'] == '5'
+    assert {tuple(target['countries']) for target in targets[:4]} == {('Germany', 'Japan')}
+    assert {tuple(target['countries']) for target in targets[4:]} == {('Japan',)}
+
+
+def test_targets_are_grouped_by_their_own_countries():
+    targets = [{'url': 'a', 'countries': ['germany', 'Atlantis']}, {'url': 'b', 'countries': ['Japan']},
+               {'url': 'c', 'countries': None}]
+    grouped = group_targets_by_country(targets, ['Japan', 'Germany', 'France'])
+
+    assert [(country, [target['url'] for target in batch]) for country, batch in grouped] == [
+        ('Japan', ['b', 'c']), ('Germany', ['a', 'c']), ('France', ['c'])]
+
+
+def test_hotel_key():
+    assert hotel_key('https://www.booking.com/hotel/eg/golden-palace-suites.en-gb.html?aid=1') == \
+        'eg-golden-palace-suites'
+    assert hotel_key('https://example.com/') == 'unknown'
+
+
+def test_job_spec_needs_hotels_and_dates(tmp_path):
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps({'hotels': ['https://www.booking.com/hotel/eg/x.html'], 'date_ranges': []}))
+    with pytest.raises(ValueError):
+        load_job_spec(str(path))
@@ -0,0 +1,48 @@
+import math
+
+import pytest
+
+from price_normalization import normalize_prices, parse_price
+
+
+@pytest.fixture(autouse=True)
+def cold_cache():
+    parse_price.cache_clear()
+
+
+@pytest.mark.parametrize('raw_price, expected', [
+    ('1.234,56 €', (1234.56, 'EUR')),
+    ('US$1,234.56', (1234.56, 'USD')),
+    ('EGP 12,345', (12345.0, 'EGP')),
+    ("CHF 1'234.50", (1234.5, 'CHF')),
+    ('€ 1.234', (1234.0, 'EUR')),
+    ('€ 896', (896.0, 'EUR')),
+    ('Price: 2,150.00 AED', (2150.0, 'AED')),
+    ('1 234,50 zł', (1234.5, 'PLN')),
+    ('1 234 567 ₫', (1234567.0, 'VND')),
+    ('NZ$2,356', (2356.0, 'NZD')),
+])
+def test_locale_formats(raw_price, expected):
+    assert parse_price(raw_price) == expected
+
+
+@pytest.mark.parametrize('raw_price, expected', [
+    ('€ 450 2 nights', (450.0, 'EUR')),
+    ('€ 1,234 3 nights', (1234.0, 'EUR')),
+    ('€ 1 234 for 14 nights', (1234.0, 'EUR')),
+])
+def test_spaces_group_only_three_digits(raw_price, expected):
+    assert parse_price(raw_price) == expected
+
+
+@pytest.mark.parametrize('raw_price', [None, '', 'No price found', 'Error: Timed out', 'XYZ abc'])
+def test_unparseable_prices(raw_price):
+    assert parse_price(raw_price) == (None, None)
+
+
+def test_column_keeps_index_and_marks_missing_prices():
+    result = normalize_prices(['€ 896', None, '€ 896', 'No price found'])
+    assert list(result.index) == [0, 1, 2, 3]
+    assert result['amount'][0] == result['amount'][2] == 896.0
+    assert math.isnan(result['amount'][1]) and math.isnan(result['amount'][3])
+    assert list(result['currency'].fillna('')) == ['EUR', '', 'EUR', '']
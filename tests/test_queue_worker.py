@@ -0,0 +1,58 @@
+import pytest
+
+import multi_country_hotel_scraper_ec2 as scraper
+from run_state import RunState
+from work_queue import SQLiteWorkQueue, WorkQueue, tasks_from_schedule
+
+
+class FakePool:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_target(url):
+    return {'url': url, 'hotel_url': url, 'checkin': '2026-02-17', 'checkout': '2026-02-24',
+            'adults': 2, 'children': 0, 'rooms': 1}
+
+
+def test_tasks_are_acked_only_after_their_records_are_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, 'ChromeDriverPool', FakePool)
+    monkeypatch.setattr(scraper, 'connect_to_nordvpn_country', lambda country: True)
+    monkeypatch.setattr(scraper, 'disconnect_nordvpn', lambda: True)
+    monkeypatch.setattr(scraper, 'check_exit_country', lambda country, proxy=None: {})
+    monkeypatch.setattr(scraper, 'scrape_hotel_for_country', lambda url, country, driver_pool=None, proxy=None: {
+        'hotel_name': 'Golden', 'raw_price': '€ 900', 'url': url, 'country': country})
+
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'))
+    state = RunState(str(tmp_path / 'run_state.db'))
+    queue.put_many(tasks_from_schedule([('Germany', [make_target('a'), make_target('b')])]))
+    stored_batches = []
+
+    def store_batch(records):
+        # Nothing is acked before the batch is stored
+        stored_batches.append((sorted(record['url'] for record in records), queue.counts()))
+        # DynamoDB takes 'b' only on the second try
+        return [record for record in records if record['url'] == 'b' and len(stored_batches) == 1]
+
+    try:
+        record_count, successful, failed, failed_targets = scraper.run_queue_worker(
+            queue, state=state, retry_delay=0, idle_exit=0, store_batch=store_batch)
+        assert stored_batches == [(['a', 'b'], {'leased': 2}), (['b'], {'leased': 1})]
+        assert record_count == 3
+        assert queue.counts() == {}
+        assert state.counts() == {'done': 2}
+    finally:
+        queue.close()
+        state.close()
+
+
+def test_incomplete_queue_backend_fails_when_created():
+    class ListQueue(WorkQueue):
+        def put_many(self, tasks):
+            return len(tasks)
+
+    with pytest.raises(TypeError):
+        ListQueue()
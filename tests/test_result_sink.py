@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from result_sink import JsonlResultSink, iter_jsonl_chunks, write_parquet_partitions
+
+
+def make_record(i, hotel_url='https://www.booking.com/hotel/de/golden.html'):
+    return {'url': f'u{i}', 'hotel_url': hotel_url, 'country': 'Germany', 'raw_price': '€ 896',
+            'scraped_at': '2026-02-17T10:00:00', 'matched_selectors': {'raw_price': '.prco-valign-middle-helper'}}
+
+
+def test_sink_appends_records_from_several_threads(tmp_path):
+    path = str(tmp_path / 'results' / 'run.jsonl')
+    with JsonlResultSink(path) as sink:
+        threads = [threading.Thread(target=lambda n=n: [sink.write(make_record(n * 100 + i)) for i in range(50)])
+                   for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # A resumed run appends to the same file
+    with JsonlResultSink(path, fsync=False) as sink:
+        sink.write(make_record(999))
+
+    records = [record for chunk in iter_jsonl_chunks(path) for record in chunk]
+    assert len(records) == 201
+    assert len({record['url'] for record in records}) == 201
+    assert records[-1]['raw_price'] == '€ 896'
+
+
+def test_chunks_skip_a_line_torn_by_a_crash(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    with JsonlResultSink(path, fsync=False) as sink:
+        for i in range(5):
+            sink.write(make_record(i))
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(make_record(5))[:40])
+
+    chunks = list(iter_jsonl_chunks(path, chunk_size=2))
+    assert [[record['url'] for record in chunk] for chunk in chunks] == [['u0', 'u1'], ['u2', 'u3'], ['u4']]
+
+
+def test_parquet_partitions_by_scrape_date_and_hotel(tmp_path):
+    records = [make_record(0), make_record(1), make_record(2, 'https://www.booking.com/hotel/jp/sakura.html')]
+    written = write_parquet_partitions(records, str(tmp_path), 'run-00000')
+
+    assert len(written) == 2
+    assert all(os.path.basename(path) == 'run-00000.parquet' for path in written)
+    assert all('scrape_date=2026-02-17' in path for path in written)
+    rows = pd.concat(pd.read_parquet(path) for path in written)
+    assert sorted(rows['url']) == ['u0', 'u1', 'u2']
+    assert json.loads(rows['matched_selectors'].iloc[0]) == {'raw_price': '.prco-valign-middle-helper'}
@@ -0,0 +1,72 @@
+import pytest
+
+import multi_country_hotel_scraper_ec2 as scraper
+
+
+class RecordingState:
+    def __init__(self):
+        self.done = []
+        self.failed = []
+
+    def mark_done(self, target, country):
+        self.done.append(target['url'])
+
+    def mark_failed(self, target, country, error=None):
+        self.failed.append((target['url'], error))
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+
+def make_target(url):
+    return {'url': url, 'hotel_url': url, 'checkin': '2026-02-17', 'checkout': '2026-02-24',
+            'adults': 2, 'children': 0, 'rooms': 1}
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Scrape results by URL, served instead of a browser."""
+    pages = {}
+    monkeypatch.setattr(scraper, 'check_exit_country', lambda country, proxy=None: {})
+    monkeypatch.setattr(scraper, 'scrape_hotel_for_country',
+                        lambda url, country, driver_pool=None, proxy=None: pages[url])
+    return pages
+
+
+def test_error_records_and_missing_prices_are_failures(pages):
+    pages['ok'] = {'hotel_name': 'Golden', 'raw_price': '€ 900', 'cleaned_price': 900.0}
+    pages['error'] = scraper.scrape_error_record('error', 'Germany', 'Timed out', '1.2.3.4')
+    pages['no-price'] = {'hotel_name': 'Golden'}
+    pages['placeholder'] = {'hotel_name': 'Golden', 'raw_price': 'No price found'}
+    state = RecordingState()
+    sink = ListSink()
+
+    records, failed_targets = scraper.scrape_country_batch(
+        'Germany', [make_target(url) for url in ('ok', 'error', 'no-price', 'placeholder')],
+        driver_pool=None, sink=sink, state=state)
+
+    assert [record['hotel_url'] for record in records] == ['ok']
+    assert failed_targets == 3
+    assert state.done == ['ok']
+    assert dict(state.failed) == {'error': 'Error: Timed out', 'no-price': 'No price found',
+                                  'placeholder': 'No price found'}
+    assert sink.records == records
+
+
+def test_scrape_exceptions_are_failures(pages, monkeypatch):
+    def raise_timeout(url, country, driver_pool=None, proxy=None):
+        raise TimeoutError("page load")
+
+    monkeypatch.setattr(scraper, 'scrape_hotel_for_country', raise_timeout)
+    state = RecordingState()
+
+    records, failed_targets = scraper.scrape_country_batch('Germany', [make_target('a')], None, state=state)
+
+    assert records == []
+    assert failed_targets == 1
+    assert state.failed == [('a', 'page load')]
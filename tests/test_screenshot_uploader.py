@@ -0,0 +1,36 @@
+import os
+
+from PIL import Image
+
+from screenshot_uploader import convert_screenshot
+
+CLIP = {'x': 100, 'y': 100, 'width': 200, 'height': 100, 'device_pixel_ratio': 1}
+
+
+def make_screenshot(tmp_path):
+    path = str(tmp_path / 'hotel_Germany.png')
+    Image.new('RGB', (800, 600), 'white').save(path)
+    return path
+
+
+def test_png_clip_keeps_the_full_page_screenshot(tmp_path):
+    path = make_screenshot(tmp_path)
+    output_path, image_format = convert_screenshot(path, 'png', clip=CLIP)
+
+    assert (os.path.basename(output_path), image_format) == ('hotel_Germany_clip.png', 'png')
+    with Image.open(path) as full, Image.open(output_path) as clipped:
+        assert full.size == (800, 600)
+        assert clipped.size == (280, 180)
+
+
+def test_png_without_a_usable_clip_is_uploaded_as_is(tmp_path):
+    path = make_screenshot(tmp_path)
+    assert convert_screenshot(path, 'png') == (path, 'png')
+    assert convert_screenshot(path, 'png', clip={**CLIP, 'x': 5000}) == (path, 'png')
+
+
+def test_webp_conversion_writes_next_to_the_screenshot(tmp_path):
+    path = make_screenshot(tmp_path)
+    output_path, image_format = convert_screenshot(path, 'webp')
+    assert (os.path.basename(output_path), image_format) == ('hotel_Germany.webp', 'webp')
+    assert os.path.exists(path)
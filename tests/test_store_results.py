@@ -0,0 +1,27 @@
+import multi_country_hotel_scraper_ec2 as scraper
+from result_sink import JsonlResultSink
+
+
+def test_resumed_store_skips_records_stored_before(tmp_path, monkeypatch):
+    results_file = str(tmp_path / 'ec2_hotel_prices_run.jsonl')
+    with JsonlResultSink(results_file, fsync=False) as sink:
+        for i in range(7):
+            sink.write({'url': f'u{i}', 'country': 'Germany', 'hotel_name': 'Golden',
+                        'requested_checkin': '2026-02-17', 'requested_checkout': '2026-02-24',
+                        'raw_price': '€ 900'})
+
+    stored = []
+
+    def store_records(records, uploader, part_name, change_filter=None):
+        stored.append((part_name, [record['url'] for record in records]))
+        return 0, []
+
+    monkeypatch.setattr(scraper, 'store_records', store_records)
+
+    assert scraper.store_results(results_file, None, chunk_size=3) == (7, 0, 0)
+    first_parts = [part_name for part_name, _ in stored]
+    stored.clear()
+
+    assert scraper.store_results(results_file, None, chunk_size=3, skip=4) == (3, 0, 0)
+    assert [urls for _, urls in stored] == [['u4', 'u5'], ['u6']]
+    assert not set(first_parts) & {part_name for part_name, _ in stored}
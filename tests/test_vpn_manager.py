@@ -0,0 +1,117 @@
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+import vpn_manager
+import waits
+from vpn_manager import NordVPNManager
+
+# Stand-in for the nordvpn CLI: logs every call and keeps the connected country in a file
+FAKE_NORDVPN = '''\
+#!{python}
+import os, sys
+directory = os.path.dirname(os.path.abspath(__file__))
+state_path = os.path.join(directory, 'connected')
+with open(os.path.join(directory, 'calls.log'), 'a') as log:
+    log.write(' '.join(sys.argv[1:]) + '\\n')
+command = sys.argv[1]
+if command == 'countries':
+    print('Available countries:')
+    print('Albania\\t\\tGermany\\t\\tUnited_States')
+    print('Japan\\t\\tUnited_Kingdom')
+elif command == 'connect':
+    if sys.argv[2] == 'Atlantis':
+        print('The specified server does not exist.')
+        sys.exit(1)
+    with open(state_path, 'w') as f:
+        f.write(sys.argv[2])
+elif command == 'disconnect':
+    if os.path.exists(state_path):
+        os.remove(state_path)
+elif command == 'status':
+    print('Status: ' + ('Connected' if os.path.exists(state_path) else 'Disconnected'))
+'''
+
+
+@pytest.fixture
+def fake_nordvpn(tmp_path, monkeypatch):
+    path = tmp_path / 'bin' / 'nordvpn'
+    path.parent.mkdir()
+    path.write_text(FAKE_NORDVPN.format(python=sys.executable))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    # The tunnel probe would need internet access; the nordvpn status check still runs
+    monkeypatch.setattr(waits, 'probe_tunnel', lambda probe_url=None, proxy=None, timeout=5: True)
+    return str(path)
+
+
+def calls(fake_nordvpn):
+    with open(os.path.join(os.path.dirname(fake_nordvpn), 'calls.log')) as f:
+        return f.read().splitlines()
+
+
+def make_manager(fake_nordvpn, tmp_path, **kwargs):
+    return NordVPNManager(executable=fake_nordvpn, cache_path=str(tmp_path / 'countries.json'),
+                          stats_path=str(tmp_path / 'vpn_stats.json'), **kwargs)
+
+
+def test_nordvpn_bin_selects_the_executable(fake_nordvpn, monkeypatch):
+    monkeypatch.setenv('NORDVPN_BIN', fake_nordvpn)
+    monkeypatch.setattr(vpn_manager, '_default_manager', None)
+    assert vpn_manager.get_vpn_manager().executable == fake_nordvpn
+
+
+def test_countries_keep_underscore_names_and_are_cached(fake_nordvpn, tmp_path):
+    manager = make_manager(fake_nordvpn, tmp_path)
+    expected = ['Albania', 'Germany', 'United_States', 'Japan', 'United_Kingdom']
+    assert manager.countries() == expected
+    assert manager.countries() == expected
+    assert calls(fake_nordvpn) == ['countries']
+
+    # An expired cache is fetched again
+    with open(tmp_path / 'countries.json') as f:
+        cached = json.load(f)
+    cached['fetched_at'] -= 24 * 3600 + 1
+    with open(tmp_path / 'countries.json', 'w') as f:
+        json.dump(cached, f)
+    assert manager.countries() == expected
+    assert calls(fake_nordvpn) == ['countries', 'countries']
+
+
+def test_connect_switches_country_without_disconnecting(fake_nordvpn, tmp_path):
+    manager = make_manager(fake_nordvpn, tmp_path)
+    assert manager.connect('Germany')
+    assert manager.connect('Japan')
+    assert manager.current_country == 'Japan'
+    assert [call for call in calls(fake_nordvpn) if call != 'status'] == ['connect Germany', 'connect Japan']
+
+
+def test_connect_statistics_are_persisted(fake_nordvpn, tmp_path):
+    manager = make_manager(fake_nordvpn, tmp_path)
+    assert manager.connect('Germany')
+    assert not manager.connect('Atlantis')
+    assert manager.current_country is None
+
+    reloaded = make_manager(fake_nordvpn, tmp_path)
+    failure_rate, mean_seconds, attempts = reloaded.country_stats('Germany')
+    assert (failure_rate, attempts) == (0.0, 1) and mean_seconds is not None
+    assert reloaded.country_stats('Atlantis') == (1.0, None, 1)
+    with open(tmp_path / 'vpn_stats.json') as f:
+        assert 'last_failure_at' in json.load(f)['Atlantis']
+
+
+def test_failing_countries_are_ordered_last_not_dropped(tmp_path):
+    manager = NordVPNManager(executable='false', stats_path=str(tmp_path / 'vpn_stats.json'))
+    for _ in range(5):
+        manager._record('Germany', False, 0.0)
+    manager._record('France', True, 4.0)
+    manager._record('Japan', True, 2.0)
+
+    assert manager.order_countries(['Germany', 'France', 'Spain', 'Japan']) == [
+        'Japan', 'France', 'Spain', 'Germany']
+
+    # Statistics survive a restart and still only affect the order
+    reloaded = NordVPNManager(executable='false', stats_path=str(tmp_path / 'vpn_stats.json'))
+    assert reloaded.order_countries(['Germany']) == ['Germany']
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+NordVPN connection manager for the EC2 multi-country scraper
+Caches the country list, connects without a separate disconnect, declares readiness through a
+tunnel probe and keeps per-country connect statistics to try reliable countries first
+"""
+
+import os
+import json
+import time
+import subprocess
+import logging
+import threading
+from datetime import datetime
+
+from waits import wait_for_vpn_tunnel, wait_for_vpn_disconnected, nordvpn_status
+
+logger = logging.getLogger(__name__)
+
+IGNORED_WORDS = {'available', 'countries', 'nordvpn'}
+
+
+def parse_nordvpn_countries(countries_text):
+    """Parse the output of `nordvpn countries` into unique country names.
+
+    Multi-word countries keep NordVPN's underscore form, e.g. United_States.
+    """
+    countries = []
+
+    if ',' in countries_text:
+        countries = [country.strip() for country in countries_text.split(',') if country.strip()]
+    else:
+        for line in countries_text.split('\n'):
+            line = line.strip()
+            if line and not line.startswith('-') and not line.startswith('Available'):
+                countries.extend(line.split())
+
+    # Filter and clean country names
+    unique_countries = []
+    seen = set()
+    for country in countries:
+        country_clean = country.strip().replace(',', '').replace('.', '')
+        if (len(country_clean) > 2 and
+                country_clean.replace('_', '').isalpha() and
+                country_clean.lower() not in seen and
+                country_clean.lower() not in IGNORED_WORDS):
+            unique_countries.append(country_clean)
+            seen.add(country_clean.lower())
+
+    return unique_countries
+
+
+class NordVPNManager:
+    """Wraps the nordvpn CLI with a cached country list, probed connects and connect statistics."""
+
+    def __init__(self, executable='nordvpn', cache_path='hotel_prices/nordvpn_countries.json',
+                 cache_ttl=24 * 3600, stats_path='hotel_prices/vpn_stats.json'):
+        self.executable = executable
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+        self.stats_path = stats_path
+        self.current_country = None
+
+        self._lock = threading.Lock()
+        self._stats = self._load_json(stats_path) or {}
+
+    @staticmethod
+    def _load_json(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_json(path, data):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+
+    def _run(self, *args, timeout=30):
+        return subprocess.run([self.executable, *args], capture_output=True, text=True, timeout=timeout)
+
+    def ensure_daemon(self):
+        """Start nordvpnd if it is not running (only meaningful for the real CLI)."""
+        if self.executable != 'nordvpn':
+            return
+        daemon_check = subprocess.run(['systemctl', 'is-active', 'nordvpnd'], capture_output=True, text=True)
+        if daemon_check.returncode != 0:
+            logger.info("Starting NordVPN daemon...")
+            subprocess.run(['sudo', 'systemctl', 'start', 'nordvpnd'], check=False)
+            time.sleep(5)
+
+    def countries(self, refresh=False):
+        """Return available countries, from the cache while it is younger than cache_ttl."""
+        cached = None if refresh else self._load_json(self.cache_path)
+        if cached and time.time() - cached.get('fetched_at', 0) < self.cache_ttl:
+            logger.info(f"Using {len(cached['countries'])} cached NordVPN countries")
+            return cached['countries']
+
+        try:
+            logger.info("Getting available NordVPN countries...")
+            self.ensure_daemon()
+            result = self._run('countries')
+            if result.returncode != 0:
+                logger.error(f"Error getting NordVPN countries: {result.stderr}")
+                return cached['countries'] if cached else []
+
+            countries_text = result.stdout.strip()
+            logger.info(f"NordVPN countries output: {countries_text[:200]}...")
+            countries = parse_nordvpn_countries(countries_text)
+            logger.info(f"Found {len(countries)} available countries")
+
+            if countries:
+                self._save_json(self.cache_path, {'fetched_at': time.time(), 'countries': countries})
+            return countries
+
+        except subprocess.TimeoutExpired:
+            logger.error("Timeout getting NordVPN countries")
+        except Exception as e:
+            logger.error(f"Error getting NordVPN countries: {e}")
+        return cached['countries'] if cached else []
+
+    def _record(self, country, connected, seconds):
+        with self._lock:
+            stats = self._stats.setdefault(country, {
+                'attempts': 0, 'failures': 0, 'total_connect_seconds': 0.0
+            })
+            stats['attempts'] += 1
+            stats['last_attempt_at'] = datetime.now().isoformat()
+            if connected:
+                stats['total_connect_seconds'] += seconds
+                stats['last_connect_seconds'] = round(seconds, 2)
+            else:
+                stats['failures'] += 1
+                stats['last_failure_at'] = stats['last_attempt_at']
+            try:
+                self._save_json(self.stats_path, self._stats)
+            except OSError as e:
+                logger.warning(f"Could not save VPN stats: {e}")
+
+    def connect(self, country):
+        """Connect to a country and wait for the tunnel probe; returns True when traffic flows.
+
+        nordvpn switches servers in place, so no separate disconnect is issued first.
+        """
+        start = time.time()
+        connected = False
+        try:
+            logger.info(f"Connecting to NordVPN country: {country}")
+            result = self._run('connect', country, timeout=90)
+
+            if result.returncode != 0:
+                logger.error(f"Failed to connect to {country}: {result.stderr or result.stdout}")
+            elif not wait_for_vpn_tunnel(executable=self.executable):
+                logger.error(f"Tunnel to {country} did not pass its health probe")
+            else:
+                connected = True
+
+        except subprocess.TimeoutExpired:
+            logger.error(f"Timeout connecting to {country}")
+        except Exception as e:
+            logger.error(f"Error connecting to {country}: {e}")
+
+        seconds = time.time() - start
+        self._record(country, connected, seconds)
+        self.current_country = country if connected else None
+        if connected:
+            logger.info(f"Successfully connected to {country} in {seconds:.2f}s")
+        return connected
+
+    def disconnect(self):
+        """Disconnect and wait until NordVPN reports it."""
+        try:
+            logger.info("Disconnecting from NordVPN...")
+            result = self._run('disconnect')
+            self.current_country = None
+
+            if result.returncode == 0:
+                logger.info("Successfully disconnected from NordVPN")
+                wait_for_vpn_disconnected(executable=self.executable)
+                return True
+            logger.error(f"Error disconnecting from NordVPN: {result.stderr}")
+            return False
+
+        except subprocess.TimeoutExpired:
+            logger.error("Timeout disconnecting from NordVPN")
+            return False
+        except Exception as e:
+            logger.error(f"Error disconnecting from NordVPN: {e}")
+            return False
+
+    def status(self):
+        """Return NordVPN's connection status string, e.g. 'Connected'."""
+        return nordvpn_status(self.executable)
+
+    def country_stats(self, country):
+        """Return (failure_rate, mean_connect_seconds, attempts) for a country."""
+        stats = self._stats.get(country)
+        if not stats or not stats['attempts']:
+            return 0.0, None, 0
+        successes = stats['attempts'] - stats['failures']
+        mean_seconds = stats['total_connect_seconds'] / successes if successes else None
+        return stats['failures'] / stats['attempts'], mean_seconds, stats['attempts']
+
+    def order_countries(self, countries):
+        """Order countries by connect reliability and latency.
+
+        No country is dropped here: lifetime statistics never recover, so skipping countries
+        that keep failing is left to CountryHealth, whose circuit cools down and resets.
+        """
+        ranked = []
+        for index, country in enumerate(countries):
+            failure_rate, mean_seconds, _ = self.country_stats(country)
+            # Unknown latency sorts after known-fast countries but keeps the original order
+            ranked.append((failure_rate, mean_seconds if mean_seconds is not None else float('inf'), index, country))
+
+        return [country for _, _, _, country in sorted(ranked)]
+
+
+_default_manager = None
+
+
+def get_vpn_manager():
+    """Return the process-wide manager; NORDVPN_BIN points it at a fake nordvpn for testing."""
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = NordVPNManager(executable=os.environ.get('NORDVPN_BIN', 'nordvpn'))
+    return _default_manager
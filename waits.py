@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Condition-driven waits for the EC2 multi-country scraper
+Each wait polls a readiness condition up to a configurable ceiling and logs how long it actually took
+"""
+
+import json
+import time
+import subprocess
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; a wait returns as soon as its condition holds
+WAIT_CEILINGS = {
+    'document_ready': 30,
+    'price_selectors': 20,
+    'network_idle': 10,
+    'scroll_settle': 3,
+    'vpn_disconnect': 15,
+    'vpn_tunnel': 30,
+}
+
+POLL_INTERVAL = 0.25
+
+VPN_PROBE_URL = "https://checkip.amazonaws.com"
+
+
+def set_wait_ceilings(overrides):
+    """Override wait ceilings from "name=seconds" strings (e.g. from the command line)."""
+    for override in overrides or []:
+        name, _, seconds = override.partition('=')
+        if name not in WAIT_CEILINGS:
+            raise ValueError(f"Unknown wait '{name}', expected one of: {', '.join(WAIT_CEILINGS)}")
+        WAIT_CEILINGS[name] = float(seconds)
+
+
+def wait_until(name, condition, timeout=None, poll_interval=POLL_INTERVAL):
+    """Poll condition() until it returns a truthy value or the ceiling for name is reached.
+
+    Returns the condition's last value; exceptions raised by the condition count as "not yet".
+    """
+    ceiling = WAIT_CEILINGS[name] if timeout is None else timeout
+    start = time.time()
+    result = None
+
+    while True:
+        try:
+            result = condition()
+        except Exception:
+            result = None
+        if result:
+            logger.info(f"Wait '{name}' satisfied after {time.time() - start:.2f}s (ceiling {ceiling}s)")
+            return result
+        if time.time() - start >= ceiling:
+            logger.warning(f"Wait '{name}' hit its {ceiling}s ceiling")
+            return result
+        time.sleep(poll_interval)
+
+
+def wait_for_document_ready(driver, timeout=None):
+    """Wait until document.readyState is complete."""
+    return bool(wait_until(
+        'document_ready',
+        lambda: driver.execute_script("return document.readyState;") == 'complete',
+        timeout
+    ))
+
+
+def wait_for_any_selector(driver, selectors, timeout=None):
+    """Wait until any of the CSS selectors matches an element; returns the first one that does."""
+    script = """
+        const selectors = arguments[0];
+        for (const selector of selectors) {
+            try {
+                if (document.querySelector(selector)) return selector;
+            } catch (e) {}
+        }
+        return null;
+    """
+    return wait_until('price_selectors', lambda: driver.execute_script(script, selectors), timeout)
+
+
+def drain_network_events(driver):
+    """Discard buffered CDP performance log entries, e.g. before a new navigation."""
+    try:
+        driver.get_log('performance')
+    except Exception:
+        pass
+
+
+def wait_for_network_idle(driver, idle_time=0.5, timeout=None):
+    """Wait until no network requests have been in flight for idle_time seconds.
+
+    In-flight requests are tracked from the CDP Network events Chrome writes to the performance
+    log (enabled via goog:loggingPrefs in setup_ec2_chrome_driver).
+    """
+    in_flight = set()
+    state = {'last_activity': time.time()}
+
+    def is_idle():
+        for entry in driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            method = message.get('method', '')
+            request_id = message.get('params', {}).get('requestId')
+            if method == 'Network.requestWillBeSent':
+                in_flight.add(request_id)
+                state['last_activity'] = time.time()
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                in_flight.discard(request_id)
+                state['last_activity'] = time.time()
+
+        return not in_flight and time.time() - state['last_activity'] >= idle_time
+
+    return bool(wait_until('network_idle', is_idle, timeout, poll_interval=0.1))
+
+
+def wait_for_scroll_settle(driver, timeout=None):
+    """Wait until the scroll position stops changing."""
+    positions = []
+
+    def settled():
+        positions.append(driver.execute_script("return [window.scrollX, window.scrollY];"))
+        return len(positions) >= 2 and positions[-1] == positions[-2]
+
+    return bool(wait_until('scroll_settle', settled, timeout, poll_interval=0.1))
+
+
+def nordvpn_status(executable='nordvpn'):
+    """Return the 'Status' field of `nordvpn status`, e.g. 'Connected', or None."""
+    result = subprocess.run([executable, 'status'], capture_output=True, text=True, timeout=10)
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower().endswith('status'):
+            return value.strip()
+    return None
+
+
+def probe_tunnel(probe_url=VPN_PROBE_URL, proxy=None, timeout=5):
+    """Return True if an HTTPS request goes through the current egress."""
+    command = ["curl", "-s", "-o", "/dev/null", "-w", "%{http_code}", "--max-time", str(timeout), probe_url]
+    if proxy:
+        command[1:1] = ["--proxy", proxy]
+    result = subprocess.run(command, capture_output=True, text=True)
+    return result.returncode == 0 and result.stdout.strip().startswith('2')
+
+
+def wait_for_vpn_disconnected(timeout=None, executable='nordvpn'):
+    """Wait until NordVPN reports it is disconnected."""
+    return bool(wait_until('vpn_disconnect', lambda: nordvpn_status(executable) == 'Disconnected',
+                           timeout, poll_interval=0.5))
+
+
+def wait_for_vpn_tunnel(probe_url=VPN_PROBE_URL, timeout=None, executable='nordvpn'):
+    """Wait until NordVPN reports Connected and a request through the tunnel succeeds."""
+    return bool(wait_until(
+        'vpn_tunnel',
+        lambda: nordvpn_status(executable) == 'Connected' and probe_tunnel(probe_url),
+        timeout,
+        poll_interval=0.5
+    ))
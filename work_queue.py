@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Work queue for sharding scrape tasks across EC2 instances
+A coordinator enqueues one message per (hotel, dates, guests, country) task; workers lease
+messages, keep them invisible with heartbeats while scraping, and ack or nack each one
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from run_state import task_id
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+
+def make_task(target, country):
+    """Return the queue message body for a target scraped from a country."""
+    return {'task_id': task_id(target, country), 'country': country, 'target': target}
+
+
+def tasks_from_schedule(schedule):
+    return [make_task(target, country) for country, batch in schedule for target in batch]
+
+
+def group_leases_by_country(leases):
+    """Return [(country, [lease, ...])] in the order countries first appear in leases."""
+    groups = {}
+    for lease in leases:
+        groups.setdefault(lease['task']['country'], []).append(lease)
+    return list(groups.items())
+
+
+class WorkQueue(ABC):
+    """Interface of the queue backends.
+
+    A lease is a dict with the message 'task', an opaque 'receipt' and the 'receive_count'.
+    Leased messages stay invisible to other workers for visibility_timeout seconds unless
+    extended with heartbeat(); a worker that dies simply stops heartbeating, and its messages
+    are leased again once the timeout expires.
+    """
+
+    @abstractmethod
+    def put_many(self, tasks):
+        """Enqueue task dicts; returns how many were accepted."""
+
+    @abstractmethod
+    def lease(self, max_tasks=10, visibility_timeout=600, prefer_country=None, wait_seconds=0):
+        """Lease up to max_tasks messages, preferring prefer_country where the backend can."""
+
+    @abstractmethod
+    def heartbeat(self, lease, visibility_timeout=600):
+        """Keep a lease invisible for another visibility_timeout seconds; False if it was lost."""
+
+    @abstractmethod
+    def ack(self, lease):
+        """Remove a finished message."""
+
+    @abstractmethod
+    def nack(self, lease, delay=0, error=None):
+        """Make a message visible again after delay seconds."""
+
+    def dead_letter(self, lease, error=None):
+        """Give up on a message that failed too often."""
+        logger.error(f"Dropping task {lease['task']['task_id']} after {lease['receive_count']} attempts: {error}")
+        self.ack(lease)
+
+    @abstractmethod
+    def counts(self):
+        """Return {'queued': n, 'leased': n}, approximate numbers of messages still to do."""
+
+    def close(self):
+        pass
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Work queue in one SQLite file, for a single host and for tests.
+
+    Several worker processes on the same host can share the file; leases are taken inside
+    BEGIN IMMEDIATE transactions so two workers never get the same message.
+    """
+
+    def __init__(self, path='hotel_prices/work_queue.db'):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY,
+                task_id TEXT NOT NULL UNIQUE,
+                country TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL,
+                visible_at REAL NOT NULL,
+                receipt TEXT,
+                receive_count INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_visible ON messages (status, visible_at)")
+
+    def put_many(self, tasks):
+        now = datetime.now().isoformat()
+        rows = [(task['task_id'], task['country'], json.dumps(task, ensure_ascii=False), QUEUED, 0, now)
+                for task in tasks]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            # A task that is already queued or leased is not enqueued twice
+            self._conn.executemany("""
+                INSERT INTO messages (task_id, country, body, status, visible_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (task_id) DO UPDATE SET
+                    status = excluded.status, visible_at = 0, receipt = NULL, receive_count = 0,
+                    last_error = NULL, updated_at = excluded.updated_at
+                WHERE messages.status IN ('done', 'dead')
+            """, rows)
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def lease(self, max_tasks=10, visibility_timeout=600, prefer_country=None, wait_seconds=0):
+        deadline = time.time() + wait_seconds
+        while True:
+            leases = self._lease_now(max_tasks, visibility_timeout, prefer_country)
+            if leases or time.time() >= deadline:
+                return leases
+            time.sleep(min(1.0, max(0.0, deadline - time.time())))
+
+    def _lease_now(self, max_tasks, visibility_timeout, prefer_country):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases of dead workers are visible again, just like queued messages
+                rows = self._conn.execute("""
+                    SELECT seq, body, receive_count FROM messages
+                    WHERE status IN ('queued', 'leased') AND visible_at <= ?
+                    ORDER BY country = ? DESC, seq
+                    LIMIT ?
+                """, (now, prefer_country, max_tasks)).fetchall()
+                leases = []
+                for seq, body, receive_count in rows:
+                    receipt = uuid.uuid4().hex
+                    self._conn.execute("""
+                        UPDATE messages SET status = ?, visible_at = ?, receipt = ?,
+                            receive_count = receive_count + 1, updated_at = ?
+                        WHERE seq = ?
+                    """, (LEASED, now + visibility_timeout, receipt, datetime.now().isoformat(), seq))
+                    leases.append({'task': json.loads(body), 'receipt': receipt, 'receive_count': receive_count + 1})
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return leases
+
+    def _update_leased(self, lease, sql, params):
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE messages SET {sql}, updated_at = ? WHERE receipt = ? AND status = ?",
+                (*params, datetime.now().isoformat(), lease['receipt'], LEASED))
+            return cursor.rowcount == 1
+
+    def heartbeat(self, lease, visibility_timeout=600):
+        return self._update_leased(lease, "visible_at = ?", (time.time() + visibility_timeout,))
+
+    def ack(self, lease):
+        return self._update_leased(lease, "status = ?, receipt = NULL", (DONE,))
+
+    def nack(self, lease, delay=0, error=None):
+        return self._update_leased(lease, "status = ?, visible_at = ?, receipt = NULL, last_error = ?",
+                                   (QUEUED, time.time() + delay, error))
+
+    def dead_letter(self, lease, error=None):
+        # Dead messages stay in the table for inspection instead of being deleted
+        logger.error(f"Task {lease['task']['task_id']} failed {lease['receive_count']} times, giving up: {error}")
+        return self._update_leased(lease, "status = ?, receipt = NULL, last_error = ?", (DEAD, error))
+
+    def counts(self):
+        """Return {'queued': n, 'leased': n} of the messages still to do; nacked ones count as queued."""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT CASE WHEN status = 'leased' AND visible_at <= ? THEN 'queued' ELSE status END,
+                       COUNT(*)
+                FROM messages WHERE status IN ('queued', 'leased') GROUP BY 1
+            """, (time.time(),)).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SQSWorkQueue(WorkQueue):
+    """Work queue on an Amazon SQS standard queue.
+
+    SQS cannot filter by country, so prefer_country is ignored and workers group whatever
+    they receive. Configure a redrive policy on the queue to keep messages that keep failing.
+    """
+
+    def __init__(self, queue_url, region_name=None, endpoint_url=None, session=None):
+        import boto3
+        from botocore.config import Config
+
+        self.queue_url = queue_url
+        session = session or boto3.session.Session()
+        self.client = session.client(
+            'sqs',
+            region_name=region_name or sqs_region(queue_url),
+            endpoint_url=endpoint_url,
+            config=Config(retries={'max_attempts': 5, 'mode': 'adaptive'})
+        )
+
+    def put_many(self, tasks):
+        accepted = 0
+        for start in range(0, len(tasks), 10):
+            entries = [{'Id': str(i), 'MessageBody': json.dumps(task, ensure_ascii=False)}
+                       for i, task in enumerate(tasks[start:start + 10])]
+            for attempt in range(5):
+                response = self.client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+                accepted += len(response.get('Successful', []))
+                failed_ids = {failure['Id'] for failure in response.get('Failed', [])}
+                entries = [entry for entry in entries if entry['Id'] in failed_ids]
+                if not entries:
+                    break
+                time.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+            if entries:
+                logger.error(f"Could not enqueue {len(entries)} tasks to {self.queue_url}")
+        return accepted
+
+    def lease(self, max_tasks=10, visibility_timeout=600, prefer_country=None, wait_seconds=0):
+        response = self.client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=max(1, min(max_tasks, 10)),
+            VisibilityTimeout=int(visibility_timeout),
+            WaitTimeSeconds=int(min(wait_seconds, 20)),
+            AttributeNames=['ApproximateReceiveCount'],
+        )
+        return [{
+            'task': json.loads(message['Body']),
+            'receipt': message['ReceiptHandle'],
+            'receive_count': int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1)),
+        } for message in response.get('Messages', [])]
+
+    def heartbeat(self, lease, visibility_timeout=600):
+        try:
+            self.client.change_message_visibility(QueueUrl=self.queue_url, ReceiptHandle=lease['receipt'],
+                                                  VisibilityTimeout=int(visibility_timeout))
+            return True
+        except Exception as e:
+            logger.warning(f"Lost lease on task {lease['task']['task_id']}: {e}")
+            return False
+
+    def ack(self, lease):
+        try:
+            self.client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=lease['receipt'])
+            return True
+        except Exception as e:
+            logger.warning(f"Could not ack task {lease['task']['task_id']}: {e}")
+            return False
+
+    def nack(self, lease, delay=0, error=None):
+        try:
+            self.client.change_message_visibility(QueueUrl=self.queue_url, ReceiptHandle=lease['receipt'],
+                                                  VisibilityTimeout=int(delay))
+            return True
+        except Exception as e:
+            logger.warning(f"Could not nack task {lease['task']['task_id']}: {e}")
+            return False
+
+    def counts(self):
+        attributes = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible',
+                            'ApproximateNumberOfMessagesDelayed'],
+        )['Attributes']
+        return {
+            QUEUED: int(attributes.get('ApproximateNumberOfMessages', 0))
+                    + int(attributes.get('ApproximateNumberOfMessagesDelayed', 0)),
+            LEASED: int(attributes.get('ApproximateNumberOfMessagesNotVisible', 0)),
+        }
+
+
+def sqs_region(queue_url):
+    """Region of an SQS queue URL like https://sqs.eu-west-1.amazonaws.com/123456789012/name."""
+    host = urlsplit(queue_url).hostname or ''
+    parts = host.split('.')
+    if len(parts) >= 3 and parts[0] == 'sqs':
+        return parts[1]
+    return os.environ.get('SQS_REGION', 'eu-west-1')
+
+
+def open_work_queue(url):
+    """Open a queue from a URL: an SQS queue URL, or sqlite:///relative.db / sqlite:////absolute.db.
+
+    SQS_ENDPOINT_URL points the SQS backend at a local stand-in such as ElasticMQ.
+    """
+    if url.startswith('sqlite:///'):
+        return SQLiteWorkQueue(url[len('sqlite:///'):])
+    if url.startswith('https://') or url.startswith('http://'):
+        return SQSWorkQueue(url, endpoint_url=os.environ.get('SQS_ENDPOINT_URL'))
+    raise ValueError(f"Unsupported queue URL '{url}', expected sqlite:///path or an SQS queue URL")
+
+
+class LeaseHeartbeat:
+    """Background thread extending every held lease until it is acked or nacked."""
+
+    def __init__(self, queue, visibility_timeout=600, interval=None):
+        self.queue = queue
+        self.visibility_timeout = visibility_timeout
+        self.interval = interval or max(1.0, visibility_timeout / 3)
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-heartbeat', daemon=True)
+        self._thread.start()
+
+    def add(self, leases):
+        with self._lock:
+            for lease in leases:
+                self._leases[lease['receipt']] = lease
+
+    def remove(self, lease):
+        with self._lock:
+            self._leases.pop(lease['receipt'], None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                leases = list(self._leases.values())
+            for lease in leases:
+                if not self.queue.heartbeat(lease, self.visibility_timeout):
+                    logger.warning(f"Lease on task {lease['task']['task_id']} expired, another worker may take it")
+                    self.remove(lease)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class QueueAcker:
+    """Acks or nacks leases as targets finish, through the mark_done/mark_failed calls of a run state.
+
+    Passed as the state of scrape_country_batch; calls are forwarded to an inner state if given.
+    Failed tasks are retried with a jittered exponential delay until max_attempts receives.
+    With defer_acks, scraped tasks stay leased until ack_scraped, so they can be acked only
+    once their records are stored.
+    """
+
+    def __init__(self, queue, heartbeat, leases, state=None, max_attempts=3, retry_delay=60, defer_acks=False):
+        self.queue = queue
+        self.heartbeat = heartbeat
+        self.state = state
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.defer_acks = defer_acks
+        self._leases = {lease['task']['task_id']: lease for lease in leases}
+        self._scraped = {}
+        self.acked = 0
+        self.nacked = 0
+
+    def _pop(self, target, country):
+        lease = self._leases.pop(task_id(target, country), None)
+        if lease is not None:
+            self.heartbeat.remove(lease)
+        return lease
+
+    def mark_done(self, target, country):
+        if self.state is not None:
+            self.state.mark_done(target, country)
+        if self.defer_acks:
+            lease = self._leases.pop(task_id(target, country), None)
+            if lease is not None:
+                self._scraped[lease['task']['task_id']] = lease
+            return
+        lease = self._pop(target, country)
+        if lease is not None and self.queue.ack(lease):
+            self.acked += 1
+
+    def mark_failed(self, target, country, error=None):
+        if self.state is not None:
+            self.state.mark_failed(target, country, error)
+        lease = self._pop(target, country)
+        if lease is None:
+            return
+        if lease['receive_count'] >= self.max_attempts:
+            self.queue.dead_letter(lease, error)
+            return
+        delay = random.uniform(0.5, 1.0) * self.retry_delay * 2 ** (lease['receive_count'] - 1)
+        if self.queue.nack(lease, delay, error):
+            self.nacked += 1
+
+    def ack_scraped(self, unstored=(), error='storage failed'):
+        """Ack the deferred leases of scraped tasks; tasks whose id is in unstored are retried."""
+        for scraped_id, lease in list(self._scraped.items()):
+            del self._scraped[scraped_id]
+            if scraped_id in unstored:
+                self._leases[scraped_id] = lease
+                self.mark_failed(lease['task']['target'], lease['task']['country'], error)
+                continue
+            self.heartbeat.remove(lease)
+            if self.queue.ack(lease):
+                self.acked += 1
+
+    def fail_unfinished(self, error='no outcome'):
+        """Fail every lease that got no outcome, e.g. of a country without a proxy or a crashed batch."""
+        for lease in list(self._leases.values()):
+            self.mark_failed(lease['task']['target'], lease['task']['country'], error)